@@ -32,13 +32,11 @@ def main(spreadsheet_id, creds):
             (
                 pivot_df, 
                 daily_soh_df, 
-                inbound_df, 
-                outbound_df, 
                 update_time
             ) = state_manager.load_initial_data(spreadsheet_id, creds)
             
             # 5. Sinkronkan data yang dimuat ke state
-            state_manager.sync_data_to_state(pivot_df, daily_soh_df, inbound_df, outbound_df, update_time)
+            state_manager.sync_data_to_state(pivot_df, daily_soh_df, update_time)
             
         except Exception as e:
             # Tampilkan error GSheet jika GSheet gagal dimuat saat startup
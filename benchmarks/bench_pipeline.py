@@ -0,0 +1,257 @@
+"""
+Benchmark end-to-end: ETL CSV -> parse GSheet -> filter -> KPI -> agregasi visual.
+
+Data dibuat oleh benchmarks.generate_moves. Untuk setiap ukuran, setiap tahap diukur
+waktunya (perf_counter) dan memori puncaknya (tracemalloc, pada run terpisah agar
+tidak memperlambat pengukuran waktu). Hasil dibandingkan dengan baseline tersimpan;
+exit code 1 jika ada tahap yang lebih lambat / lebih boros dari toleransi.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_pipeline --sizes 10k,100k,1m,5m
+    python -m benchmarks.bench_pipeline --sizes 10k,100k --update-baseline
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+from benchmarks import fake_sheets
+from benchmarks.generate_moves import write_moves_csv
+from modules import data_processing, datasets, google_sheets, kpi_cards, main_content, metrics_cube, storage, visuals_advanced
+
+
+DEFAULT_SIZES = "10k,100k,1m,5m"
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Regresi = lebih lambat/boros dari baseline * (1 + toleransi) DAN melebihi slack absolut
+# (slack mencegah noise pada tahap yang hanya beberapa milidetik)
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.25
+TIME_SLACK_S = 0.05
+MEMORY_SLACK_MB = 5.0
+
+# Tahap gsheet.* (server Sheets palsu lokal) hanya untuk ukuran yang muat di satu spreadsheet
+# (batas Google Sheets: 10 juta sel); MB puncak termasuk isi server palsu (proses yang sama).
+GSHEET_MAX_CELLS = 10_000_000
+
+
+def parse_size(text):
+    """'10k' -> 10_000, '1m' -> 1_000_000."""
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def measure(func, with_memory=True):
+    """Menjalankan func: (hasil, detik, MB puncak atau None)."""
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+
+    peak_mb = None
+    if with_memory:
+        tracemalloc.start()
+        func()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result, seconds, peak_mb
+
+
+def as_sheet_response(df, sheet_name):
+    """Meniru respons values:batchGet (UNFORMATTED_VALUE): header + nilai bertipe seperti yang diunggah."""
+    return {"values": [df.columns.tolist()] + google_sheets._to_upload_values(df, sheet_name)}
+
+
+def as_display_dates(df):
+    """Konversi 'Date' ke objek date seperti di main_content.display_main_content."""
+    df = df.copy()
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce").dt.date
+    return df
+
+
+def representative_filters(daily_soh_df):
+    """Filter tipikal: 30 hari terakhir, satu kategori lokasi, 50 SKU teratas."""
+    end_date = daily_soh_df["Date"].max()
+    start_date = end_date - pd.Timedelta(days=30)
+    top_skus = daily_soh_df["SKU"].value_counts().index[:50].tolist()
+    return start_date, end_date, {"selected_cat_loc": ["Pool"], "selected_skus": top_skus}
+
+
+def upload_to_fake_sheets(df_dict):
+    """
+    Upload penuh (plan_upload + write_sheet per sheet, tanpa batas kuota) ke server Sheets palsu kosong.
+    Mengembalikan isi sheet server ({nama: baris}) untuk tahap baca.
+    """
+    server, client = fake_sheets.start_fake_sheets({ws_name: [] for ws_name, _ in google_sheets.DASHBOARD_SHEETS})
+    try:
+        session, sheet_plans = google_sheets.plan_upload(client, fake_sheets.FAKE_SPREADSHEET_ID, df_dict)
+        quota = google_sheets.WriteQuota(requests_per_minute=10**9)
+        for ws_name, sheet_plan in sheet_plans.items():
+            google_sheets.write_sheet(session, ws_name, sheet_plan["steps"], df_dict, quota)
+        return server.sheets
+    finally:
+        server.shutdown()
+
+
+def run_size(n_rows, with_memory, workdir):
+    """Mengukur semua tahap untuk satu ukuran data. Mengembalikan {tahap: {seconds, peak_mb}}."""
+    csv_path = os.path.join(workdir, f"moves_{n_rows}.csv")
+    write_moves_csv(csv_path, n_rows)
+    results = {}
+
+    def record(stage, func):
+        result, seconds, peak_mb = measure(func, with_memory)
+        results[stage] = {"seconds": round(seconds, 4), "peak_mb": None if peak_mb is None else round(peak_mb, 1)}
+        return result
+
+    # 1. ETL CSV (mode streaming seperti di aplikasi)
+    df_dict = record("process_csv", lambda: data_processing.process_csv(
+        csv_path, chunksize=data_processing.STREAM_CHUNK_SIZE
+    ))
+
+    # 2. Encode nilai upload (RAW bertipe) & decode hasil baca GSheet
+    record("encode_upload_values", lambda: (
+        google_sheets._to_upload_values(df_dict["daily_soh_df"], "Moves History"),
+        google_sheets._to_upload_values(df_dict["pivot_df"], "Pivot"),
+    ))
+    raw_moves = as_sheet_response(df_dict["daily_soh_df"], "Moves History")
+    raw_pivot = as_sheet_response(df_dict["pivot_df"], "Pivot")
+    record("decode_sheet_values", lambda: (
+        google_sheets._decode_value_range(raw_moves, google_sheets.MOVES_COLS, "Moves History"),
+        google_sheets._decode_value_range(raw_pivot, google_sheets.PIVOT_COLS, "Pivot"),
+    ))
+    del raw_moves, raw_pivot
+
+    # 2b. Jalur GSheet lewat HTTP ke server Sheets palsu: upload penuh, baca sheet biasa & snapshot,
+    #     dan plan diff upload ulang tanpa perubahan (kasus upload berulang)
+    if n_rows * len(google_sheets.MOVES_COLS) <= GSHEET_MAX_CELLS:
+        fake_state = record("gsheet.upload_full", lambda: upload_to_fake_sheets(df_dict))
+        server, client = fake_sheets.start_fake_sheets(fake_state)
+        spreadsheet_id = fake_sheets.FAKE_SPREADSHEET_ID
+        record("gsheet.read_all_data", lambda: google_sheets.read_all_data(spreadsheet_id, None, client=client))
+        record("gsheet.read_snapshot", lambda: google_sheets.read_snapshot(spreadsheet_id, None, client=client))
+        record("gsheet.plan_upload", lambda: google_sheets.plan_upload(client, spreadsheet_id, df_dict))
+        server.shutdown()
+        del fake_state
+
+    # 3. Blok filter main_content
+    daily_soh_df = as_display_dates(df_dict["daily_soh_df"])
+    pivot_df = df_dict["pivot_df"]
+    start_date, end_date, selections = representative_filters(daily_soh_df)
+    record("apply_filters", lambda: main_content.apply_filters(
+        daily_soh_df, pivot_df, start_date, end_date, **selections
+    ))
+    # Filter lewat indeks terbalik & indeks tanggal dataset registri, lalu rerun dengan filter yang sama
+    # (mis. ganti halaman tabel): posisi baris diambil dari memo
+    dataset = datasets.get(datasets.publish(pivot_df, daily_soh_df, None))
+    record("filter_rows.indexed", lambda: main_content.filter_rows(
+        dataset["daily_soh_df"], dataset["pivot_df"], start_date, end_date,
+        daily_index=dataset["daily_index"], pivot_index=dataset["pivot_index"],
+        date_index=dataset["date_index"], **selections
+    ))
+    main_content.filter_dataset(dataset, start_date, end_date, **selections)
+    record("filter_dataset.cached", lambda: main_content.filter_dataset(
+        dataset, start_date, end_date, **selections
+    ))
+
+    # 3b. Filter yang sama sebagai SQL berindeks (backend SQLite, DASHBOARD_STORAGE=sqlite)
+    sqlite_backend = storage.SQLiteBackend(os.path.join(workdir, f"moves_{n_rows}.sqlite"))
+    sqlite_backend.save(df_dict, None)
+    record("storage.sqlite_query", lambda: sqlite_backend.query(start_date, end_date, **selections))
+    os.remove(sqlite_backend.path)
+
+    # 4. KPI dari kubus metrik harian (pada data tanpa filter = kasus terberat, "Semua Waktu")
+    cube, _ = record("metrics_cube.build_cube", lambda: metrics_cube.build_cube(daily_soh_df))
+    for name in ["calculate_stock_accuracy_kpi", "calculate_weighted_accuracy_kpi",
+                 "calculate_sku_adjusted_kpi", "calculate_active_locations_kpi"]:
+        func = getattr(kpi_cards, name)
+        record(f"kpi_cards.{name}", lambda func=func: func(cube, None, None))
+    record("kpi_cards.calculate_sku_variance_kpi", lambda: kpi_cards.calculate_sku_variance_kpi(pivot_df))
+
+    # 5. Agregasi visual (termasuk pembuatan chart Altair, tanpa render browser)
+    for name in ["plot_daily_stock_accuracy_trend", "plot_weighted_accuracy_trend",
+                 "plot_adjustment_trend_line", "plot_adjustment_analysis_tables"]:
+        func = getattr(visuals_advanced, name)
+        record(f"visuals_advanced.{name}", lambda func=func: func(cube))
+
+    os.remove(csv_path)
+    return results
+
+
+def compare(results, baseline):
+    """Daftar pesan regresi (kosong jika semua tahap dalam toleransi)."""
+    regressions = []
+    for size, stages in results.items():
+        for stage, current in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if base is None:
+                continue
+            limit = base["seconds"] * (1 + TIME_TOLERANCE) + TIME_SLACK_S
+            if current["seconds"] > limit:
+                regressions.append(f"{size} {stage}: {current['seconds']:.3f}s > {limit:.3f}s (baseline {base['seconds']:.3f}s)")
+            if current["peak_mb"] is not None and base.get("peak_mb") is not None:
+                limit = base["peak_mb"] * (1 + MEMORY_TOLERANCE) + MEMORY_SLACK_MB
+                if current["peak_mb"] > limit:
+                    regressions.append(f"{size} {stage}: {current['peak_mb']:.1f}MB > {limit:.1f}MB (baseline {base['peak_mb']:.1f}MB)")
+    return regressions
+
+
+def print_table(size, stages, baseline):
+    print(f"\n== {size} baris ==")
+    print(f"{'tahap':48s} {'detik':>9s} {'MB puncak':>10s} {'baseline':>10s}")
+    for stage, current in stages.items():
+        base = baseline.get(size, {}).get(stage, {}).get("seconds")
+        peak = "-" if current["peak_mb"] is None else f"{current['peak_mb']:.1f}"
+        base_str = "-" if base is None else f"{base:.3f}s"
+        print(f"{stage:48s} {current['seconds']:9.3f} {peak:>10s} {base_str:>10s}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Daftar ukuran, mis. 10k,100k,1m,5m")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Tulis hasil sebagai baseline baru")
+    parser.add_argument("--no-memory", action="store_true", help="Lewati pengukuran memori (tracemalloc)")
+    args = parser.parse_args()
+
+    # Fungsi st.* dipanggil tanpa server Streamlit (bare mode): sembunyikan log peringatannya.
+    # (FutureWarning pandas dari groupby.apply di kpi_cards/visuals_advanced tidak relevan di sini)
+    logging.disable(logging.WARNING)
+    warnings.simplefilter("ignore", FutureWarning)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes.split(","):
+            key = size.strip().lower()
+            results[key] = run_size(parse_size(key), not args.no_memory, workdir)
+            print_table(key, results[key], baseline)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline diperbarui: {args.baseline}")
+        return
+
+    regressions = compare(results, baseline)
+    if regressions:
+        print("\nREGRESI:")
+        for message in regressions:
+            print(f"  - {message}")
+        raise SystemExit(1)
+    print("\nTidak ada regresi terhadap baseline.")
+
+
+if __name__ == "__main__":
+    main()
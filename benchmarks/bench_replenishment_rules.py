@@ -0,0 +1,104 @@
+"""
+Benchmark: aturan replenishment row-wise (apply) vs tabel aturan vektorisasi.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_replenishment_rules --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules import data_processing
+
+
+# --- IMPLEMENTASI LAMA (row-wise), disalin apa adanya sebagai pembanding ---
+
+def _legacy_get_moves_info(daily_usage):
+    if daily_usage > 1.0: return "Fast", 21
+    elif daily_usage > 0.1: return "Medium", 14
+    else: return "Slow", 7
+
+def _legacy_get_status_and_action(row):
+    if row['Buffer Stock'] == 0:
+        if row['SOH'] < 0: return "🟥 Danger", "SOH Negatif!"
+        return "🟥 Danger", "Stok 0 Pemakaian (N/A)"
+    soh_ratio = row['SOH'] / row['Buffer Stock']
+    if soh_ratio < 0.5:
+        return "🟥 Danger", f"Stok Kritis (<50% BS). Replenish {row['Shortage']:.0f} pcs."
+    elif soh_ratio <= 1:
+        if row['Shortage'] > 0: return "🟨 Alert", f"Segera Replenish ({row['Shortage']:.0f} pcs)"
+        else: return "🟨 Alert", "Stok di Buffer Level"
+    else:
+        return "🟩 Safe", "Stok Cukup"
+
+def _legacy_get_status_daily(row):
+    if row['Buffer Stock'] == 0:
+        return "🟥 Danger"
+    soh_ratio = row['Cumulative_SOH'] / row['Buffer Stock']
+    if soh_ratio < 0.5: return "🟥 Danger"
+    elif soh_ratio <= 1: return "🟨 Alert"
+    else: return "🟩 Safe"
+
+def legacy_rules(df):
+    df = df.copy()
+    df[['Moves Category', 'Lead Time']] = df['Daily Usage'].apply(lambda x: pd.Series(_legacy_get_moves_info(x)))
+    df['Buffer Stock'] = df['Daily Usage'] * df['Lead Time']
+    df['Shortage'] = (df['Buffer Stock'] - df['SOH']).apply(lambda x: max(x, 0))
+    df[['Status', 'Action']] = df.apply(_legacy_get_status_and_action, axis=1, result_type='expand')
+    df['Status_Replenishment'] = df.apply(_legacy_get_status_daily, axis=1)
+    return df
+
+# --- IMPLEMENTASI BARU (tabel aturan + NumPy select) ---
+
+def vectorized_rules(df):
+    df = df.copy()
+    df['Moves Category'], df['Lead Time'] = data_processing._apply_moves_rules(df['Daily Usage'])
+    df['Buffer Stock'] = df['Daily Usage'] * df['Lead Time']
+    df['Shortage'] = data_processing._clip_shortage(df['Buffer Stock'] - df['SOH'])
+    df['Status'], df['Action'] = data_processing._apply_status_rules(df['SOH'], df['Buffer Stock'], df['Shortage'])
+    df['Status_Replenishment'] = data_processing._apply_status_rules(
+        df['Cumulative_SOH'], df['Buffer Stock'], df['Shortage'], with_action=False
+    )
+    return df
+
+
+def make_frame(rows, seed=0):
+    """Data acak yang mencakup semua cabang aturan (usage 0, SOH negatif, rasio di sekitar batas)."""
+    rng = np.random.default_rng(seed)
+    usage = rng.choice([0.0, 0.05, 0.1, 0.5, 1.0, 2.5], rows) * rng.random(rows).round(1) * 2
+    soh = rng.integers(-20, 80, rows).astype(float)
+    return pd.DataFrame({
+        'Daily Usage': usage,
+        'SOH': soh,
+        'Cumulative_SOH': soh + rng.integers(-5, 5, rows),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+
+    start = time.perf_counter()
+    new = vectorized_rules(df)
+    t_new = time.perf_counter() - start
+
+    start = time.perf_counter()
+    old = legacy_rules(df)
+    t_old = time.perf_counter() - start
+
+    cols = ['Moves Category', 'Lead Time', 'Buffer Stock', 'Shortage', 'Status', 'Action', 'Status_Replenishment']
+    pd.testing.assert_frame_equal(old[cols], new[cols])
+
+    print(f"rows         : {args.rows:,}")
+    print(f"row-wise     : {t_old:8.2f} s")
+    print(f"vectorized   : {t_new:8.2f} s")
+    print(f"speedup      : {t_old / t_new:8.1f}x (hasil identik)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Server palsu (lokal, in-memory) untuk subset Google Sheets API v4 yang dipakai google_sheets.py.
+
+Dipakai untuk benchmark (tahap gsheet.* di bench_pipeline) & uji jalur baca-tulis GSheet tanpa jaringan dan tanpa kredensial:
+
+    server, client = start_fake_sheets({"Pivot": [], "Moves History": [], ...})
+    google_sheets.read_all_data(FAKE_SPREADSHEET_ID, None, client=client)
+    print(server.stats)   # jumlah request & sel yang ditulis
+    server.shutdown()
+
+Endpoint yang didukung: metadata spreadsheet, values:batchGet, values get/update/append/clear,
+values:batchUpdate, values:batchClear, dan :batchUpdate (addSheet, serta insertDimension/deleteDimension/
+appendDimension untuk baris/kolom; request lain diterima tanpa efek).
+Nilai USER_ENTERED di-parse seperti Sheets (angka -> number, 'YYYY-MM-DD HH:MM:SS' -> serial tanggal).
+write_quota_per_minute meniru kuota tulis per menit (request berlebih dibalas 429).
+"""
+import json
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import requests
+import gspread
+from gspread.urls import SPREADSHEETS_API_V4_BASE_URL
+
+
+FAKE_SPREADSHEET_ID = "fake-spreadsheet"
+SHEETS_EPOCH = datetime(1899, 12, 30)
+DEFAULT_ROWS, DEFAULT_COLS = 1000, 26
+
+_DATETIME_RE = re.compile(r"^\d{4}-\d{2}-\d{2}( \d{2}:\d{2}(:\d{2})?)?$")
+_NUMBER_RE = re.compile(r"^-?\d+(\.\d+)?([eE][-+]?\d+)?$")
+_CELL_RE = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def _col_index(letters):
+    index = 0
+    for ch in letters:
+        index = index * 26 + (ord(ch) - 64)
+    return index - 1
+
+
+def _parse_range(a1):
+    """"'Moves History'!A2:Q10" -> (nama sheet, baris0, kolom0, baris1|None, kolom1|None) (0-based, inklusif)."""
+    if "!" in a1:
+        sheet, cells = a1.rsplit("!", 1)
+    else:
+        sheet, cells = a1, ""
+    sheet = sheet.strip("'").replace("''", "'")
+    if not cells:
+        return sheet, 0, 0, None, None
+    start, _, end = cells.partition(":")
+    s_col, s_row = _CELL_RE.match(start).groups()
+    r0 = int(s_row) - 1 if s_row else 0
+    c0 = _col_index(s_col) if s_col else 0
+    if not end:
+        return sheet, r0, c0, (r0 if s_row else None), (c0 if s_col else None)
+    e_col, e_row = _CELL_RE.match(end).groups()
+    return sheet, r0, c0, (int(e_row) - 1 if e_row else None), (_col_index(e_col) if e_col else None)
+
+
+def _parse_user_entered(value):
+    """Meniru valueInputOption=USER_ENTERED: angka & tanggal menjadi nilai bertipe."""
+    if not isinstance(value, str):
+        return value
+    if value == "":
+        return None
+    if _NUMBER_RE.match(value):
+        number = float(value)
+        return int(number) if number.is_integer() and "." not in value else number
+    if _DATETIME_RE.match(value):
+        fmt = "%Y-%m-%d %H:%M:%S" if value.count(":") == 2 else ("%Y-%m-%d %H:%M" if ":" in value else "%Y-%m-%d")
+        delta = datetime.strptime(value, fmt) - SHEETS_EPOCH
+        return {"serial": delta.days + delta.seconds / 86_400}
+    return value
+
+
+def _render(cell, value_render, datetime_render):
+    """Nilai sel seperti di respons values.get."""
+    if isinstance(cell, dict):  # sel tanggal
+        if value_render == "UNFORMATTED_VALUE" and datetime_render == "SERIAL_NUMBER":
+            return cell["serial"]
+        moment = SHEETS_EPOCH + timedelta(seconds=round(cell["serial"] * 86_400))
+        return moment.strftime("%Y-%m-%d %H:%M:%S")
+    if cell is None:
+        return ""
+    if value_render == "UNFORMATTED_VALUE":
+        return cell
+    if isinstance(cell, float) and cell.is_integer():
+        return str(int(cell))
+    return str(cell)
+
+
+class FakeSheetsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, sheets, write_quota_per_minute=None):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.lock = threading.Lock()
+        self.sheets = {}
+        self.sheet_ids = {}
+        self.row_counts = {}  # ukuran grid (baris), termasuk baris kosong di bawah data
+        self.hidden = set()
+        for i, (name, rows) in enumerate(sheets.items()):
+            self.sheets[name] = [list(r) for r in rows]
+            self.sheet_ids[name] = i
+            self.row_counts[name] = max(DEFAULT_ROWS, len(rows))
+        self.stats = {"requests": 0, "read_requests": 0, "write_requests": 0, "metadata_requests": 0,
+                      "cells_written": 0, "quota_errors": 0}
+        self.fail_next = []  # daftar kode status HTTP yang dikembalikan untuk request berikutnya
+        self.write_quota_per_minute = write_quota_per_minute  # None = tanpa batas; lebih dari itu -> 429
+        self.write_times = deque()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v4/spreadsheets"
+
+    def over_quota(self):
+        """Jendela geser 60 detik seperti kuota tulis per menit Sheets API."""
+        if self.write_quota_per_minute is None:
+            return False
+        now = time.monotonic()
+        while self.write_times and now - self.write_times[0] >= 60:
+            self.write_times.popleft()
+        if len(self.write_times) >= self.write_quota_per_minute:
+            self.stats["quota_errors"] += 1
+            return True
+        self.write_times.append(now)
+        return False
+
+    # --- operasi data ---
+
+    def write(self, a1, values, user_entered=True):
+        sheet, r0, c0, _, _ = _parse_range(a1)
+        grid = self.sheets[sheet]
+        for i, row in enumerate(values):
+            target = r0 + i
+            while len(grid) <= target:
+                grid.append([])
+            grid_row = grid[target]
+            need = c0 + len(row)
+            if len(grid_row) < need:
+                grid_row.extend([None] * (need - len(grid_row)))
+            for j, value in enumerate(row):
+                grid_row[c0 + j] = _parse_user_entered(value) if user_entered else value
+        self.row_counts[sheet] = max(self.row_counts[sheet], len(grid))
+        self.stats["cells_written"] += sum(len(r) for r in values)
+        return {"updatedRange": a1, "updatedRows": len(values),
+                "updatedCells": sum(len(r) for r in values)}
+
+    def read(self, a1, value_render, datetime_render):
+        sheet, r0, c0, r1, c1 = _parse_range(a1)
+        grid = self.sheets[sheet]
+        rows = grid[r0:(r1 + 1 if r1 is not None else None)]
+        values = []
+        for row in rows:
+            cells = row[c0:(c1 + 1 if c1 is not None else None)]
+            rendered = [_render(c, value_render, datetime_render) for c in cells]
+            while rendered and rendered[-1] == "":  # Sheets memangkas sel kosong di akhir baris
+                rendered.pop()
+            values.append(rendered)
+        while values and not values[-1]:
+            values.pop()
+        result = {"range": a1, "majorDimension": "ROWS"}
+        if values:
+            result["values"] = values
+        return result
+
+    def clear(self, a1):
+        sheet, r0, c0, r1, c1 = _parse_range(a1)
+        grid = self.sheets[sheet]
+        for r in range(r0, min(len(grid), r1 + 1) if r1 is not None else len(grid)):
+            row = grid[r]
+            for c in range(c0, min(len(row), c1 + 1) if c1 is not None else len(row)):
+                row[c] = None
+        return {"clearedRange": a1}
+
+    def append(self, a1, values):
+        sheet = _parse_range(a1)[0]
+        grid = self.sheets[sheet]
+        last = len(grid)
+        while last > 0 and not any(c is not None for c in grid[last - 1]):
+            last -= 1
+        return {"updates": self.write(f"'{sheet}'!A{last + 1}", values)}
+
+    def add_sheet(self, properties):
+        name = properties["title"]
+        if name in self.sheets:
+            raise ValueError(f"Sheet '{name}' sudah ada")
+        self.sheets[name] = []
+        self.sheet_ids[name] = max(self.sheet_ids.values(), default=-1) + 1
+        self.row_counts[name] = properties.get("gridProperties", {}).get("rowCount", DEFAULT_ROWS)
+        if properties.get("hidden"):
+            self.hidden.add(name)
+        index = list(self.sheets).index(name)
+        return {"addSheet": self.metadata(FAKE_SPREADSHEET_ID)["sheets"][index]}
+
+    def update_dimensions(self, request):
+        """addSheet, insertDimension / deleteDimension (ROWS), appendDimension (ROWS/COLUMNS). Mengembalikan reply."""
+        kind, spec = next(iter(request.items()))
+        if kind == "addSheet":
+            return self.add_sheet(spec["properties"])
+        if kind not in ("insertDimension", "deleteDimension", "appendDimension"):
+            return {}
+        sheet_id = spec["sheetId"] if kind == "appendDimension" else spec["range"]["sheetId"]
+        sheet = next((name for name, sid in self.sheet_ids.items() if sid == sheet_id), None)
+        if sheet is None:
+            raise ValueError(f"No grid with id: {sheet_id}")
+        grid = self.sheets[sheet]
+        if kind == "appendDimension":
+            if spec.get("dimension", "ROWS") == "ROWS": # (Kolom: columnCount mengikuti DEFAULT_COLS / isi)
+                self.row_counts[sheet] += spec["length"]
+            return {}
+        start, end = spec["range"]["startIndex"], spec["range"]["endIndex"]
+        if kind == "insertDimension":
+            if start >= self.row_counts[sheet]:
+                raise ValueError("insertDimension di luar grid")
+            if start < len(grid):
+                grid[start:start] = [[] for _ in range(end - start)]
+            self.row_counts[sheet] += end - start
+        else:
+            del grid[start:end]
+            self.row_counts[sheet] -= min(end, self.row_counts[sheet]) - start
+            if self.row_counts[sheet] < 1:
+                raise ValueError("tidak bisa menghapus semua baris")
+        return {}
+
+    def metadata(self, spreadsheet_id):
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "properties": {"title": "Fake Dashboard", "locale": "en_US", "timeZone": "Asia/Jakarta"},
+            "sheets": [
+                {"properties": {
+                    "sheetId": self.sheet_ids[name], "title": name, "index": i, "sheetType": "GRID",
+                    "hidden": name in self.hidden,
+                    "gridProperties": {
+                        "rowCount": self.row_counts[name],
+                        "columnCount": max([DEFAULT_COLS] + [len(r) for r in rows]),
+                    },
+                }}
+                for i, (name, rows) in enumerate(self.sheets.items())
+            ],
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _handle(self, method):
+        server = self.server
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = unquote(url.path)[len("/v4/spreadsheets/"):]
+        spreadsheet_id, _, rest = path.partition("/")
+        if ":" in spreadsheet_id:
+            spreadsheet_id, _, action = spreadsheet_id.partition(":")
+            rest = ":" + action
+        body = self._body() if method in ("POST", "PUT") else {}
+
+        with server.lock:
+            server.stats["requests"] += 1
+            if server.fail_next:
+                status = server.fail_next.pop(0)
+                return self._reply(status, {"error": {"code": status, "message": "fake failure", "status": "UNAVAILABLE"}})
+            is_write = method in ("POST", "PUT") and rest != "values:batchGet"
+            if is_write and server.over_quota():
+                return self._reply(429, {"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}})
+            try:
+                value_render = query.get("valueRenderOption", ["FORMATTED_VALUE"])[0]
+                datetime_render = query.get("dateTimeRenderOption", ["SERIAL_NUMBER"])[0]
+                if rest == "" and method == "GET":
+                    server.stats["metadata_requests"] += 1
+                    return self._reply(200, server.metadata(spreadsheet_id))
+                if rest == ":batchUpdate":
+                    server.stats["write_requests"] += 1
+                    replies = [server.update_dimensions(request) for request in body.get("requests", [])]
+                    return self._reply(200, {"spreadsheetId": spreadsheet_id, "replies": replies})
+                if rest == "values:batchGet":
+                    server.stats["read_requests"] += 1
+                    ranges = [server.read(r, value_render, datetime_render) for r in query.get("ranges", [])]
+                    return self._reply(200, {"spreadsheetId": spreadsheet_id, "valueRanges": ranges})
+                if rest == "values:batchUpdate":
+                    server.stats["write_requests"] += 1
+                    user_entered = body.get("valueInputOption", "RAW") == "USER_ENTERED"
+                    responses = [server.write(d["range"], d.get("values", []), user_entered) for d in body.get("data", [])]
+                    return self._reply(200, {"spreadsheetId": spreadsheet_id, "responses": responses,
+                                             "totalUpdatedCells": sum(r["updatedCells"] for r in responses)})
+                if rest == "values:batchClear":
+                    server.stats["write_requests"] += 1
+                    return self._reply(200, {"clearedRanges": [server.clear(r)["clearedRange"] for r in body.get("ranges", [])]})
+                if rest.startswith("values/"):
+                    a1 = rest[len("values/"):]
+                    if a1.endswith(":append"):
+                        server.stats["write_requests"] += 1
+                        return self._reply(200, server.append(a1[:-len(":append")], body.get("values", [])))
+                    if a1.endswith(":clear"):
+                        server.stats["write_requests"] += 1
+                        return self._reply(200, server.clear(a1[:-len(":clear")]))
+                    if method == "PUT":
+                        server.stats["write_requests"] += 1
+                        user_entered = query.get("valueInputOption", ["RAW"])[0] == "USER_ENTERED"
+                        return self._reply(200, server.write(a1, body.get("values", []), user_entered))
+                    server.stats["read_requests"] += 1
+                    return self._reply(200, server.read(a1, value_render, datetime_render))
+            except KeyError as e:
+                return self._reply(400, {"error": {"code": 400, "message": f"Unable to parse range: {e}", "status": "INVALID_ARGUMENT"}})
+            except ValueError as e:
+                return self._reply(400, {"error": {"code": 400, "message": str(e), "status": "INVALID_ARGUMENT"}})
+        return self._reply(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+
+class _RedirectSession(requests.Session):
+    """Session yang mengarahkan URL Sheets API asli ke server palsu."""
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url
+
+    def request(self, method, url, *args, **kwargs):
+        if url.startswith(SPREADSHEETS_API_V4_BASE_URL):
+            url = self.base_url + url[len(SPREADSHEETS_API_V4_BASE_URL):]
+        return super().request(method, url, *args, **kwargs)
+
+
+def start_fake_sheets(sheets, write_quota_per_minute=None):
+    """Menjalankan server palsu di thread latar. Mengembalikan (server, gspread.Client)."""
+    server = FakeSheetsServer(sheets, write_quota_per_minute)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = gspread.Client(auth=None, session=_RedirectSession(server.base_url))
+    return server, client
@@ -0,0 +1,161 @@
+"""
+Generator data sintetis ekspor Odoo `stock.move.line` (Product Moves) untuk benchmark.
+
+Kolom mengikuti data_processing._validate_columns (+ 'Contact'). Pola pergerakan:
+vendor -> gudang pusat -> Pool/Bengkel Rekanan -> customer, ditambah transfer
+antar lokasi dan adjustment stok (Virtual Locations) sebanyak adjustment_ratio.
+
+Jalankan dari root repo:
+    python -m benchmarks.generate_moves --rows 1000000 --out moves_1m.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+# Lokasi tetap (nama mengikuti aturan kategori di data_processing.LOCATION_CATEGORY_RULES)
+CENTRAL_LOCATIONS = ["WH/Central Warehouse Pondok Indah/Stock", "Warehouse Bitung/Stock"]
+MANUFACTURE_LOCATIONS = ["CM Warehouse/Stock"]
+VENDOR_LOCATION = "Partners/Vendors"
+CUSTOMER_LOCATION = "Partners/Customers"
+ADJUSTMENT_LOCATION = "Virtual Locations/Inventory adjustment"
+ADJUSTMENT_REFERENCES = ["Product Quantity Updated", "Product Quantity Confirmed"]
+
+# Porsi jenis move (selain adjustment): (nama, bobot)
+MOVE_KINDS = [
+    ("receipt", 0.15),      # vendor -> gudang pusat
+    ("replenish", 0.35),    # gudang pusat -> Pool/Bengkel Rekanan
+    ("consume", 0.35),      # Pool/Bengkel Rekanan -> customer
+    ("transfer", 0.10),     # antar Pool/Bengkel Rekanan
+    ("manufacture", 0.05),  # gudang pusat <-> manufaktur
+]
+REFERENCE_PREFIX = {
+    "receipt": "WH/IN/", "replenish": "WH/INT/", "consume": "WH/OUT/",
+    "transfer": "WH/INT/", "manufacture": "WH/MO/",
+}
+
+DONE_RATIO = 0.95   # sisanya 'cancel' (dibuang oleh process_csv)
+START_DATE = pd.Timestamp("2024-01-01")
+
+
+def dashboard_locations(n_locations):
+    """Nama lokasi Pool & Bengkel Rekanan (setengah-setengah)."""
+    n_pool = max(n_locations // 2, 1)
+    n_bengkel = max(n_locations - n_pool, 1)
+    return (
+        [f"Pool {i:03d}/Stock" for i in range(n_pool)] +
+        [f"Bengkel Rekanan {i:03d}/Stock" for i in range(n_bengkel)]
+    )
+
+
+def generate_moves(n_rows, n_skus=2_000, n_locations=60, n_days=365,
+                   adjustment_ratio=0.05, n_users=25, seed=0):
+    """Mengembalikan DataFrame n_rows move line dengan format ekspor Odoo."""
+    rng = np.random.default_rng(seed)
+
+    skus = np.array([f"[SKU{i:06d}] Sparepart {i:06d}" for i in range(n_skus)], dtype=object)
+    users = np.array([f"User {i:03d}" for i in range(n_users)], dtype=object)
+    dash_locs = np.array(dashboard_locations(n_locations), dtype=object)
+    central = np.array(CENTRAL_LOCATIONS, dtype=object)
+    manufacture = np.array(MANUFACTURE_LOCATIONS, dtype=object)
+
+    # Popularitas SKU & lokasi tidak merata (Zipf-like), seperti data nyata
+    sku_weights = 1 / np.arange(1, n_skus + 1) ** 0.8
+    sku_idx = rng.choice(n_skus, n_rows, p=sku_weights / sku_weights.sum())
+    loc_weights = 1 / np.arange(1, len(dash_locs) + 1) ** 0.5
+    loc_p = loc_weights / loc_weights.sum()
+
+    src = np.empty(n_rows, dtype=object)
+    dst = np.empty(n_rows, dtype=object)
+    reference = np.empty(n_rows, dtype=object)
+
+    is_adj = rng.random(n_rows) < adjustment_ratio
+    names, weights = zip(*MOVE_KINDS)
+    kind = np.array(names, dtype=object)[rng.choice(len(names), n_rows, p=np.array(weights) / sum(weights))]
+    move_no = rng.integers(1, max(n_rows // 4, 2), n_rows).astype(str)
+
+    for name in names:
+        m = (kind == name) & ~is_adj
+        n = int(m.sum())
+        if name == "receipt":
+            src[m], dst[m] = VENDOR_LOCATION, central[rng.integers(0, len(central), n)]
+        elif name == "replenish":
+            src[m], dst[m] = central[rng.integers(0, len(central), n)], dash_locs[rng.choice(len(dash_locs), n, p=loc_p)]
+        elif name == "consume":
+            src[m], dst[m] = dash_locs[rng.choice(len(dash_locs), n, p=loc_p)], CUSTOMER_LOCATION
+        elif name == "transfer":
+            src[m], dst[m] = dash_locs[rng.choice(len(dash_locs), n, p=loc_p)], dash_locs[rng.choice(len(dash_locs), n, p=loc_p)]
+        else:
+            flip = rng.random(n) < 0.5
+            a, b = central[rng.integers(0, len(central), n)], manufacture[rng.integers(0, len(manufacture), n)]
+            src[m], dst[m] = np.where(flip, a, b), np.where(flip, b, a)
+        reference[m] = np.char.add(REFERENCE_PREFIX[name], move_no[m].astype(str)).astype(object)
+
+    # Adjustment: lokasi (dashboard/pusat) <-> Virtual Locations, arah acak
+    n_adj = int(is_adj.sum())
+    adj_loc = np.where(
+        rng.random(n_adj) < 0.8,
+        dash_locs[rng.choice(len(dash_locs), n_adj, p=loc_p)],
+        central[rng.integers(0, len(central), n_adj)]
+    )
+    increase = rng.random(n_adj) < 0.5
+    src[is_adj] = np.where(increase, ADJUSTMENT_LOCATION, adj_loc)
+    dst[is_adj] = np.where(increase, adj_loc, ADJUSTMENT_LOCATION)
+    reference[is_adj] = np.array(ADJUSTMENT_REFERENCES, dtype=object)[rng.integers(0, 2, n_adj)]
+
+    seconds = np.sort(rng.integers(0, n_days * 86_400, n_rows))
+    dates = (START_DATE + pd.to_timedelta(seconds, unit="s")).floor("min")
+
+    return pd.DataFrame({
+        "Date": dates.strftime("%Y-%m-%d %H:%M:%S"),
+        "Reference": reference,
+        "Product": skus[sku_idx],
+        "From": src,
+        "To": dst,
+        "Quantity": rng.integers(1, 25, n_rows).astype(float),
+        "Status": np.where(rng.random(n_rows) < DONE_RATIO, "done", "cancel"),
+        "Created by": users[rng.integers(0, n_users, n_rows)],
+        "Contact": np.where(kind == "receipt", "Vendor Sparepart", ""),
+    })
+
+
+def write_moves_csv(path, n_rows, batch_rows=1_000_000, **kwargs):
+    """Menulis CSV sintetis per batch (memori generator tetap terbatas untuk jutaan baris)."""
+    seed = kwargs.pop("seed", 0)
+    n_days = kwargs.pop("n_days", 365)
+    n_batches = max((n_rows + batch_rows - 1) // batch_rows, 1)
+    written = 0
+    for b in range(n_batches):
+        rows = min(batch_rows, n_rows - written)
+        # Tiap batch mencakup potongan rentang tanggal berikutnya agar urutan tanggal tetap naik
+        batch_days = max(n_days // n_batches, 1)
+        df = generate_moves(rows, n_days=batch_days, seed=seed + b, **kwargs)
+        df["Date"] = (pd.to_datetime(df["Date"]) + pd.Timedelta(days=b * batch_days)).dt.strftime("%Y-%m-%d %H:%M:%S")
+        df.to_csv(path, mode="w" if b == 0 else "a", header=(b == 0), index=False)
+        written += rows
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--skus", type=int, default=2_000)
+    parser.add_argument("--locations", type=int, default=60)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--adjustment-ratio", type=float, default=0.05)
+    parser.add_argument("--users", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    write_moves_csv(
+        args.out, args.rows,
+        n_skus=args.skus, n_locations=args.locations, n_days=args.days,
+        adjustment_ratio=args.adjustment_ratio, n_users=args.users, seed=args.seed
+    )
+    print(f"{args.rows:,} baris ditulis ke {args.out}")
+
+
+if __name__ == "__main__":
+    main()
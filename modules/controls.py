@@ -1,5 +1,5 @@
 import streamlit as st
-from modules import state_manager, google_sheets
+from modules import state_manager, google_sheets, upload_jobs
 from datetime import datetime
 import pandas as pd
 
@@ -11,17 +11,15 @@ def handle_refresh(spreadsheet_id, creds):
         # 1. Hapus cache data GSheet
         st.cache_data.clear()
         
-        # 2. Panggil fungsi load_initial_data (mengembalikan 5 nilai)
+        # 2. Panggil fungsi load_initial_data (mengembalikan 3 nilai)
         (
             pivot_df, 
             daily_soh_df, 
-            inbound_df, 
-            outbound_df, 
             update_time
-        ) = state_manager.load_initial_data(spreadsheet_id, creds)
+        ) = state_manager.load_initial_data(spreadsheet_id, creds, prefer_local=False)
         
         # 3. Sinkronkan data baru ke state
-        state_manager.sync_data_to_state(pivot_df, daily_soh_df, inbound_df, outbound_df, update_time)
+        state_manager.sync_data_to_state(pivot_df, daily_soh_df, update_time)
         st.toast("Data GSheet berhasil dimuat ulang!", icon="✅")
         
         # 4. (PERBAIKAN: Hapus st.rerun(), tidak perlu dalam callback)
@@ -31,7 +29,7 @@ def handle_refresh(spreadsheet_id, creds):
         # st.exception(e) # Uncomment untuk debug
 
 
-def handle_upload(uploaded_file, spreadsheet_id, creds):
+def handle_upload(uploaded_file, spreadsheet_id, creds, incremental=False):
     """Dipanggil saat tombol 'Proses & Update' ditekan."""
     if uploaded_file is None:
         st.warning("Harap unggah file CSV terlebih dahulu.", icon="⚠️")
@@ -41,32 +39,40 @@ def handle_upload(uploaded_file, spreadsheet_id, creds):
         with st.spinner("Memproses file CSV..."):
             # 1. Proses CSV
             (
-                inbound_df, 
-                outbound_df, 
                 pivot_df, 
                 daily_soh_df
-            ) = state_manager.handle_upload_csv(uploaded_file)
+            ) = state_manager.handle_upload_csv(uploaded_file, incremental=incremental)
             
             # (PERBAIKAN: Periksa apakah proses CSV gagal (misal: validasi kolom))
-            if inbound_df is None:
+            if pivot_df is None:
                 # Error sudah ditampilkan oleh data_processing.py
                 st.warning("Proses CSV gagal (lihat error di atas). Upload dibatalkan.", icon="⚠️")
                 return # Hentikan eksekusi
-
-        with st.spinner("Mengunggah data ke Google Sheet... (Ini mungkin perlu 1-2 menit)"):
-            # 2. Upload ke GSheet
-            update_time = state_manager.handle_upload_to_gsheet(
-                spreadsheet_id, creds, inbound_df, outbound_df, pivot_df, daily_soh_df
+            
+            stats = st.session_state.last_ingest_stats
+            st.toast(
+                f"{stats['new_lines']:,} baris baru diproses "
+                f"({stats['duplicate_lines']:,} duplikat, {stats['skipped_lines']:,} lama dilewati).",
+                icon="📥"
             )
-        
+
+        # (Hasil CSV sudah tersimpan di store lokal: dasbor langsung diperbarui tanpa menunggu GSheet)
         with st.spinner("Menyinkronkan data ke dasbor..."):
-            # 3. Hapus cache lama
+            # 2. Hapus cache lama
             st.cache_data.clear()
             
-            # 4. Sinkronkan data baru ke state
-            state_manager.sync_data_to_state(pivot_df, daily_soh_df, inbound_df, outbound_df, update_time)
+            # 3. Sinkronkan data baru ke state
+            state_manager.sync_data_to_state(pivot_df, daily_soh_df, datetime.now())
+        
+        # 4. Upload ke GSheet (mirror opsional) berjalan sebagai job latar; progres tampil di panel kontrol
+        job_id = None
+        if spreadsheet_id:
+            job_id = state_manager.start_gsheet_upload(spreadsheet_id, creds, pivot_df, daily_soh_df)
         
-        st.success("File CSV berhasil diproses dan diunggah ke Google Sheet!", icon="🎉")
+        if job_id:
+            st.success("File CSV berhasil diproses dan dasbor diperbarui. Upload ke Google Sheet berjalan di latar.", icon="🎉")
+        else:
+            st.warning("File CSV berhasil diproses dan disimpan lokal, tetapi tidak diunggah ke Google Sheet.", icon="⚠️")
         
         # 5. (PERBAIKAN: Hapus st.rerun(), tidak perlu dalam callback)
         
@@ -74,6 +80,79 @@ def handle_upload(uploaded_file, spreadsheet_id, creds):
         st.error(f"Gagal memproses unggahan: {e}", icon="🚨")
         # st.exception(e) # Uncomment untuk debug
 
+def handle_resume_upload(job_id, creds):
+    """Dipanggil saat tombol 'Lanjutkan Upload' ditekan."""
+    try:
+        if state_manager.resume_gsheet_upload(job_id, creds) is None:
+            st.error("Gagal mendapatkan klien Google Sheet untuk upload.", icon="🚨")
+    except Exception as e:
+        st.error(f"Gagal melanjutkan upload: {e}", icon="🚨")
+
+# --- PROGRES UPLOAD GSHEET (JOB LATAR) ---
+
+def _display_job_progress(job):
+    """Progress bar per sheet: langkah yang sudah dikonfirmasi server / total langkah."""
+    if job["status"] in ("queued", "planning"):
+        st.progress(0, text="Membandingkan data dengan isi Google Sheet...")
+        return
+    for ws_name, sheet in job["sheets"].items():
+        st.progress(
+            sheet["done_steps"] / max(sheet["total_steps"], 1),
+            text=f"{ws_name}: {sheet['done_steps']}/{sheet['total_steps']} request, {sheet['cells_written']:,} sel ditulis"
+        )
+
+@st.fragment(run_every=2)
+def _poll_upload_job():
+    """Diperbarui tiap 2 detik selama job berjalan (hanya fragment ini yang di-rerun)."""
+    job = upload_jobs.get_job(st.session_state.upload_job_id)
+    if job is None or job["status"] not in upload_jobs.ACTIVE_STATUSES:
+        st.rerun() # Job selesai/gagal: muat ulang halaman agar status & waktu update ikut diperbarui
+    st.caption(f"Upload ke Google Sheet berjalan di latar (job `{job['job_id']}`)...")
+    _display_job_progress(job)
+
+def display_upload_status(creds):
+    """Status job upload GSheet sesi ini, atau tawaran melanjutkan job yang terputus."""
+    job_id = st.session_state.upload_job_id
+    if job_id is None:
+        # (Mis. proses aplikasi sempat berhenti di tengah upload)
+        # Direktori job dipindai & dibersihkan sekali per sesi, bukan setiap rerun
+        if not st.session_state.resumable_job_checked:
+            st.session_state.resumable_job_id = upload_jobs.find_resumable_job()
+            st.session_state.resumable_job_checked = True
+        job_id = st.session_state.resumable_job_id
+        if job_id is not None:
+            # (Cukup baca checkpoint kandidat: bisa saja sudah dilanjutkan & selesai di sesi lain)
+            job = upload_jobs.get_job(job_id)
+            if job is None or job["status"] in ("done", "superseded"):
+                st.session_state.resumable_job_id = None
+                return
+            st.info("Ada upload Google Sheet sebelumnya yang belum selesai.", icon="⏸️")
+            st.button("▶️ Lanjutkan Upload", on_click=handle_resume_upload, args=(job_id, creds), key="resume_upload")
+        return
+    
+    job = upload_jobs.get_job(job_id)
+    if job is None:
+        return
+    if job["status"] in upload_jobs.ACTIVE_STATUSES:
+        _poll_upload_job()
+    elif job["status"] == "done":
+        stats = job["stats"]
+        if st.session_state.upload_job_synced != job_id: # (Sekali per job: hasil job masuk ke state sesi)
+            st.session_state.last_upload_stats = stats
+            st.session_state.last_gsheet_update = pd.Timestamp(job["finished"])
+            st.session_state.upload_job_synced = job_id
+        st.success(
+            f"Upload ke Google Sheet selesai: {stats['cells_written']:,} sel ditulis "
+            f"({stats['rows_changed']:,} baris berubah, {stats['rows_appended']:,} baru, {stats['rows_deleted']:,} dihapus).",
+            icon="📤"
+        )
+    elif job["status"] == "superseded":
+        st.info("Upload ini digantikan oleh upload yang lebih baru ke Google Sheet yang sama.", icon="⏭️")
+    else:
+        st.error(f"Upload ke Google Sheet gagal: {job['error']}", icon="🚨")
+        _display_job_progress(job)
+        st.button("▶️ Lanjutkan Upload", on_click=handle_resume_upload, args=(job_id, creds), key="resume_upload")
+
 # --- FUNGSI TAMPILAN UTAMA ---
 
 def display_controls(spreadsheet_id, creds):
@@ -96,6 +175,11 @@ def display_controls(spreadsheet_id, creds):
             type=["csv"],
             key="csv_uploader"
         )
+        st.toggle(
+            "Proses inkremental (hanya baris baru)",
+            key="incremental_upload",
+            help="Lanjutkan dari upload sebelumnya: hanya move line setelah tanggal terakhir yang diproses, saldo SOH dilanjutkan."
+        )
     
     with col_buttons:
         col_b1, col_b2 = st.columns(2)
@@ -103,7 +187,7 @@ def display_controls(spreadsheet_id, creds):
             st.button(
                 "🚀 Proses & Update GSheet",
                 on_click=handle_upload,
-                args=(st.session_state.csv_uploader, spreadsheet_id, creds),
+                args=(st.session_state.csv_uploader, spreadsheet_id, creds, st.session_state.incremental_upload),
                 use_container_width=True,
                 type="primary"
             )
@@ -115,6 +199,10 @@ def display_controls(spreadsheet_id, creds):
                 use_container_width=True
             )
         
+    # Status job upload GSheet (di bawah kolom; bisa memperbarui waktu update di bawah tombol)
+    display_upload_status(creds)
+
+    with col_buttons:
         # (PERBAIKAN: Logika caption dipindahkan ke DALAM col_buttons)
         # Tampilkan status pembaruan terakhir TEPAT DI BAWAH TOMBOL
         if st.session_state.last_gsheet_update:
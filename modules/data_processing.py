@@ -1,7 +1,13 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import re
+import os
+import json
 from datetime import timedelta
+from functools import lru_cache
+from modules.schema import PIVOT_COLS, MOVES_COLS, apply_categorical_schema
+from modules.local_store import DATA_DIR
 
 def _validate_columns(df):
     """Memvalidasi bahwa kolom yang diperlukan ada di CSV."""
@@ -17,152 +23,609 @@ def _validate_columns(df):
         return False
     return True
 
-def _categorize_location(loc_series):
+# --- ATURAN KATEGORI LOKASI ---
+
+# Dievaluasi berurutan (urutan ini penting): aturan pertama yang kata kuncinya
+# muncul di nama lokasi (tanpa memperhatikan huruf besar/kecil) yang dipakai.
+LOCATION_CATEGORY_RULES = [
+    # (Kategori, kata kunci)
+    ("Manufacture", ["CM Warehouse"]),
+    ("Central Warehouse", ["Central Warehouse Pondok Indah", "Warehouse Bitung"]),
+    ("Pool", ["Pool"]),
+    ("Bengkel Rekanan", ["Bengkel Rekanan"]),
+    ("Partners/Vendors", ["Partners/Vendors"]),
+    ("Virtual Locations", ["Virtual Locations"]),
+    ("Unknown", ["Unknown"]),
+]
+LOCATION_CATEGORY_DEFAULT = "Others" # Untuk yang tidak cocok
+
+# Cache kategori per nama lokasi, bertahan antar upload: {rules_key: {lokasi: kategori}}
+_location_category_cache = {}
+
+@lru_cache(maxsize=8)
+def _compile_location_matcher(rules_key):
     """
-    Menerapkan logika kategori lokasi baru yang diminta.
-    Urutan ini penting.
+    Mengompilasi tabel aturan menjadi satu regex. Setiap aturan adalah satu
+    alternatif lookahead; alternatif dicoba berurutan dari awal string, sehingga
+    aturan dengan prioritas tertinggi yang menang (bukan kecocokan paling kiri).
+    Nomor grup yang cocok (m.lastindex) = nomor aturan.
     """
-    loc_series_str = loc_series.astype(str) # Pastikan tipe data string
-    
-    conditions = [
-        loc_series_str.str.contains("CM Warehouse", case=False, na=False),
-        loc_series_str.str.contains("Central Warehouse Pondok Indah|Warehouse Bitung", case=False, na=False),
-        loc_series_str.str.contains("Pool", case=False, na=False),
-        loc_series_str.str.contains("Bengkel Rekanan", case=False, na=False),
-        loc_series_str.str.contains("Partners/Vendors", case=False, na=False),
-        loc_series_str.str.contains("Virtual Locations", case=False, na=False),
-        loc_series_str.str.contains("Unknown", case=False, na=False)
+    alternatives = [
+        "(?=.*?(" + "|".join(re.escape(keyword) for keyword in keywords) + "))"
+        for _, keywords in rules_key
     ]
-    choices = [
-        "Manufacture",
-        "Central Warehouse",
-        "Pool",
-        "Bengkel Rekanan",
-        "Partners/Vendors",
-        "Virtual Locations",
-        "Unknown"
-    ]
-    # Default 'Others' untuk yang tidak cocok
-    return np.select(conditions, choices, default="Others")
+    return re.compile("^(?:" + "|".join(alternatives) + ")", re.IGNORECASE | re.DOTALL)
+
+def _categorize_location(loc_series, rules=None):
+    """
+    Menerapkan logika kategori lokasi (LOCATION_CATEGORY_RULES).
+    Pencocokan hanya dilakukan sekali per lokasi unik yang belum pernah dilihat,
+    lalu hasilnya disebarkan kembali ke setiap baris lewat kode factorize.
+    """
+    rules = LOCATION_CATEGORY_RULES if rules is None else rules
+    rules_key = tuple((category, tuple(keywords)) for category, keywords in rules)
+    matcher = _compile_location_matcher(rules_key)
+    cache = _location_category_cache.setdefault(rules_key, {})
+
+    def categorize(location):
+        category = cache.get(location)
+        if category is None:
+            m = matcher.match(location)
+            category = rules_key[m.lastindex - 1][0] if m else LOCATION_CATEGORY_DEFAULT
+            cache[location] = category
+        return category
+
+    codes, uniques = pd.factorize(loc_series)
+    # Lokasi kosong (NaN) diperlakukan sebagai string 'nan', seperti astype(str)
+    categories = np.array([categorize(str(loc)) for loc in uniques] + [categorize('nan')], dtype=object)
+    return categories[codes] # (kode -1 / NaN -> elemen terakhir)
+
+# --- KONFIGURASI INGESTI ---
+
+# Jumlah baris CSV per chunk untuk mode streaming (lihat process_csv(chunksize=...))
+STREAM_CHUNK_SIZE = 100_000
+
+# Pola referensi transaksi adjustment (Updated / Confirmed)
+ADJUSTMENT_PATTERN = "Product Quantity Updated|Product Quantity Confirmed"
+
+# Kategori lokasi yang dikeluarkan dari Pivot & Moves History (tetap dihitung di SOH agregat)
+EXCLUDED_CATEGORIES = ['Virtual Locations', 'Partners/Vendors']
+
+# Kategori lokasi yang ditampilkan di Pivot & Moves History
+DASHBOARD_CATEGORIES = ['Pool', 'Bengkel Rekanan']
+
+ADJ_COLS = ['Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease']
+
+# --- KONFIGURASI INGESTI INKREMENTAL ---
+
+# Baris dengan tanggal >= (watermark - INCREMENTAL_OVERLAP) dicek ulang terhadap kunci
+# move yang sudah diingesti (ekspor harian biasanya tumpang tindih dengan ekspor sebelumnya).
+# Baris yang lebih lama dari jendela ini dianggap sudah diingesti dan dilewati.
+INCREMENTAL_OVERLAP = pd.Timedelta(days=1)
+
+# Kolom pembentuk kunci stabil sebuah move line
+MOVE_KEY_COLS = ['Date', 'Product', 'Reference', 'Quantity', 'From', 'To', 'Created by']
+
+# Lokasi state ingesti yang dipersist (agregat, saldo awal, watermark, kunci terbaru)
+INGEST_STATE_DIR = os.path.join(DATA_DIR, "ingest_state")
+INGEST_STATE_VERSION = 1
+
+# Kolom baris log yang disimpan selama streaming (cukup untuk membangun Moves History)
+_LOG_KEEP_COLS = [
+    'Date', 'Created by', 'Reference', 'Contact', 'Location', 'Location Category',
+    'SKU', 'SKU Name', 'Inbound_Qty', 'Outbound_Qty', 'Quantity', 'Type',
+    'Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease',
+    'Signed_Quantity', '_row'
+]
+
+# --- ATURAN REPLENISHMENT (Tabel Aturan Deklaratif) ---
 
-def process_csv(uploaded_file):
+# Moves Category & Lead Time berdasarkan Daily Usage.
+# Dievaluasi berurutan: aturan pertama dengan Daily Usage > batas yang dipakai.
+MOVES_CATEGORY_RULES = [
+    # (Daily Usage >, Moves Category, Lead Time (hari))
+    (1.0, "Fast", 21),
+    (0.1, "Medium", 14),
+]
+MOVES_CATEGORY_DEFAULT = ("Slow", 7)
+
+# Batas rasio SOH / Buffer Stock
+DANGER_SOH_RATIO = 0.5 # rasio < 0.5  -> Danger
+ALERT_SOH_RATIO = 1.0  # rasio <= 1.0 -> Alert
+
+# Status & template Action, dievaluasi berurutan (aturan pertama yang cocok menang).
+# '{shortage}' diganti dengan nilai Shortage yang dibulatkan.
+STATUS_RULES = [
+    # (kondisi, Status, template Action)
+    ("no_buffer_negative_soh", "🟥 Danger", "SOH Negatif!"),
+    ("no_buffer", "🟥 Danger", "Stok 0 Pemakaian (N/A)"), # N/A sekarang Danger
+    ("below_danger_ratio", "🟥 Danger", "Stok Kritis (<50% BS). Replenish {shortage} pcs."),
+    ("below_alert_ratio_with_shortage", "🟨 Alert", "Segera Replenish ({shortage} pcs)"),
+    ("below_alert_ratio", "🟨 Alert", "Stok di Buffer Level"),
+]
+STATUS_DEFAULT = ("🟩 Safe", "Stok Cukup")
+
+def _apply_moves_rules(daily_usage):
+    """Mengembalikan (Moves Category, Lead Time) untuk setiap Daily Usage (vektorisasi)."""
+    usage = np.asarray(daily_usage, dtype=float)
+    conditions = [usage > limit for limit, _, _ in MOVES_CATEGORY_RULES]
+    
+    category = np.select(
+        conditions, [cat for _, cat, _ in MOVES_CATEGORY_RULES], default=MOVES_CATEGORY_DEFAULT[0]
+    ).astype(object)
+    lead_time = np.select(
+        conditions, [lt for _, _, lt in MOVES_CATEGORY_RULES], default=MOVES_CATEGORY_DEFAULT[1]
+    ).astype(np.int64)
+    return category, lead_time
+
+def _clip_shortage(shortage):
+    """Shortage tidak boleh negatif (setara max(x, 0) per baris)."""
+    return shortage.mask(shortage < 0, 0)
+
+def _apply_status_rules(soh, buffer_stock, shortage, with_action=True):
     """
-    Memproses file CSV Odoo (moves.csv) menjadi 4 DataFrame utama 
-    dengan logika bisnis yang canggih.
+    Mengevaluasi STATUS_RULES secara vektorisasi.
+    Mengembalikan array Status, atau (Status, Action) jika with_action=True.
     """
+    soh = np.asarray(soh, dtype=float)
+    buffer_stock = np.asarray(buffer_stock, dtype=float)
+    shortage = np.asarray(shortage, dtype=float)
     
-    # --- LANGKAH 1: Muat & Validasi Data ---
-    try:
-        df = pd.read_csv(uploaded_file)
-    except Exception as e:
-        st.error(f"Gagal membaca file CSV: {e}", icon="🚨")
-        return {} # Kembalikan dict kosong jika gagal
+    no_buffer = buffer_stock == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        soh_ratio = np.where(no_buffer, np.nan, soh / buffer_stock)
+    
+    conditions = {
+        "no_buffer_negative_soh": no_buffer & (soh < 0),
+        "no_buffer": no_buffer,
+        "below_danger_ratio": soh_ratio < DANGER_SOH_RATIO,
+        "below_alert_ratio_with_shortage": (soh_ratio <= ALERT_SOH_RATIO) & (shortage > 0),
+        "below_alert_ratio": soh_ratio <= ALERT_SOH_RATIO,
+    }
+    
+    # Indeks aturan yang cocok per baris (default = aturan terakhir + 1)
+    rule_idx = np.select(
+        [conditions[name] for name, _, _ in STATUS_RULES],
+        np.arange(len(STATUS_RULES)),
+        default=len(STATUS_RULES)
+    )
+    
+    statuses = np.array([status for _, status, _ in STATUS_RULES] + [STATUS_DEFAULT[0]], dtype=object)
+    status = statuses[rule_idx]
+    if not with_action:
+        return status
+
+    templates = [template for _, _, template in STATUS_RULES] + [STATUS_DEFAULT[1]]
+    action = np.array(templates, dtype=object)[rule_idx]
+    for i, template in enumerate(templates):
+        mask = rule_idx == i
+        if '{shortage}' not in template or not mask.any():
+            continue
+        # (Setara f"{shortage:.0f}": pembulatan half-to-even)
+        prefix, suffix = template.split('{shortage}')
+        pcs = np.rint(shortage[mask]).astype(np.int64).astype(str).astype(object)
+        action[mask] = prefix + pcs + suffix
+    return status, action
 
-    if not _validate_columns(df):
-        return {} # Menghentikan eksekusi jika kolom tidak valid
+# Dimensi produk, bertahan antar upload: {Product: (SKU, SKU Name)}
+_product_dim_cache = {}
 
-    # Konversi tipe data awal
+def _parse_products(products):
+    """Parsing SKU & SKU Name dari teks Product, mis. '[ABC-01] Nama Barang'."""
+    sku = products.str.extract(r'\[(.*?)\]', expand=False).fillna('NO_SKU')
+    sku_name = products.str.replace(r'\[.*?\]\s*', '', regex=True).str.strip()
+    return sku, sku_name
+
+def _resolve_products(product_series):
+    """
+    Mengembalikan array (SKU, SKU Name) untuk setiap baris. Product di-factorize,
+    hanya Product unik yang belum ada di _product_dim_cache yang di-parsing,
+    lalu hasilnya digabung kembali ke baris lewat kode integer.
+    """
+    codes, uniques = pd.factorize(product_series)
+    
+    new_products = [p for p in uniques if p not in _product_dim_cache]
+    if new_products:
+        sku, sku_name = _parse_products(pd.Series(new_products, dtype=object))
+        _product_dim_cache.update(zip(new_products, zip(sku, sku_name)))
+    
+    # Product kosong (NaN, kode -1 -> elemen terakhir): SKU 'NO_SKU', SKU Name NaN
+    dim_sku = np.array([_product_dim_cache[p][0] for p in uniques] + ['NO_SKU'], dtype=object)
+    dim_name = np.array([_product_dim_cache[p][1] for p in uniques] + [np.nan], dtype=object)
+    return dim_sku[codes], dim_name[codes]
+
+def _prepare_moves(df):
+    """
+    Konversi tipe data awal, filter transaksi 'done', dan parsing SKU
+    untuk satu batch baris CSV (seluruh file atau satu chunk).
+    """
     df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
     df['Quantity'] = pd.to_numeric(df['Quantity'], errors='coerce').fillna(0)
     
-    # Filter hanya transaksi yang 'done'
-    df = df[df['Status'] == 'done'].copy()
+    # Filter hanya transaksi yang 'done' (dan bertanggal valid)
+    df = df[df['Status'] == 'done'].dropna(subset=['Date'])
     
-    # Buat kolom SKU
-    df['SKU'] = df['Product'].str.extract(r'\[(.*?)\]').fillna('NO_SKU')
-    df['SKU Name'] = df['Product'].str.replace(r'\[.*?\]\s*', '', regex=True).str.strip()
-
-    # --- LANGKAH 2: Buat merged_df (Data Transaksi Utama) ---
-    inbound_df_raw = df.copy()
-    outbound_df_raw = df.copy()
-    inbound_df_raw['Location'] = inbound_df_raw['To']
-    outbound_df_raw['Location'] = outbound_df_raw['From']
-    inbound_df_raw['Type'] = 'Inbound'
-    outbound_df_raw['Type'] = 'Outbound'
+    # Buat kolom SKU (lewat dimensi produk: parsing sekali per Product unik)
+    df['SKU'], df['SKU Name'] = _resolve_products(df['Product'])
+    
+    # Nomor baris CSV asli (index read_csv berlanjut antar chunk), dipakai
+    # sebagai tie-breaker agar urutan Moves History sama dengan mode non-streaming
+    df['_row'] = df.index
+    return df
 
-    merged_df = pd.concat([inbound_df_raw, outbound_df_raw], ignore_index=True)
+def _build_ledger(moves_df):
+    """
+    Membuat buku besar bertanda (signed ledger) dari moves_df: setiap move
+    menyumbang +qty ke lokasi 'To' (Inbound) dan -qty ke lokasi 'From' (Outbound).
+    
+    Ledger hanya berisi kolom kunci & kuantitas. Kolom teks lain (Reference,
+    Contact, Created by, ...) tidak digandakan; kolom tersebut diambil dari
+    moves_df lewat '_move' hanya untuk baris yang membutuhkannya (_ledger_rows).
+    """
+    n = len(moves_df)
+    qty = moves_df['Quantity'].to_numpy()
+    zeros = np.zeros_like(qty)
     
-    merged_df['Inbound_Qty'] = np.where(merged_df['Type'] == 'Inbound', merged_df['Quantity'], 0)
-    merged_df['Outbound_Qty'] = np.where(merged_df['Type'] == 'Outbound', merged_df['Quantity'], 0)
+    # Referensi adjustment dicek sekali per move, bukan per sisi
+    is_adj = moves_df['Reference'].str.contains(ADJUSTMENT_PATTERN, case=False, na=False).to_numpy()
 
-    # (PERBAIKAN: Buat 'Signed_Quantity' (Kuantitas Bertanda) untuk kalkulasi SOH (Stok di Tangan) yang benar)
-    merged_df['Signed_Quantity'] = np.where(
-        merged_df['Type'] == 'Inbound',
-        merged_df['Quantity'],  # Inbound (Inbound) adalah Positif
-        -merged_df['Quantity']  # Outbound (Outbound) adalah Negatif
-    )
+    def both_sides(col):
+        values = moves_df[col].to_numpy()
+        return np.concatenate([values, values])
+
+    ledger = pd.DataFrame({
+        '_move': np.tile(np.arange(n), 2), # Posisi baris di moves_df
+        'Date': both_sides('Date'),
+        'SKU': both_sides('SKU'),
+        'SKU Name': both_sides('SKU Name'),
+        'Location': np.concatenate([moves_df['To'].to_numpy(), moves_df['From'].to_numpy()]),
+        'Type': np.repeat(np.array(['Inbound', 'Outbound'], dtype=object), n),
+        'Inbound_Qty': np.concatenate([qty, zeros]),
+        'Outbound_Qty': np.concatenate([zeros, qty]),
+        # (Inbound adalah Positif, Outbound adalah Negatif)
+        'Signed_Quantity': np.concatenate([qty, -qty]),
+        '_is_adj': np.concatenate([is_adj, is_adj]),
+    })
 
     # Buat Kategori Lokasi
-    merged_df['Location Category'] = _categorize_location(merged_df['Location'])
+    ledger['Location Category'] = _categorize_location(ledger['Location'])
     
     # (PERBAIKAN BUG 1a: Gunakan 'Signed_Quantity' (Kuantitas Bertanda) untuk Adjustment Qty (Kuantitas Penyesuaian))
-    adj_mask = merged_df['Reference'].str.contains("Product Quantity Updated|Product Quantity Confirmed", case=False, na=False)
-    merged_df['Adjustment Qty'] = np.where(adj_mask, merged_df['Signed_Quantity'], 0)
+    ledger['Adjustment Qty'] = np.where(ledger['_is_adj'], ledger['Signed_Quantity'], 0)
 
     # (FITUR BARU: Pisahkan Adjustment Increase dan Decrease)
-    merged_df['Adjustment Increase'] = np.where(merged_df['Adjustment Qty'] > 0, merged_df['Adjustment Qty'], 0)
-    merged_df['Adjustment Decrease'] = np.where(merged_df['Adjustment Qty'] < 0, merged_df['Adjustment Qty'], 0)
+    ledger['Adjustment Increase'] = np.where(ledger['Adjustment Qty'] > 0, ledger['Adjustment Qty'], 0)
+    ledger['Adjustment Decrease'] = np.where(ledger['Adjustment Qty'] < 0, ledger['Adjustment Qty'], 0)
+
+    return ledger
 
-    merged_df['Date'] = pd.to_datetime(merged_df['Date'], errors='coerce')
-    merged_df = merged_df.dropna(subset=['Date']) 
+def _ledger_rows(ledger, moves_df, mask, columns):
+    """
+    Mematerialisasi baris ledger terpilih (satu baris per sisi) dengan kolom
+    dari moves_df, hanya untuk baris pada 'mask'.
+    """
+    rows = ledger[mask]
+    move_idx = rows['_move'].to_numpy()
     
-    merged_df = merged_df.sort_values(by=['Location', 'SKU', 'Date'])
+    out = {}
+    for col in columns:
+        if col in rows.columns:
+            out[col] = rows[col].to_numpy()
+        elif col in moves_df.columns:
+            out[col] = moves_df[col].to_numpy()[move_idx]
+        else:
+            out[col] = np.full(len(rows), np.nan) # (Kolom opsional, mis. 'Contact')
+    return pd.DataFrame(out, columns=columns)
+
+def _accumulate(running, partial):
+    """Menjumlahkan agregat parsial (Series/DataFrame ber-index grup) ke agregat berjalan."""
+    if running is None:
+        return partial
+    levels = list(range(partial.index.nlevels))
+    return pd.concat([running, partial]).groupby(level=levels).sum()
+
+def _new_ingest_state():
+    """
+    State agregat berjalan untuk ingesti (dipakai mode penuh, streaming, dan inkremental).
+    State hasil satu upload dapat dipersist (save_ingest_state) lalu dilanjutkan
+    pada upload berikutnya dengan process_csv(..., state=...).
+    """
+    return {
+        "soh": None,        # Signed_Quantity per (SKU, Location Category) -> Central/Manufacture SOH
+        "adj": None,        # Adjustment per (SKU, Location), sebelum filter kategori
+        "pivot": None,      # Inbound/Outbound per (SKU, SKU Name, Location, Location Category)
+        "usage": None,      # Outbound non-adjustment per (SKU, Location, Date), jendela 90 hari
+        "usage_max_date": None,
+        "log": [],          # Baris Pool/Bengkel Rekanan BARU (belum dihitung SOH Kumulatif-nya)
+        "history": None,    # Baris Moves History yang sudah di-commit (dengan Cumulative_SOH)
+        "balances": None,   # Saldo awal: Cumulative_SOH terakhir per (Location, SKU)
+        "watermark": None,  # Tanggal move terbaru yang sudah diingesti
+        "recent_keys": None, # Kunci move (uint64) -> Date, untuk baris dalam jendela overlap
+    }
+
+def _move_keys(moves_df, run):
+    """
+    Kunci stabil (uint64) per move line: hash kolom MOVE_KEY_COLS ditambah nomor
+    kemunculan, sehingga baris yang benar-benar identik tetap dihitung terpisah.
+    run["key_counts"] menyimpan jumlah kemunculan per hash selama satu run (antar chunk).
+    """
+    hashes = pd.util.hash_pandas_object(moves_df[MOVE_KEY_COLS], index=False)
+    occurrence = hashes.groupby(hashes.to_numpy()).cumcount()
+    counts = hashes.value_counts()
+    if run["key_counts"] is not None:
+        occurrence = occurrence + run["key_counts"].reindex(hashes.to_numpy()).fillna(0).to_numpy(dtype=np.int64)
+        counts = counts.add(run["key_counts"], fill_value=0)
+    run["key_counts"] = counts
     
-    # (PERBAIKAN: Gunakan 'Signed_Quantity' (Kuantitas Bertanda) untuk SOH (Stok di Tangan) "Debet/Kredit" (Debit/Kredit) yang benar)
-    merged_df['Cumulative_SOH'] = merged_df.groupby(['Location', 'SKU'])['Signed_Quantity'].cumsum()
+    return pd.util.hash_pandas_object(
+        pd.DataFrame({'hash': hashes.to_numpy(), 'occurrence': occurrence.to_numpy()}), index=False
+    ).to_numpy()
 
-    # --- LANGKAH 3: Hitung SOH Agregat (untuk Visibilitas) ---
-    # (PERBAIKAN: Gunakan 'Signed_Quantity' (Kuantitas Bertanda) untuk SOH (Stok di Tangan) Agregat)
-    soh_agg_df = merged_df.groupby(['SKU', 'Location Category'])['Signed_Quantity'].sum().unstack(fill_value=0)
+def _select_new_moves(state, moves_df, run):
+    """
+    Menyaring moves_df menjadi baris yang belum pernah diingesti:
+    - baris lebih lama dari (watermark - INCREMENTAL_OVERLAP) dilewati,
+    - baris di jendela overlap dibandingkan dengan kunci move yang sudah ada.
+    Kunci baris baru di dekat tanggal terbaru dicatat di run["keys"].
+    """
+    chunk_max = moves_df['Date'].max()
+    if pd.notna(chunk_max) and (run["max_date"] is None or chunk_max > run["max_date"]):
+        run["max_date"] = chunk_max
+    if run["max_date"] is None or moves_df.empty:
+        return moves_df
     
-    soh_to_merge = pd.DataFrame(index=soh_agg_df.index)
-    if 'Central Warehouse' in soh_agg_df.columns:
-        soh_to_merge['Central_SOH'] = soh_agg_df['Central Warehouse']
-    if 'Manufacture' in soh_agg_df.columns:
-        soh_to_merge['Manufacture_SOH'] = soh_agg_df['Manufacture']
+    if state["watermark"] is not None:
+        stale = moves_df['Date'] < state["watermark"] - INCREMENTAL_OVERLAP
+        run["skipped_lines"] += int(stale.sum())
+        moves_df = moves_df[~stale]
+        # Semua baris tersisa bisa saja duplikat dari upload sebelumnya
+        candidates = moves_df
+    else:
+        # Upload pertama: kunci hanya perlu untuk baris dekat tanggal terbaru
+        # (tanggal maks hanya bisa naik; identik = tanggal sama, jadi hitungan kemunculan konsisten)
+        candidates = moves_df[moves_df['Date'] >= run["max_date"] - INCREMENTAL_OVERLAP]
+    if candidates.empty:
+        return moves_df
+    
+    keys = _move_keys(candidates, run)
+    
+    if state["recent_keys"] is not None and not state["recent_keys"].empty:
+        is_dup = np.isin(keys, state["recent_keys"].index.to_numpy())
+        if is_dup.any():
+            run["duplicate_lines"] += int(is_dup.sum())
+            moves_df = moves_df.drop(index=candidates.index[is_dup])
+            keys, candidates = keys[~is_dup], candidates[~is_dup]
+    
+    run["keys"].append(pd.Series(candidates['Date'].to_numpy(), index=pd.Index(keys, name='key'), name='Date'))
+    return moves_df
+
+def _fold_chunk(state, moves_df, ledger):
+    """Melipat satu chunk (moves_df + ledger-nya) ke dalam agregat berjalan."""
+    
+    # SOH Agregat per Kategori Lokasi (untuk Central & Manufacture SOH)
+    state["soh"] = _accumulate(
+        state["soh"],
+        ledger.groupby(['SKU', 'Location Category'])['Signed_Quantity'].sum()
+    )
+    
+    # Adjustment per (SKU, Location) SEBELUM difilter (PERBAIKAN BUG 1b)
+    state["adj"] = _accumulate(
+        state["adj"],
+        ledger.groupby(['SKU', 'Location'])[ADJ_COLS].sum()
+    )
+
+    keep = ~ledger['Location Category'].isin(EXCLUDED_CATEGORIES)
+    ledger_filtered = ledger[keep]
+    
+    state["pivot"] = _accumulate(
+        state["pivot"],
+        ledger_filtered.groupby(['SKU', 'SKU Name', 'Location', 'Location Category'])[['Inbound_Qty', 'Outbound_Qty']].sum()
+    )
 
-    # --- LANGKAH 3.5 (BARU): Agregasi Adjustment Qty (Kuantitas Penyesuaian) SEBELUM difilter ---
-    # (PERBAIKAN BUG 1b: Ini memperbaiki 'Adjustment Qty = 0' di pivot)
-    # (UPDATE: Tambahkan Increase dan Decrease ke agregasi)
-    adj_agg_unfiltered = merged_df.groupby(['SKU', 'Location']).agg({
-        'Adjustment Qty': 'sum',
-        'Adjustment Increase': 'sum',
-        'Adjustment Decrease': 'sum'
-    }).reset_index()
+    # Kandidat Daily Usage: SEMUA outbound KECUALI adjustment
+    usage_rows = ledger_filtered[(ledger_filtered['Type'] == 'Outbound') & ~ledger_filtered['_is_adj']]
+    if not usage_rows.empty:
+        state["usage"] = _accumulate(
+            state["usage"],
+            usage_rows.groupby(['SKU', 'Location', 'Date'])['Outbound_Qty'].sum()
+        )
+        chunk_max = usage_rows['Date'].max()
+        if state["usage_max_date"] is None or chunk_max > state["usage_max_date"]:
+            state["usage_max_date"] = chunk_max
+        
+        # Buang baris yang sudah pasti di luar jendela 90 hari (tanggal maks hanya bisa naik)
+        usage_dates = state["usage"].index.get_level_values('Date')
+        state["usage"] = state["usage"][(state["usage_max_date"] - usage_dates).days <= 90]
 
-    # --- LANGKAH 4: Filter merged_df (setelah menghitung SOH agregat) ---
-    merged_df_filtered = merged_df[~merged_df['Location Category'].isin(['Virtual Locations', 'Partners/Vendors'])]
+    # Hanya baris Pool/Bengkel Rekanan yang dimaterialisasi dengan kolom teks lengkap
+    log_mask = keep & ledger['Location Category'].isin(DASHBOARD_CATEGORIES)
+    state["log"].append(_ledger_rows(ledger, moves_df, log_mask, _LOG_KEEP_COLS))
+
+def _compute_daily_usage(state):
+    """Daily Usage = total outbound (non-adjustment) 90 hari terakhir / 90, per (SKU, Location)."""
+    if state["usage"] is None or state["usage"].empty:
+        return pd.DataFrame(columns=['SKU', 'Location', 'Daily Usage'])
     
-    # --- LANGKAH 5: Logika Pivot Table (Tabel Pivot) Canggih ---
+    usage = state["usage"].reset_index()
+    usage['Days Since'] = (state["usage_max_date"] - usage['Date']).dt.days
+    usage = usage[usage['Days Since'] <= 90]
     
-    # 5a. Hitung Daily Usage (Pemakaian Harian)
-    # (PERBAIKAN "Best Practice" (Praktik Terbaik): Ambil SEMUA outbound KECUALI adjustment)
-    # Ini akan memperbaiki bug 'Status' (Status) N/A
-    adjustment_refs = ["Product Quantity Updated", "Product Quantity Confirmed"]
-    usage_df = merged_df_filtered[
-        (merged_df_filtered['Type'] == 'Outbound') &
-        (~merged_df_filtered['Reference'].str.contains("|".join(adjustment_refs), case=False, na=False))
-    ].copy()
-    
-    if not usage_df.empty:
-        usage_df['Date'] = pd.to_datetime(usage_df['Date'], errors='coerce')
-        usage_df = usage_df.dropna(subset=['Date']) 
+    usage_agg = usage.groupby(['SKU', 'Location'])['Outbound_Qty'].sum()
+    return (usage_agg / 90).reset_index(name='Daily Usage')
+
+# --- PERSISTENSI STATE INGESTI (untuk upload inkremental berikutnya) ---
+
+# Komponen state berbentuk tabel; disimpan sebagai Parquet (index di-reset ke kolom)
+_STATE_TABLES = ['soh', 'adj', 'pivot', 'usage', 'history', 'balances', 'recent_keys']
+_STATE_SCALARS = ['usage_max_date', 'watermark']
+
+def save_ingest_state(state, path=None):
+    """Menyimpan state ingesti ke folder (Parquet per tabel + meta.json)."""
+    path = path or INGEST_STATE_DIR
+    os.makedirs(path, exist_ok=True)
+    meta = {"version": INGEST_STATE_VERSION, "tables": {}}
+    
+    for name in _STATE_TABLES:
+        obj = state.get(name)
+        if obj is None:
+            continue
+        is_series = isinstance(obj, pd.Series)
+        frame = obj.to_frame(name=obj.name or name) if is_series else obj
+        index_names = [n for n in frame.index.names if n is not None]
+        frame = frame.reset_index() if index_names else frame.reset_index(drop=True)
+        frame.to_parquet(os.path.join(path, f"{name}.parquet"), index=False)
+        meta["tables"][name] = {"series": is_series, "index": index_names}
+    
+    for name in _STATE_SCALARS:
+        meta[name] = state[name].isoformat() if state.get(name) is not None else None
+    
+    # meta.json ditulis terakhir: state hanya dianggap valid jika meta.json ada
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+def load_ingest_state(path=None):
+    """Memuat state ingesti yang tersimpan; None jika belum ada atau versinya berbeda."""
+    path = path or INGEST_STATE_DIR
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("version") != INGEST_STATE_VERSION:
+        return None
+    
+    state = _new_ingest_state()
+    for name, info in meta["tables"].items():
+        frame = pd.read_parquet(os.path.join(path, f"{name}.parquet"))
+        if info["index"]:
+            frame = frame.set_index(info["index"])
+        state[name] = frame.iloc[:, 0] if info["series"] else frame
+    
+    for name in _STATE_SCALARS:
+        state[name] = pd.Timestamp(meta[name]) if meta.get(name) else None
+    return state
+
+def _read_csv_batches(uploaded_file, chunksize):
+    """Menghasilkan DataFrame per batch: seluruh file (chunksize=None) atau per chunk."""
+    if chunksize is None:
+        yield pd.read_csv(uploaded_file)
+    else:
+        with pd.read_csv(uploaded_file, chunksize=chunksize) as reader:
+            for chunk in reader:
+                yield chunk
+
+def process_csv(uploaded_file, chunksize=None, state=None):
+    """
+    Memproses file CSV Odoo (moves.csv) menjadi 2 DataFrame utama (pivot_df, daily_soh_df)
+    dengan logika bisnis yang canggih. (Inbound/Outbound: schema.split_moves_by_type)
+    
+    chunksize: jika diisi, CSV dibaca per chunk (mode streaming) dan setiap chunk
+    dilipat ke agregat berjalan, sehingga memori puncak tidak bergantung pada
+    ukuran file (hanya pada jumlah grup dan baris Moves History).
+    
+    state: state ingesti dari upload sebelumnya (load_ingest_state). Jika diisi,
+    hanya move line setelah watermark yang diproses (mode inkremental) dan state
+    tersebut diperbarui di tempat. Hasil selalu menyertakan "ingest_state".
+    """
+    
+    # --- LANGKAH 1 & 2: Muat, Validasi, dan Lipat Data per Batch ---
+    state = _new_ingest_state() if state is None else state
+    run = {
+        "max_date": None, "key_counts": None, "keys": [],
+        "new_lines": 0, "duplicate_lines": 0, "skipped_lines": 0
+    }
+    batches = _read_csv_batches(uploaded_file, chunksize)
+    is_first_batch = True
+    
+    while True:
+        try:
+            raw_df = next(batches, None)
+        except Exception as e:
+            st.error(f"Gagal membaca file CSV: {e}", icon="🚨")
+            return {} # Kembalikan dict kosong jika gagal
+        
+        if raw_df is None:
+            break
         
-        usage_df['Days Since'] = (usage_df['Date'].max() - usage_df['Date']).dt.days
-        usage_df = usage_df[usage_df['Days Since'] <= 90] 
+        if is_first_batch:
+            if not _validate_columns(raw_df):
+                return {} # Menghentikan eksekusi jika kolom tidak valid
+            is_first_batch = False
         
-        usage_agg = usage_df.groupby(['SKU', 'Location'])['Outbound_Qty'].sum()
-        usage_df = (usage_agg / 90).reset_index(name='Daily Usage')
+        moves_df = _select_new_moves(state, _prepare_moves(raw_df), run)
+        del raw_df # Lepaskan chunk mentah sebelum membuat ledger
+        run["new_lines"] += len(moves_df)
+        if not moves_df.empty:
+            _fold_chunk(state, moves_df, _build_ledger(moves_df))
+
+    if state["soh"] is None:
+        st.error("Tidak ada transaksi 'done' dengan tanggal valid di file CSV.", icon="🚨")
+        return {}
+
+    _commit_watermark(state, run)
+    df_dict = _finalize_state(state)
+    df_dict["ingest_state"] = state
+    df_dict["ingest_stats"] = {
+        "new_lines": run["new_lines"],
+        "duplicate_lines": run["duplicate_lines"],
+        "skipped_lines": run["skipped_lines"],
+        "watermark": state["watermark"],
+    }
+    return df_dict
+
+def _commit_watermark(state, run):
+    """Memperbarui watermark dan memangkas kunci move di luar jendela overlap."""
+    if run["max_date"] is not None and (state["watermark"] is None or run["max_date"] > state["watermark"]):
+        state["watermark"] = run["max_date"]
+    
+    keys = [k for k in [state["recent_keys"]] + run["keys"] if k is not None and not k.empty]
+    if not keys or state["watermark"] is None:
+        return
+    recent_keys = pd.concat(keys)
+    state["recent_keys"] = recent_keys[recent_keys >= state["watermark"] - INCREMENTAL_OVERLAP]
+
+def _commit_log(new_log, history, balances):
+    """
+    Mengurutkan baris log baru, menghitung SOH Kumulatif per (Location, SKU)
+    dengan melanjutkan saldo awal dari upload sebelumnya, lalu meng-commit-nya ke history.
+    Mengembalikan (history, balances) yang baru.
+    """
+    # ('Type' & '_row' menjaga urutan seri: Inbound dulu, lalu urutan baris CSV)
+    new_log = new_log.sort_values(by=['Location', 'SKU', 'Date', 'Type', '_row'])
+    
+    # (PERBAIKAN: Gunakan 'Signed_Quantity' (Kuantitas Bertanda) untuk SOH (Stok di Tangan) "Debet/Kredit" (Debit/Kredit) yang benar)
+    signed = new_log['Signed_Quantity']
+    if balances is not None and not new_log.empty:
+        # Saldo awal ditambahkan ke baris pertama tiap grup agar cumsum berlanjut
+        group_keys = pd.MultiIndex.from_frame(new_log[['Location', 'SKU']])
+        opening = balances.reindex(group_keys).fillna(0).to_numpy()
+        is_first = ~new_log.duplicated(subset=['Location', 'SKU']).to_numpy()
+        signed = signed + np.where(is_first, opening, 0)
+    new_log['Cumulative_SOH'] = signed.groupby([new_log['Location'], new_log['SKU']]).cumsum()
+    new_log = new_log.drop(columns=['_row'])
+    
+    # Baris lama didahulukan untuk tanggal yang sama (sort stabil)
+    if history is not None:
+        history = pd.concat([history, new_log], ignore_index=True)
+        history = history.sort_values(by=['Location', 'SKU', 'Date'], kind='stable', ignore_index=True)
     else:
-        usage_df = pd.DataFrame(columns=['SKU', 'Location', 'Daily Usage'])
+        history = new_log.reset_index(drop=True)
+    
+    last_balances = new_log.groupby(['Location', 'SKU'])['Cumulative_SOH'].last()
+    balances = last_balances if balances is None else last_balances.combine_first(balances)
+    return history, balances
+
+# --- FINALISASI: PIPELINE PER (Location, SKU) ---
 
-    # 5b. Buat Pivot Table (Tabel Pivot) Agregat per Lokasi
-    # (PERBAIKAN BUG OVERCOUNTING (PERHITUNGAN BERLEBIH): Hapus 'SOH' (Stok di Tangan) dari .agg())
-    # (PERBAIKAN BUG 1b: Hapus 'Adjustment_Qty' (Kuantitas Penyesuaian) dari .agg() ini)
-    pivot_df = merged_df_filtered.groupby(['SKU', 'SKU Name', 'Location', 'Location Category']).agg(
-        Inbound_Qty=('Inbound_Qty', 'sum'),
-        Outbound_Qty=('Outbound_Qty', 'sum')
-    ).reset_index()
+# Kolom yang ditambahkan ke log saat enrichment (tidak disimpan di history)
+_LOG_ENRICH_COLS = ['Daily Usage', 'Moves Category', 'Lead Time', 'Buffer Stock', 'Shortage', 'Status_Replenishment']
+
+def _finalize_groups(pivot_df, usage_df, adj_df, new_log, history, balances):
+    """
+    Pipeline per (Location, SKU): Daily Usage, aturan pivot, SOH Kumulatif,
+    dan enrichment Moves History. Mengembalikan (pivot_df, log_df, balances).
+    """
+    # --- LANGKAH 5: Logika Pivot Table (Tabel Pivot) Canggih ---
     
     # (PERBAIKAN BUG OVERCOUNTING (PERHITUNGAN BERLEBIH): Hitung SOH (Stok di Tangan) dari In/Out)
     pivot_df['SOH'] = pivot_df['Inbound_Qty'] - pivot_df['Outbound_Qty']
@@ -171,53 +634,23 @@ def process_csv(uploaded_file):
     pivot_df = pd.merge(pivot_df, usage_df, on=['SKU', 'Location'], how='left')
     
     # (PERBAIKAN BUG 1b: Gabungkan (Merge) 'adj_agg_unfiltered' (Kuantitas Penyesuaian agregat yang tidak difilter) yang sudah kita hitung)
-    pivot_df = pd.merge(pivot_df, adj_agg_unfiltered, on=['SKU', 'Location'], how='left')
-
-    # 5d. Gabungkan (Merge) SOH Agregat (Central & Manufacture)
-    if not soh_to_merge.empty:
-        pivot_df = pd.merge(pivot_df, soh_to_merge, on='SKU', how='left')
+    pivot_df = pd.merge(pivot_df, adj_df, on=['SKU', 'Location'], how='left')
     
     # 5e. Isi NaN dan Hitung Metrik Turunan
     if 'Daily Usage' not in pivot_df.columns: pivot_df['Daily Usage'] = 0.0
-    if 'Central_SOH' not in pivot_df.columns: pivot_df['Central_SOH'] = 0.0
-    if 'Manufacture_SOH' not in pivot_df.columns: pivot_df['Manufacture_SOH'] = 0.0
-    
     pivot_df['Daily Usage'] = pivot_df['Daily Usage'].fillna(0)
-    pivot_df['Central_SOH'] = pivot_df['Central_SOH'].fillna(0)
-    pivot_df['Manufacture_SOH'] = pivot_df['Manufacture_SOH'].fillna(0)
 
-    # Logika Kategori Pergerakan & Waktu Tunggu
-    def get_moves_info(daily_usage):
-        if daily_usage > 1.0: return "Fast", 21
-        elif daily_usage > 0.1: return "Medium", 14
-        else: return "Slow", 7
-    
-    pivot_df[['Moves Category', 'Lead Time']] = pivot_df['Daily Usage'].apply(
-        lambda x: pd.Series(get_moves_info(x))
-    )
+    # Logika Kategori Pergerakan & Waktu Tunggu (MOVES_CATEGORY_RULES)
+    pivot_df['Moves Category'], pivot_df['Lead Time'] = _apply_moves_rules(pivot_df['Daily Usage'])
 
     # Logika Buffer Stock (Stok Penyangga) / Safety Stock (Stok Pengaman)
     pivot_df['Buffer Stock'] = pivot_df['Daily Usage'] * pivot_df['Lead Time']
-    pivot_df['Shortage'] = (pivot_df['Buffer Stock'] - pivot_df['SOH']).apply(lambda x: max(x, 0))
-
-    # Logika Status 🟥 🟨 🟩 dan Action (Tindakan)
-    def get_status_and_action(row):
-        # (PERBAIKAN: Mengubah 'N/A' menjadi '🟥 Danger')
-        if row['Buffer Stock'] == 0:
-            if row['SOH'] < 0: return "🟥 Danger", "SOH Negatif!"
-            return "🟥 Danger", "Stok 0 Pemakaian (N/A)" # N/A sekarang Danger
-        
-        soh_ratio = row['SOH'] / row['Buffer Stock']
-        
-        if soh_ratio < 0.5:
-            return "🟥 Danger", f"Stok Kritis (<50% BS). Replenish {row['Shortage']:.0f} pcs."
-        elif soh_ratio <= 1:
-            if row['Shortage'] > 0: return "🟨 Alert", f"Segera Replenish ({row['Shortage']:.0f} pcs)"
-            else: return "🟨 Alert", "Stok di Buffer Level"
-        else:
-            return "🟩 Safe", "Stok Cukup"
-            
-    pivot_df[['Status', 'Action']] = pivot_df.apply(get_status_and_action, axis=1, result_type='expand')
+    pivot_df['Shortage'] = _clip_shortage(pivot_df['Buffer Stock'] - pivot_df['SOH'])
+
+    # Logika Status 🟥 🟨 🟩 dan Action (Tindakan) (STATUS_RULES)
+    pivot_df['Status'], pivot_df['Action'] = _apply_status_rules(
+        pivot_df['SOH'], pivot_df['Buffer Stock'], pivot_df['Shortage']
+    )
     
     # (PERBAIKAN: Pindahkan 'Adjustment Qty' ke sini, setelah semua merge selesai)
     for col in ['Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease']:
@@ -225,67 +658,83 @@ def process_csv(uploaded_file):
             pivot_df[col] = 0.0
         pivot_df[col] = pivot_df[col].fillna(0)
 
-    # 5f. Filter Pivot agar hanya menampilkan "Pool" dan "Bengkel Rekanan"
-    pivot_df = pivot_df[pivot_df['Location Category'].isin(['Pool', 'Bengkel Rekanan'])].copy()
+    # --- LANGKAH 6: Buat DataFrame 'Moves History' (Log Harian) ---
+    
+    # 6a. Hitung SOH Kumulatif untuk baris log baru dan commit ke history
+    if new_log is not None:
+        history, balances = _commit_log(new_log, history, balances)
+    
+    # 6b. Gabungkan (Merge) 'Daily Usage' (Pemakaian Harian) ke log (untuk Moves Category (Kategori Pergerakan))
+    log_df = pd.merge(history, usage_df, on=['SKU', 'Location'], how='left')
+    log_df['Daily Usage'] = log_df['Daily Usage'].fillna(0)
+    
+    # 6c. Terapkan Moves Category (Kategori Pergerakan) & Buffer Stock (Stok Penyangga) ke log
+    log_df['Moves Category'], log_df['Lead Time'] = _apply_moves_rules(log_df['Daily Usage'])
+    log_df['Buffer Stock'] = log_df['Daily Usage'] * log_df['Lead Time']
+    log_df['Shortage'] = _clip_shortage(log_df['Buffer Stock'] - log_df['Cumulative_SOH'])
 
-    # 5g. Tentukan kolom final
-    cols_pivot = [
-        'SKU', 'SKU Name', 'Location', 'Location Category', 
-        'Status', 'Action', 'SOH', 
-        'Inbound_Qty', 'Outbound_Qty', 
-        'Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease',
-        'Daily Usage', 'Moves Category', 'Lead Time', 
-        'Buffer Stock', 'Shortage', 
-        'Central_SOH', 'Manufacture_SOH'
-    ]
-    pivot_df = pivot_df.reindex(columns=cols_pivot).fillna(0)
+    # 6d. Terapkan Status (Status) 🟥 🟨 🟩 ke log (menggunakan SOH Kumulatif)
+    log_df['Status_Replenishment'] = _apply_status_rules(
+        log_df['Cumulative_SOH'],
+        log_df['Buffer Stock'],
+        log_df['Shortage'],
+        with_action=False
+    )
+    return pivot_df, log_df, balances
 
-    # --- LANGKAH 6: Buat DataFrame 'Moves History' (Log Harian) ---
+def _finalize_state(state):
+    """Membangun pivot_df dan daily_soh_df dari agregat berjalan."""
     
-    # 6a. Gabungkan (Merge) 'Daily Usage' (Pemakaian Harian) ke merged_df (untuk Moves Category (Kategori Pergerakan))
-    merged_df_filtered = pd.merge(merged_df_filtered, usage_df, on=['SKU', 'Location'], how='left')
-    merged_df_filtered['Daily Usage'] = merged_df_filtered['Daily Usage'].fillna(0)
+    # --- LANGKAH 3: SOH Agregat (untuk Visibilitas) ---
+    # (PERBAIKAN: Gunakan 'Signed_Quantity' (Kuantitas Bertanda) untuk SOH (Stok di Tangan) Agregat)
+    soh_agg_df = state["soh"].unstack(fill_value=0)
     
-    # 6b. Terapkan Moves Category (Kategori Pergerakan) & Buffer Stock (Stok Penyangga) ke merged_df
-    merged_df_filtered[['Moves Category', 'Lead Time']] = merged_df_filtered['Daily Usage'].apply(
-        lambda x: pd.Series(get_moves_info(x))
+    soh_to_merge = pd.DataFrame(index=soh_agg_df.index)
+    if 'Central Warehouse' in soh_agg_df.columns:
+        soh_to_merge['Central_SOH'] = soh_agg_df['Central Warehouse']
+    if 'Manufacture' in soh_agg_df.columns:
+        soh_to_merge['Manufacture_SOH'] = soh_agg_df['Manufacture']
+
+    # --- LANGKAH 3.5 - 6: Pipeline per (Location, SKU) ---
+    # (5a: Daily Usage, 5b: Pivot agregat per lokasi, 3.5: Adjustment SEBELUM difilter)
+    pivot_df, log_df, balances = _finalize_groups(
+        pivot_df=state["pivot"].reset_index(),
+        usage_df=_compute_daily_usage(state),
+        adj_df=state["adj"].reset_index(),
+        new_log=pd.concat(state["log"], ignore_index=True) if state["log"] else None,
+        history=state["history"],
+        balances=state["balances"],
     )
-    merged_df_filtered['Buffer Stock'] = merged_df_filtered['Daily Usage'] * merged_df_filtered['Lead Time']
-    merged_df_filtered['Shortage'] = (merged_df_filtered['Buffer Stock'] - merged_df_filtered['Cumulative_SOH']).apply(lambda x: max(x, 0))
-
-    # 6c. Terapkan Status (Status) 🟥 🟨 🟩 ke merged_df (menggunakan SOH Kumulatif)
-    def get_status_daily(row):
-        # (PERBAIKAN: Mengubah 'N/A' menjadi '🟥 Danger')
-        if row['Buffer Stock'] == 0:
-            if row['Cumulative_SOH'] < 0: return "🟥 Danger"
-            return "🟥 Danger" # N/A sekarang Danger
-        soh_ratio = row['Cumulative_SOH'] / row['Buffer Stock']
-        if soh_ratio < 0.5: return "🟥 Danger"
-        elif soh_ratio <= 1: return "🟨 Alert"
-        else: return "🟩 Safe"
-            
-    merged_df_filtered['Status_Replenishment'] = merged_df_filtered.apply(get_status_daily, axis=1)
-
-    log_df = merged_df_filtered[merged_df_filtered['Location Category'].isin(['Pool', 'Bengkel Rekanan'])].copy()
-    log_df['Status'] = 'done' 
-    
-    cols_moves = [
-        'Date', 'Created by', 'Reference', 'Contact', 'Location', 'Location Category', 
-        'SKU', 'SKU Name', 'Inbound_Qty', 'Outbound_Qty', 'Quantity', 
-        'Status_Replenishment', 
-        'Type', 
-        'Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease', 'Cumulative_SOH'
-    ]
     
-    daily_soh_df = log_df.reindex(columns=cols_moves).sort_values(by=['Location', 'SKU', 'Date'], ascending=True)
+    state["history"] = log_df.drop(columns=_LOG_ENRICH_COLS)
+    state["balances"] = balances
+    state["log"] = []
+
+    # 5d. Gabungkan (Merge) SOH Agregat (Central & Manufacture)
+    if not soh_to_merge.empty:
+        pivot_df = pd.merge(pivot_df, soh_to_merge, on='SKU', how='left')
     
-    # --- LANGKAH 7: Buat DataFrame Inbound & Outbound (Log Spesifik) ---
-    inbound_df = daily_soh_df[daily_soh_df['Type'] == 'Inbound'].reindex(columns=cols_moves).sort_values(by=['Location', 'SKU', 'Date'], ascending=True)
-    outbound_df = daily_soh_df[daily_soh_df['Type'] == 'Outbound'].reindex(columns=cols_moves).sort_values(by=['Location', 'SKU', 'Date'], ascending=True)
+    if 'Central_SOH' not in pivot_df.columns: pivot_df['Central_SOH'] = 0.0
+    if 'Manufacture_SOH' not in pivot_df.columns: pivot_df['Manufacture_SOH'] = 0.0
+    pivot_df['Central_SOH'] = pivot_df['Central_SOH'].fillna(0)
+    pivot_df['Manufacture_SOH'] = pivot_df['Manufacture_SOH'].fillna(0)
+
+    # 5f. Filter Pivot agar hanya menampilkan "Pool" dan "Bengkel Rekanan"
+    pivot_df = pivot_df[pivot_df['Location Category'].isin(DASHBOARD_CATEGORIES)].copy()
 
+    # 5g. Tentukan kolom final
+    pivot_df = pivot_df.reindex(columns=PIVOT_COLS).fillna(0)
+    
+    # (log_df sudah terurut per Location, SKU, Date di 6a; merge 'left' menjaga urutan)
+    daily_soh_df = log_df.reindex(columns=MOVES_COLS)
+    
+    # Skema kategorikal (dictionary-encoded) untuk kolom teks
+    pivot_df = apply_categorical_schema(pivot_df)
+    daily_soh_df = apply_categorical_schema(daily_soh_df)
+    
+    # (Inbound & Outbound tidak dibuat di sini: diturunkan dari daily_soh_df saat ditampilkan,
+    #  lihat schema.split_moves_by_type)
     return {
         "pivot_df": pivot_df,
         "daily_soh_df": daily_soh_df,
-        "inbound_df": inbound_df,
-        "outbound_df": outbound_df
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,138 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from modules import filters, filter_index, metrics_cube
+
+# --- REGISTRI DATASET BERSAMA (per proses, read-only) ---
+
+# Dataset dibagi semua sesi Streamlit di proses ini; sesi hanya menyimpan dataset_version
+# dan state filternya. Frame di registri TIDAK BOLEH diubah in-place: filter, KPI, dan
+# visual selalu membuat frame turunan (hasil filter tanpa filter = frame registri itu sendiri).
+DATASET_KEEP_VERSIONS = 2 # Versi terbaru yang dipertahankan; sesi dengan versi lama pindah ke terbaru
+
+_DATASETS = {} # version -> dataset (dict), urut dari yang terlama
+_DATASETS_LOCK = threading.Lock()
+_VERSION_COUNTER = itertools.count(1)
+
+# Cache hasil filter (posisi baris, bukan frame; kecuali kubus hasil filter di luar dimensi kubus)
+# per (version, filter ternormalisasi), LRU & dibatasi ukuran
+FILTER_CACHE_MAX_ENTRIES = 64
+FILTER_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+_FILTER_CACHE = OrderedDict() # (version, filter_key) -> tuple posisi baris (array numpy atau None = semua baris) / kubus hasil filter
+_FILTER_CACHE_LOCK = threading.Lock()
+
+def _display_frame(daily_soh_df, dates):
+    """'Date' -> objek date (bentuk yang dipakai tampilan, KPI & chart) dari tanggal yang sudah diparse."""
+    daily_soh_df = daily_soh_df.copy(deep=False) # (Salinan dangkal: kolom lain berbagi data dengan frame asal)
+    daily_soh_df['Date'] = dates.dt.date
+    return daily_soh_df
+
+def _find(key=None, daily_soh_df=None):
+    """Dataset dengan key sama atau yang frame-nya adalah daily_soh_df. Dipanggil dengan _DATASETS_LOCK dipegang."""
+    for dataset in reversed(_DATASETS.values()):
+        if (key is not None and dataset["key"] == key) or dataset["daily_soh_df"] is daily_soh_df:
+            return dataset
+    return None
+
+def publish(pivot_df, daily_soh_df, update_time, key=None):
+    """
+    Mendaftarkan dataset (pivot_df, daily_soh_df) dan mengembalikan version-nya.
+    key: penanda isi (mis. storage version). Jika key sudah terdaftar, atau frame yang dikirim
+    adalah frame registri sendiri (dari find/get), version yang ada dipakai ulang: sesi baru
+    yang memuat data yang sama tidak menambah salinan.
+    """
+    with _DATASETS_LOCK:
+        dataset = _find(key, daily_soh_df)
+        if dataset is not None:
+            return dataset["version"]
+
+    # 'Date' diparse sekali: kolom tampilan (objek date), indeks tanggal terurut, dan kubus metrik harian
+    dates = pd.to_datetime(daily_soh_df['Date'], errors='coerce')
+    display_df = _display_frame(daily_soh_df, dates)
+    filter_options = filters.filter_options(display_df)
+    daily_index = filter_index.build_index(display_df, filter_index.DAILY_INDEX_COLS)
+    pivot_index = filter_index.build_index(pivot_df, filter_index.PIVOT_INDEX_COLS)
+    date_index = filter_index.build_date_index(dates)
+    cube, cube_dates = metrics_cube.build_cube(display_df, dates)
+    with _DATASETS_LOCK:
+        dataset = _find(key) # (Sesi lain mungkin sudah mendaftarkan isi yang sama)
+        if dataset is not None:
+            return dataset["version"]
+        version = f"v{next(_VERSION_COUNTER)}"
+        _DATASETS[version] = {
+            "version": version,
+            "key": key,
+            "pivot_df": pivot_df,
+            "daily_soh_df": display_df,
+            "update_time": update_time,
+            "filter_options": filter_options, # (Opsi panel filter: sekali per dataset, bukan per rerun)
+            "daily_index": daily_index, # (Indeks terbalik per dimensi filter, lihat filter_index)
+            "pivot_index": pivot_index,
+            "date_index": date_index, # (Rentang tanggal via searchsorted, lihat filter_index.date_rows)
+            "cube": cube, # (Kubus metrik harian untuk KPI & chart, lihat metrics_cube)
+            "cube_index": filter_index.build_index(cube, metrics_cube.CUBE_INDEX_COLS),
+            "cube_date_index": filter_index.build_date_index(cube_dates),
+        }
+        while len(_DATASETS) > DATASET_KEEP_VERSIONS:
+            del _DATASETS[next(iter(_DATASETS))]
+        live_versions = set(_DATASETS)
+    with _FILTER_CACHE_LOCK:
+        for cache_key in [k for k in _FILTER_CACHE if k[0] not in live_versions]:
+            del _FILTER_CACHE[cache_key] # (Hasil filter versi yang sudah dibuang)
+    return version
+
+def get(version):
+    """Dataset untuk version ini, atau None jika tidak ada / sudah digantikan versi yang lebih baru."""
+    with _DATASETS_LOCK:
+        return _DATASETS.get(version)
+
+def find(key):
+    """Dataset terdaftar dengan key ini, atau None."""
+    if key is None:
+        return None
+    with _DATASETS_LOCK:
+        return _find(key)
+
+def latest():
+    """Dataset terbaru, atau None jika registri masih kosong."""
+    with _DATASETS_LOCK:
+        return next(reversed(_DATASETS.values()), None)
+
+def _nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    return value.nbytes
+
+def _rows_nbytes(rows):
+    return sum(_nbytes(positions) for positions in rows if positions is not None)
+
+def cached_rows(version, filter_key, compute):
+    """
+    Posisi baris hasil filter untuk (version, filter_key); compute() hanya dipanggil jika belum ada di cache.
+    compute() mengembalikan tuple array posisi (atau None = semua baris; boleh juga frame turunan kecil,
+    mis. kubus hasil filter, yang tidak boleh diubah pemanggil). Dataset read-only, sehingga
+    hasilnya valid selama version itu ada: rerun yang hanya mengganti halaman / kembali ke kombinasi
+    filter sebelumnya tidak memfilter ulang.
+    """
+    cache_key = (version, filter_key)
+    with _FILTER_CACHE_LOCK:
+        rows = _FILTER_CACHE.get(cache_key)
+        if rows is not None:
+            _FILTER_CACHE.move_to_end(cache_key)
+            return rows
+
+    rows = compute() # (Di luar lock: sesi lain tidak menunggu filter yang lambat)
+    if _rows_nbytes(rows) > FILTER_CACHE_MAX_BYTES:
+        return rows
+    with _FILTER_CACHE_LOCK:
+        _FILTER_CACHE[cache_key] = rows
+        _FILTER_CACHE.move_to_end(cache_key)
+        total_bytes = sum(_rows_nbytes(cached) for cached in _FILTER_CACHE.values())
+        while len(_FILTER_CACHE) > FILTER_CACHE_MAX_ENTRIES or total_bytes > FILTER_CACHE_MAX_BYTES:
+            _, evicted = _FILTER_CACHE.popitem(last=False)
+            total_bytes -= _rows_nbytes(evicted)
+    return rows
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+# --- INDEKS TERBALIK PER DIMENSI FILTER (dibangun sekali per dataset, read-only) ---
+
+# Per kolom: kode nilai per baris + daftar posisi baris (terurut) per nilai ("postings").
+# Filter = gabungan postings nilai terpilih dalam satu dimensi, irisan antar dimensi:
+# dimulai dari dimensi terpilih yang paling sempit, dimensi lain dicek lewat kode baris kandidat,
+# sehingga biayanya sebanding jumlah baris kandidat, bukan jumlah baris Moves History.
+DAILY_INDEX_COLS = ['Location Category', 'Location', 'SKU', 'SKU Name', 'Created by', 'Reference', 'Type']
+PIVOT_INDEX_COLS = ['Location Category', 'Location', 'Status', 'SKU', 'SKU Name']
+
+def positions(mask):
+    """Mask boolean -> posisi baris (int32 jika cukup), atau None jika semua baris lolos."""
+    if mask.all():
+        return None
+    rows = np.flatnonzero(mask)
+    return rows.astype(np.int32) if len(mask) < 2**31 else rows
+
+def _column_codes(series):
+    """(kode per baris, nilai unik) dengan kode 0 = kosong (NaN), nilai ke-i = kode i+1."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, values = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, values = pd.factorize(series)
+        values = pd.Index(values)
+    return (codes.astype(np.int32) + 1), values
+
+def build_index(df, cols):
+    """Indeks terbalik untuk kolom cols yang ada di df: {kolom: {codes, values, rows, offsets}}."""
+    index = {}
+    for col in cols:
+        if col not in df.columns:
+            continue
+        codes, values = _column_codes(df[col])
+        rows = np.argsort(codes, kind='stable') # (Stabil: posisi per nilai tetap terurut)
+        rows = rows.astype(np.int32) if len(df) < 2**31 else rows
+        offsets = np.zeros(len(values) + 2, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(values) + 1), out=offsets[1:])
+        index[col] = {"codes": codes, "values": values, "rows": rows, "offsets": offsets}
+    return index
+
+def _selected_codes(entry, selected):
+    """Kode untuk nilai terpilih (nilai yang tidak ada di kolom diabaikan; NaN -> kode 0 seperti isin)."""
+    selected = pd.Index(np.asarray(selected, dtype=object))
+    codes = entry["values"].get_indexer(selected.dropna()) + 1
+    codes = codes[codes > 0]
+    if selected.hasnans:
+        codes = np.append(codes, 0)
+    return np.unique(codes)
+
+def rows_where(df, rows, col, selected, index=None):
+    """
+    Subset posisi rows (None = semua baris) yang nilai col-nya ada di selected. Mengembalikan array terurut.
+    Dengan indeks: rows=None -> gabungan postings; selain itu cek kode baris kandidat saja.
+    """
+    entry = (index or {}).get(col)
+    if entry is None:
+        values = df[col] if rows is None else df[col].iloc[rows]
+        mask = values.isin(selected).to_numpy()
+        return np.flatnonzero(mask).astype(np.int32) if rows is None else rows[mask]
+
+    codes = _selected_codes(entry, selected)
+    if rows is None:
+        offsets = entry["offsets"]
+        return np.sort(np.concatenate(
+            [entry["rows"][offsets[code]:offsets[code + 1]] for code in codes] or [entry["rows"][:0]]
+        ))
+    lookup = np.zeros(len(entry["values"]) + 1, dtype=bool)
+    lookup[codes] = True
+    return rows[lookup[entry["codes"][rows]]]
+
+def _postings_size(entry, selected):
+    offsets = entry["offsets"]
+    codes = _selected_codes(entry, selected)
+    return int((offsets[codes + 1] - offsets[codes]).sum())
+
+def select_rows(df, selections, index=None, rows=None):
+    """
+    Posisi baris (dari rows, None = semua) yang lolos semua filter {kolom: nilai terpilih};
+    pilihan kosong diabaikan. Mengembalikan None jika tidak ada filter sama sekali.
+    Semantik sama dengan df[col].isin(nilai) digabung dengan & antar kolom.
+    """
+    selections = {col: selected for col, selected in selections.items() if len(selected)}
+    if not selections:
+        return rows
+    if index is None:
+        mask = np.ones(len(df), dtype=bool)
+        for col, selected in selections.items():
+            mask &= df[col].isin(selected).to_numpy()
+        return np.flatnonzero(mask).astype(np.int32) if rows is None else rows[mask[rows]]
+
+    # Dimensi tersempit dulu (ukuran postings diketahui tanpa membaca baris)
+    order = sorted(
+        selections,
+        key=lambda col: _postings_size(index[col], selections[col]) if col in index else len(df)
+    )
+    for col in order:
+        rows = rows_where(df, rows, col, selections[col], index)
+    return rows
+
+# --- INDEKS TANGGAL TERURUT (datetime64[D], searchsorted) ---
+
+def build_date_index(dates):
+    """
+    Indeks sekunder tanggal: hari (datetime64[D]) terurut + posisi baris yang sesuai (NaT tidak diindeks).
+    dates: Series datetime64 (sudah diparse sekali saat dataset dipublikasikan).
+    Frame sendiri tidak diurutkan ulang menurut tanggal: urutan baris Moves History (Location, SKU, waktu)
+    dipakai tabel & Cumulative_SOH .last(), dan kolom 'Date'-nya tetap objek date untuk tampilan.
+    Karena itu date_rows mengurutkan posisi hasil rentang (kecuali frame memang sudah urut tanggal).
+    """
+    days = dates.to_numpy().astype('datetime64[D]')
+    valid = ~np.isnat(days)
+    rows = np.flatnonzero(valid)
+    order = np.argsort(days[valid], kind='stable') # (Stabil: posisi per hari tetap terurut)
+    rows = rows[order]
+    rows = rows.astype(np.int32) if len(days) < 2**31 else rows
+    return {
+        "days": days[valid][order],
+        "rows": rows,
+        "n_rows": len(days),
+        # Frame sudah urut tanggal (tanpa NaT): rentang = irisan posisi berurutan, tanpa sort
+        "in_row_order": bool(valid.all() and (order[1:] > order[:-1]).all()),
+    }
+
+def date_rows(date_index, start_date, end_date):
+    """
+    Posisi baris (terurut) dengan tanggal di [start_date, end_date] (date, inklusif), lewat searchsorted
+    pada hari terurut: rentang menjadi satu irisan berurutan. None jika semua baris masuk rentang.
+    """
+    days = date_index["days"]
+    start = np.searchsorted(days, np.datetime64(start_date, 'D'), side='left')
+    end = np.searchsorted(days, np.datetime64(end_date, 'D'), side='right')
+    if start == 0 and end == date_index["n_rows"]:
+        return None
+    rows = date_index["rows"][start:end]
+    return rows if date_index["in_row_order"] else np.sort(rows)
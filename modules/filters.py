@@ -67,12 +67,23 @@ def set_date_filter():
         st.session_state.selected_dates = dates
         st.session_state.period_label = label
 
-def display_filters(df: pd.DataFrame):
+# Kolom Moves History yang menjadi opsi multiselect
+FILTER_OPTION_COLS = ['Location Category', 'Location', 'Status_Replenishment', 'SKU', 'SKU Name', 'Created by', 'Reference']
+
+def filter_options(df: pd.DataFrame):
+    """{kolom: nilai unik terurut} dari Moves History untuk display_filters (kosong jika df kosong)."""
+    if df.empty:
+        return {}
+    # (PERBAIKAN: .dropna() untuk mengatasi TypeError float vs str)
+    return {col: sorted(df[col].dropna().unique()) for col in FILTER_OPTION_COLS if col in df.columns}
+
+def display_filters(options: dict):
     """
-    Menampilkan 8 filter dinamis (4x2 grid).
+    Menampilkan 8 filter dinamis (4x2 grid) dari opsi filter_options()
+    (atau backend penyimpanan, lihat storage.StorageBackend.filter_options).
     (PERBAIKAN: Menggunakan 'key' dan 'on_change' untuk manajemen state)
     """
-    if df.empty:
+    if not options:
         st.info("Data mentah (Moves History) kosong, filter tidak dapat dibuat.", icon="ℹ️")
         return
         
@@ -101,20 +112,17 @@ def display_filters(df: pd.DataFrame):
 
     with col2:
         # Filter 2: Kategori Lokasi
-        options = sorted(df['Location Category'].dropna().unique())
-        st.multiselect("Pilih Kategori Lokasi", options, key="selected_cat_loc")
+        st.multiselect("Pilih Kategori Lokasi", options['Location Category'], key="selected_cat_loc")
 
     with col3:
         # Filter 3: Lokasi Spesifik
-        options = sorted(df['Location'].dropna().unique())
-        st.multiselect("Pilih Lokasi Spesifik", options, key="selected_spec_loc")
+        st.multiselect("Pilih Lokasi Spesifik", options['Location'], key="selected_spec_loc")
 
     with col4:
         # Filter 4: Status (dari Pivot)
-        if 'Status_Replenishment' in df.columns:
-            options = sorted(df['Status_Replenishment'].dropna().unique())
+        if 'Status_Replenishment' in options:
             # (PERBAIKAN: Pastikan 'key' benar)
-            st.multiselect("Pilih Status Replenishment", options, key="selected_statuses")
+            st.multiselect("Pilih Status Replenishment", options['Status_Replenishment'], key="selected_statuses")
         else:
             st.warning("Kolom 'Status_Replenishment' tidak ditemukan.")
 
@@ -123,21 +131,16 @@ def display_filters(df: pd.DataFrame):
 
     with col5:
         # Filter 5: SKU
-        options = sorted(df['SKU'].dropna().unique())
-        st.multiselect("Pilih SKU", options, key="selected_skus")
+        st.multiselect("Pilih SKU", options['SKU'], key="selected_skus")
 
     with col6:
         # Filter 6: SKU Name
-        options = sorted(df['SKU Name'].dropna().unique())
-        st.multiselect("Pilih SKU Name", options, key="selected_sku_names")
+        st.multiselect("Pilih SKU Name", options['SKU Name'], key="selected_sku_names")
 
     with col7:
         # Filter 7: Dibuat Oleh (Created by)
-        # (PERBAIKAN: Tambahkan .dropna() untuk mengatasi TypeError float vs str)
-        options = sorted(df['Created by'].dropna().unique())
-        st.multiselect("Pilih Pembuat (Created by)", options, key="selected_creators")
+        st.multiselect("Pilih Pembuat (Created by)", options['Created by'], key="selected_creators")
 
     with col8:
         # Filter 8: Referensi
-        options = sorted(df['Reference'].dropna().unique())
-        st.multiselect("Pilih Referensi", options, key="selected_references")
\ No newline at end of file
+        st.multiselect("Pilih Referensi", options['Reference'], key="selected_references")
\ No newline at end of file
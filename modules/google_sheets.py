@@ -1,64 +1,48 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import gspread
 from google.oauth2.service_account import Credentials
 from gspread.exceptions import APIError
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import base64
+import hashlib
+import io
+import json
+import random
+import threading
 import time
 import os
 
-# --- (SKEMA DATA: Harus sinkron dengan data_processing.py) ---
-PIVOT_COLS = [
-    'SKU', 'SKU Name', 'Location', 'Location Category', 
-    'Status', 'Action', 'SOH', 
-    'Inbound_Qty', 'Outbound_Qty', 
-    'Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease',
-    'Daily Usage', 'Moves Category', 'Lead Time', 
-    'Buffer Stock', 'Shortage', 
-    'Central_SOH', 'Manufacture_SOH'
-]
-
-MOVES_COLS = [
-    'Date', 'Created by', 'Reference', 'Contact', 'Location', 'Location Category', 
-    'SKU', 'SKU Name', 'Inbound_Qty', 'Outbound_Qty', 'Quantity', 
-    'Status_Replenishment', # (Kolom Status 🟥 🟨 🟩)
-    'Type', # (Tipe Inbound/Outbound)
-    'Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease', 'Cumulative_SOH'
-]
+# --- (SKEMA DATA: Didefinisikan di schema.py, dipakai bersama data_processing.py) ---
+from modules.schema import (
+    PIVOT_COLS, MOVES_COLS, PIVOT_NUMERIC_COLS, MOVES_NUMERIC_COLS, PIVOT_KEY_COLS, MOVES_KEY_COLS,
+    apply_categorical_schema, split_moves_by_type
+)
 
 
 def _post_process_read_df(df, sheet_name):
-    """Membersihkan dan mengubah tipe data DataFrame yang dibaca dari GSheet."""
-    
-    if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-    
-    numeric_cols = []
-    if sheet_name == "Pivot":
-        # (PERBAIKAN: Skema disinkronkan)
-        numeric_cols = [
-            'SOH', 'Inbound_Qty', 'Outbound_Qty', 
-            'Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease',
-            'Daily Usage', 'Lead Time', 'Buffer Stock', 'Shortage', 
-            'Central_SOH', 'Manufacture_SOH'
-        ]
-    
-    elif sheet_name in ["Moves History", "Inbound", "Outbound"]:
-        # (PERBAIKAN: Skema disinkronkan)
-        numeric_cols = [
-            'Inbound_Qty', 'Outbound_Qty', 'Quantity', 
-            'Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease', 'Cumulative_SOH'
-        ]
-
-    for col in numeric_cols:
-        if col in df.columns and col != 'Date':
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    """
+    Mengubah nilai mentah GSheet (UNFORMATTED_VALUE) ke dtype akhir dalam satu pass per kolom:
+    tanggal (serial/teks) -> datetime, angka -> float64 (kosong = 0), teks -> string (kosong = '').
+    """
+    numeric_cols = PIVOT_NUMERIC_COLS if sheet_name == "Pivot" else MOVES_NUMERIC_COLS
     
-    df = df.fillna('')
-    df.replace('nan', '', inplace=True)
-    df.replace('NaT', '', inplace=True)
+    for col in df.columns:
+        series = df[col]
+        if col == 'Date':
+            df[col] = _decode_sheet_dates(series)
+        elif col in numeric_cols:
+            df[col] = pd.to_numeric(series, errors='coerce').fillna(0).astype('float64')
+        else:
+            # (Sel teks yang berisi angka, mis. dari upload USER_ENTERED lama, tetap jadi string)
+            df[col] = series.where(series.notna(), '').astype(str)
 
-    return df
+    # Kolom teks berkardinalitas rendah -> 'category'
+    return apply_categorical_schema(df)
 
 @st.cache_resource(ttl=3600)
 def get_gspread_client(_credentials_source): # (PERBAIKAN: Ditambahkan '_')
@@ -104,143 +88,909 @@ def get_gspread_client(_credentials_source): # (PERBAIKAN: Ditambahkan '_')
     client.set_timeout(30)
     return client
 
-def read_all_data(spreadsheet_id, creds):
+# --- PEMBACAAN BATCH (satu request values:batchGet untuk semua sheet) ---
+
+# Sheet dashboard yang dibaca & ditulis: (nama sheet, kolom yang diharapkan)
+DASHBOARD_SHEETS = [
+    ("Pivot", PIVOT_COLS),
+    ("Moves History", MOVES_COLS),
+]
+
+# Sheet Inbound/Outbound (subset 'Type' dari Moves History): tidak dibaca, hanya ditulis
+# sebagai ekspor lama jika GSHEET_EXPORT_TYPE_SHEETS=1
+LEGACY_TYPE_SHEETS = [
+    ("Inbound", MOVES_COLS),
+    ("Outbound", MOVES_COLS),
+]
+EXPORT_TYPE_SHEETS = os.getenv("GSHEET_EXPORT_TYPE_SHEETS", "0") == "1"
+
+# Nilai mentah bertipe: angka tetap angka, tanggal sebagai serial number (hari sejak epoch Sheets)
+BATCH_READ_PARAMS = {
+    "valueRenderOption": "UNFORMATTED_VALUE",
+    "dateTimeRenderOption": "SERIAL_NUMBER",
+    "majorDimension": "ROWS",
+}
+SHEETS_EPOCH = pd.Timestamp("1899-12-30")
+DATE_NUMBER_FORMAT = "yyyy-mm-dd hh:mm:ss" # Format tampilan kolom 'Date' (nilai tersimpan = serial)
+
+def _sheet_range(ws_name):
+    """Range A1 untuk seluruh isi sheet (nama di-quote)."""
+    return "'" + ws_name.replace("'", "''") + "'"
+
+def _decode_sheet_dates(series):
+    """
+    Decode kolom tanggal dari UNFORMATTED_VALUE: serial number -> datetime,
+    teks (sel yang tidak dikenali Sheets sebagai tanggal) -> pd.to_datetime.
+    """
+    serial = pd.to_numeric(series, errors='coerce')
+    # (Dibulatkan ke detik sebelum konversi: serial float tidak presisi sampai nanodetik)
+    decoded = SHEETS_EPOCH + pd.to_timedelta((serial * 86_400).round(), unit='s')
+    is_text = serial.isna() & series.notna() & (series != '')
+    if is_text.any():
+        decoded[is_text] = pd.to_datetime(series[is_text], errors='coerce')
+    return decoded
+
+def _decode_value_range(value_range, expected_cols, sheet_name):
+    """Mengubah satu ValueRange (baris pertama = header) menjadi DataFrame bertipe dengan kolom expected_cols."""
+    values = value_range.get("values", [])
+    if len(values) < 1: # Jika sheet benar-benar kosong
+        return _post_process_read_df(pd.DataFrame(columns=expected_cols), sheet_name)
+    
+    # (Sheets memangkas sel kosong di akhir baris: baris pendek diisi None oleh DataFrame)
+    gsheet_header = values[0]
+    df = pd.DataFrame(values[1:])
+    df.columns = gsheet_header[:df.shape[1]] if not df.empty else []
+    
+    # (PERBAIKAN PENTING: Paksa DF agar memiliki kolom yang kita harapkan)
+    df = df.reindex(columns=expected_cols)
+    return _post_process_read_df(df, sheet_name)
+
+def _batch_get_sheets(client, spreadsheet_id, sheets):
+    """
+    Membaca beberapa sheet dalam SATU request values:batchGet.
+    Jika request gagal (mis. satu sheet tidak ada), setiap sheet dibaca terpisah
+    agar sheet lain tetap termuat dan sheet yang bermasalah dilaporkan.
+    """
+    ranges = [_sheet_range(ws_name) for ws_name, _ in sheets]
+    try:
+        response = client.http_client.values_batch_get(spreadsheet_id, ranges, params=dict(BATCH_READ_PARAMS))
+        return [
+            _decode_value_range(value_range, expected_cols, ws_name)
+            for value_range, (ws_name, expected_cols) in zip(response.get("valueRanges", []), sheets)
+        ]
+    except APIError:
+        if len(sheets) == 1:
+            raise
+    
+    frames = []
+    for ws_name, expected_cols in sheets:
+        try:
+            frames.extend(_batch_get_sheets(client, spreadsheet_id, [(ws_name, expected_cols)]))
+        except Exception as e:
+            st.error(f"Gagal membaca nilai dari sheet '{ws_name}': {e}", icon="🚨")
+            frames.append(_post_process_read_df(pd.DataFrame(columns=expected_cols), ws_name))
+    return frames
+
+def read_all_data(spreadsheet_id, creds, client=None):
     """
-    Membaca 4 sheet data dari GSheet dengan cara yang "tahan banting".
+    Membaca sheet Pivot & Moves History dalam satu request batch (nilai bertipe, tanpa format),
+    langsung di-decode ke dtype akhir. Mengembalikan (pivot_df, daily_soh_df, update_time).
     (PERBAIKAN: Menghapus 'updated_at' untuk stabilitas)
+    client: klien gspread opsional (mis. ke server Sheets palsu untuk pengujian).
     """
-    client = get_gspread_client(creds)
+    client = client or get_gspread_client(creds)
     if client is None:
         raise Exception("Gagal mendapatkan klien Google Sheet.")
     
     try:
-        sh = client.open_by_key(spreadsheet_id)
-        
-        # --- (PERBAIKAN: 'updated_at' dihapus) ---
-        try:
-            # Coba ambil timestamp dari properti 'updated' (jika ada)
-            update_time = pd.to_datetime(sh.updated)
-        except Exception:
-            # Fallback jika gagal
-            update_time = datetime.now() # Gunakan waktu saat ini
+        # (Tanpa open_by_key: tidak perlu request metadata spreadsheet/worksheet)
+        update_time = datetime.now() # Waktu data dimuat
         
-        def read_sheet_safely(ws_name, expected_cols):
-            """
-            (PERBAIKAN: Ini adalah logika paling aman untuk 'KeyError')
-            Membaca data menggunakan get_values() dan Menerapkan header kita.
-            """
-            try:
-                ws = sh.worksheet(ws_name)
-                
-                # Ambil semua nilai (termasuk header GSheet)
-                data = ws.get_values()
-                
-                if len(data) < 1: # Jika sheet benar-benar kosong
-                    return pd.DataFrame(columns=expected_cols)
-
-                # Ambil header GSheet (baris 1)
-                gsheet_header = data[0]
-                
-                # Ambil data (baris 2 dst), jika ada
-                if len(data) < 2:
-                    data_rows = []
-                else:
-                    data_rows = data[1:]
-
-                # Buat DataFrame menggunakan header GSheet
-                df = pd.DataFrame(data_rows, columns=gsheet_header)
-                
-                # (PERBAIKAN PENTING: Paksa DF agar memiliki kolom yang kita harapkan)
-                df = df.reindex(columns=expected_cols) 
-                return df
-                
-            except Exception as e:
-                st.error(f"Gagal membaca nilai dari sheet '{ws_name}': {e}", icon="🚨")
-                return pd.DataFrame(columns=expected_cols)
-
-        # Gunakan fungsi aman yang baru
-        pivot_df = read_sheet_safely("Pivot", PIVOT_COLS)
-        daily_df = read_sheet_safely("Moves History", MOVES_COLS)
-        inbound_df = read_sheet_safely("Inbound", MOVES_COLS)
-        outbound_df = read_sheet_safely("Outbound", MOVES_COLS)
-
-        # Post-process (konversi tipe data)
-        pivot_df = _post_process_read_df(pivot_df, "Pivot")
-        daily_df = _post_process_read_df(daily_df, "Moves History")
-        inbound_df = _post_process_read_df(inbound_df, "Inbound")
-        outbound_df = _post_process_read_df(outbound_df, "Outbound")
-
-        return pivot_df, daily_df, inbound_df, outbound_df, update_time
+        pivot_df, daily_df = _batch_get_sheets(client, spreadsheet_id, DASHBOARD_SHEETS)
+
+        return pivot_df, daily_df, update_time
         
     except APIError as e:
         raise Exception(f"Gagal membuka Spreadsheet. Periksa ID dan izin: {e}")
     except Exception as e:
         raise Exception(f"Gagal membaca Google Sheet saat startup: {e}")
 
-def upload_all_data(spreadsheet_id, creds, inbound_df, outbound_df, pivot_df, daily_soh_df):
+# --- SNAPSHOT BINER (Parquet zstd, base64 di sheet tersembunyi "Snapshot") ---
+
+# Layout sheet: A1 = manifest JSON, A2.. = potongan base64 dari payload (file Parquet berurutan)
+SNAPSHOT_SHEET = "Snapshot"
+SNAPSHOT_VERSION = 2 # Naikkan jika format/skema berubah: snapshot lama diabaikan (fallback ke sheet biasa)
+SNAPSHOT_CELL_CHARS = 45_000 # Karakter base64 per sel (batas Sheets: 50.000 karakter per sel)
+SNAPSHOT_CHUNKS_PER_REQUEST = 40 # ~1,8MB per request values:batchUpdate
+SNAPSHOT_FRAMES = ["pivot_df", "daily_soh_df"]
+
+# Versi data bersama = sha256 payload snapshot. Ditulis di manifest dan di sel penanda setiap sheet biasa
+# (baris 1, kolom setelah header) pada upload yang sama; snapshot hanya dipakai jika semua penanda cocok.
+# (Penanda dikosongkan sebelum langkah tulis pertama sheet dan diisi setelah langkah terakhir: upload
+#  terputus atau sheet yang ditulis di luar dasbor tanpa penanda -> pembaca memakai sheet biasa.)
+DATA_VERSION_PREFIX = "data_version:"
+
+def _data_version_cell(ws_name, n_cols):
+    """Range A1 sel penanda versi data sheet biasa (baris header, kolom n_cols + 1)."""
+    return f"{_sheet_range(ws_name)}!{gspread.utils.rowcol_to_a1(1, n_cols + 1)}"
+
+def _parse_data_version(header_row, n_cols):
+    """Versi data dari baris header mentah sheet biasa, atau None jika penanda tidak ada."""
+    cell = header_row[n_cols] if len(header_row) > n_cols else None
+    if isinstance(cell, str) and cell.startswith(DATA_VERSION_PREFIX):
+        return cell[len(DATA_VERSION_PREFIX):]
+    return None
+
+def _snapshot_payload(frames):
     """
-    Mengunggah 4 DataFrame ke GSheet dengan chunking dan jeda.
-    (PERBAIKAN: Error 500)
+    pivot_df & daily_soh_df -> (list potongan base64, manifest). Setiap frame ditulis sebagai Parquet zstd
+    (dtype termasuk 'category' ikut tersimpan); manifest berisi versi, sha256 payload,
+    jumlah potongan, dan posisi byte setiap frame.
     """
-    client = get_gspread_client(creds)
+    parts, layout, offset = [], {}, 0
+    for name in SNAPSHOT_FRAMES:
+        sink = io.BytesIO()
+        pq.write_table(pa.Table.from_pandas(frames[name], preserve_index=False), sink, compression="zstd")
+        parts.append(sink.getvalue())
+        layout[name] = [offset, len(parts[-1])]
+        offset += len(parts[-1])
+    payload = b"".join(parts)
+    encoded = base64.b64encode(payload).decode("ascii")
+    chunks = [encoded[i:i + SNAPSHOT_CELL_CHARS] for i in range(0, len(encoded), SNAPSHOT_CELL_CHARS)]
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "chunks": len(chunks),
+        "frames": layout,
+    }
+    return chunks, manifest
+
+def _parse_snapshot_manifest(cell):
+    """Isi sel A1 -> manifest (dict), atau None jika kosong/rusak/versinya berbeda."""
+    try:
+        manifest = json.loads(cell)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != SNAPSHOT_VERSION:
+        return None
+    return manifest
+
+def _decode_snapshot(values):
+    """
+    Nilai kolom A sheet Snapshot -> dict DataFrame (SNAPSHOT_FRAMES) + update_time, atau None jika snapshot
+    tidak ada, versinya berbeda, atau tidak utuh (mis. upload terputus di tengah: sha256 tidak cocok).
+    """
+    if not values or not values[0]:
+        return None
+    manifest = _parse_snapshot_manifest(values[0][0])
+    if manifest is None or len(values) < manifest["chunks"] + 1:
+        return None
+
+    encoded = "".join(row[0] if row else "" for row in values[1:manifest["chunks"] + 1])
+    payload = base64.b64decode(encoded)
+    if hashlib.sha256(payload).hexdigest() != manifest["sha256"]:
+        return None
+
+    frames = {}
+    for name in SNAPSHOT_FRAMES:
+        offset, length = manifest["frames"][name]
+        frames[name] = pq.read_table(io.BytesIO(payload[offset:offset + length])).to_pandas()
+    frames["update_time"] = pd.Timestamp(manifest["update_time"]) if manifest.get("update_time") else None
+    return frames
+
+def read_snapshot(spreadsheet_id, creds, client=None):
+    """
+    Membaca snapshot biner (satu request, ~10x lebih kecil dari sheet biasa) beserta sel penanda
+    versi data sheet biasa. Mengembalikan (pivot_df, daily_soh_df, update_time), atau None jika sheet
+    Snapshot tidak ada / versinya tidak cocok / tidak utuh, atau versi datanya berbeda dengan penanda
+    di sheet Pivot/Moves History (pakai read_all_data).
+    client: klien gspread opsional (mis. ke server Sheets palsu untuk pengujian).
+    """
+    client = client or get_gspread_client(creds)
     if client is None:
-        raise Exception("Gagal mendapatkan klien Google Sheet untuk upload.")
-    
+        raise Exception("Gagal mendapatkan klien Google Sheet.")
+
     try:
-        sh = client.open_by_key(spreadsheet_id)
-    except Exception as e:
-        st.error(f"Gagal membuka GSheet untuk upload. Periksa ID: {e}", icon="🚨")
+        response = client.http_client.values_batch_get(
+            spreadsheet_id,
+            [f"{_sheet_range(SNAPSHOT_SHEET)}!A:A"]
+            + [_data_version_cell(ws_name, len(expected_cols)) for ws_name, expected_cols in DASHBOARD_SHEETS],
+            params=dict(BATCH_READ_PARAMS)
+        )
+    except APIError:
+        return None # (Sheet Snapshot belum ada: spreadsheet lama)
+
+    value_ranges = response.get("valueRanges", [])
+    if len(value_ranges) < len(DASHBOARD_SHEETS) + 1:
         return None
-    
-    def upload_sheet(df, ws_name):
-        """Helper untuk mengunggah satu sheet dengan chunking."""
+    snapshot_values = value_ranges[0].get("values", [])
+    manifest = _parse_snapshot_manifest(snapshot_values[0][0]) if snapshot_values and snapshot_values[0] else None
+    if manifest is None:
+        return None
+    for value_range in value_ranges[1:]:
+        cell = value_range.get("values", [[]])
+        if _parse_data_version(cell[0] if cell else [], 0) != manifest.get("sha256"):
+            return None # (Sheet biasa berisi data lain / ditulis sebagian: snapshot usang)
+    try:
+        frames = _decode_snapshot(snapshot_values)
+    except (ValueError, KeyError, TypeError, pa.ArrowException):
+        frames = None # (Manifest/payload rusak: sama seperti snapshot tidak ada)
+    if frames is None:
+        return None
+    return frames["pivot_df"], frames["daily_soh_df"], frames["update_time"]
+
+def read_snapshot_version(spreadsheet_id, creds, client=None):
+    """update_time (ISO) dari manifest snapshot (hanya sel A1), atau None jika snapshot tidak ada."""
+    client = client or get_gspread_client(creds)
+    if client is None:
+        raise Exception("Gagal mendapatkan klien Google Sheet.")
+
+    try:
+        response = client.http_client.values_batch_get(
+            spreadsheet_id, [f"{_sheet_range(SNAPSHOT_SHEET)}!A1"], params=dict(BATCH_READ_PARAMS)
+        )
+    except APIError:
+        return None
+    values = (response.get("valueRanges") or [{}])[0].get("values", [])
+    manifest = _parse_snapshot_manifest(values[0][0]) if values and values[0] else None
+    return manifest.get("update_time") if manifest else None
+
+# --- UPLOAD DIFF (hanya baris yang berubah, bertambah, atau terhapus yang ditulis) ---
+
+# Kunci baris per sheet: baris lama & baru dengan kunci sama dianggap baris yang sama
+SHEET_KEY_COLS = {
+    "Pivot": PIVOT_KEY_COLS,
+    "Moves History": MOVES_KEY_COLS,
+    "Inbound": MOVES_KEY_COLS,
+    "Outbound": MOVES_KEY_COLS,
+}
+
+# --- PENJADWAL TULIS (kuota per menit, backoff, sheet paralel) ---
+
+# Kuota tulis Sheets API default: 60 request/menit per user per project
+WRITE_QUOTA_PER_MINUTE = int(os.getenv("GSHEET_WRITE_QUOTA_PER_MINUTE", "60"))
+WRITE_BURST_FRACTION = 0.1 # Porsi kuota yang boleh dikirim sekaligus di awal
+WRITE_CHUNK_CELLS = 100_000 # Sel maksimum per request values:batchUpdate (~1MB, di bawah saran 2MB)
+UPLOAD_BLOCK_ROWS = 50_000 # Baris per blok saat encode & hashing diff (memori upload ~ ukuran blok)
+UPLOAD_SHEET_WORKERS = 4 # Sheet yang ditulis bersamaan (berbagi satu kuota)
+RETRY_STATUS = {429, 500, 502, 503, 504} # Kuota habis & error server sementara
+# Langkah struktural (clear, insert/delete/appendDimension) tidak idempoten: balasan 5xx bisa berarti
+# request sudah diterapkan server, sehingga kirim ulang bisa menggeser/menghapus baris dua kali.
+# Langkah ini hanya diulang pada 429 (pasti ditolak); 5xx -> sheet gagal, rencana dibuat ulang dari isi sheet.
+STRUCTURAL_RETRY_STATUS = {429}
+MAX_WRITE_RETRIES = 6
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 64.0
+
+class WriteQuota:
+    """
+    Token bucket untuk kuota tulis per menit. Kapasitas (burst) + isi ulang selama satu
+    periode = kuota, sehingga jendela 60 detik mana pun tidak melebihi kuota.
+    Dipakai bersama oleh semua thread upload.
+    """
+
+    def __init__(self, requests_per_minute=WRITE_QUOTA_PER_MINUTE, period_s=60.0):
+        self.capacity = max(1.0, requests_per_minute * WRITE_BURST_FRACTION)
+        self.rate = max(requests_per_minute - self.capacity, 1.0) / period_s
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Menunggu sampai ada token, lalu memakainya."""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self):
+        """Server membalas 429: anggap kuota menit ini habis (semua thread ikut melambat)."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+
+def _send_write(quota, func, *args, retry_status=RETRY_STATUS, **kwargs):
+    """
+    Mengirim satu request tulis lewat kuota. Status di retry_status (default 429/5xx) diulang
+    dengan exponential backoff + full jitter (maks. MAX_WRITE_RETRIES kali); error lain langsung dilempar.
+    """
+    for attempt in range(MAX_WRITE_RETRIES + 1):
+        quota.acquire()
         try:
-            ws = sh.worksheet(ws_name)
-            ws.clear()
-            
-            # Konversi NaT/NaN menjadi string kosong
-            df_upload = df.fillna('').astype(str)
-            df_upload.replace('NaT', '', inplace=True)
-            
-            header = df_upload.columns.tolist()
-            values = df_upload.values.tolist()
-            
-            chunk_size = 2000
-            total_chunks = (len(values) // chunk_size) + 1
-            
-            if len(values) > chunk_size:
-                for i in range(0, len(values), chunk_size):
-                    chunk = values[i:i+chunk_size]
-                    if i == 0:
-                        ws.update([header] + chunk, value_input_option='USER_ENTERED')
-                    else:
-                        ws.append_rows(chunk, value_input_option='USER_ENTERED')
-                    
-                    if total_chunks > 1:
-                        time.sleep(1.5) 
-            else:
-                ws.update([header] + values, value_input_option='USER_ENTERED')
-            
-        except gspread.exceptions.WorksheetNotFound:
-            st.error(f"Sheet '{ws_name}' tidak ditemukan di GSheet Anda!", icon="🚨")
-            raise Exception(f"Worksheet {ws_name} not found")
-        except Exception as e:
-            st.error(f"Gagal mengunggah ke sheet '{ws_name}': {e}", icon="🚨")
-            raise e
+            return func(*args, **kwargs)
+        except APIError as e:
+            if e.code not in retry_status or attempt == MAX_WRITE_RETRIES:
+                raise
+            if e.code == 429:
+                quota.penalize()
+            time.sleep(random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt)))
+
+def _encode_column(series, col, numeric_cols):
+    """
+    Satu kolom -> list nilai JSON bertipe untuk valueInputOption=RAW:
+    tanggal -> serial number Sheets, angka -> number (bulat dikirim sebagai int), teks -> string.
+    Nilai kosong (NaN/NaT) -> '' (sel kosong).
+    """
+    if col == 'Date':
+        dates = pd.to_datetime(series, errors='coerce')
+        serial = ((dates - SHEETS_EPOCH) / pd.Timedelta(days=1)).to_numpy()
+        encoded = serial.astype(object)
+        encoded[np.isnan(serial)] = ''
+        return encoded
+    if col in numeric_cols:
+        numbers = pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64')
+        encoded = numbers.astype(object)
+        whole = np.isfinite(numbers) & (numbers == np.round(numbers)) & (np.abs(numbers) < 2 ** 53)
+        encoded[whole] = numbers[whole].astype(np.int64).tolist() # (Payload lebih kecil: 12 bukan 12.0)
+        encoded[np.isnan(numbers)] = ''
+        return encoded
+    encoded = series.astype(object).to_numpy()
+    encoded[pd.isna(encoded)] = ''
+    return encoded
+
+def _iter_upload_values(df, sheet_name, block_rows=UPLOAD_BLOCK_ROWS):
+    """
+    Generator: baris bertipe untuk valueInputOption=RAW, satu list per blok block_rows baris,
+    di-encode langsung dari kolom bertipe (tanpa salinan string/objek seluruh frame).
+    """
+    numeric_cols = PIVOT_NUMERIC_COLS if sheet_name == "Pivot" else MOVES_NUMERIC_COLS
+    for start in range(0, len(df), block_rows):
+        block = df.iloc[start:start + block_rows]
+        columns = [_encode_column(block[col], col, numeric_cols) for col in block.columns]
+        yield np.column_stack(columns).tolist()
+
+def _to_upload_values(df, sheet_name):
+    """DataFrame -> list baris bertipe untuk valueInputOption=RAW (tanpa konversi ke string)."""
+    return [row for block in _iter_upload_values(df, sheet_name) for row in block]
+
+def _sheet_frame(df, expected_cols):
+    """df dengan kolom sesuai urutan sheet; tanpa salinan jika sudah sama (reindex menyalin seluruh frame)."""
+    return df if list(df.columns) == list(expected_cols) else df.reindex(columns=expected_cols)
+
+def _canonical_frame(df, sheet_name):
+    """
+    Bentuk pembanding baris: sama seperti hasil baca ulang dari GSheet
+    (angka float dengan kosong = 0 dan -0.0 = 0.0, tanggal datetime, teks string dengan kosong = '').
+    """
+    numeric_cols = PIVOT_NUMERIC_COLS if sheet_name == "Pivot" else MOVES_NUMERIC_COLS
+    canonical = {}
+    for col in df.columns:
+        series = df[col]
+        if col == 'Date':
+            canonical[col] = pd.to_datetime(series, errors='coerce')
+        elif col in numeric_cols:
+            # (+ 0.0: -0.0 (mis. Adjustment Qty nol) terbaca ulang dari sheet sebagai 0.0, byte hash-nya berbeda)
+            canonical[col] = pd.to_numeric(series, errors='coerce').fillna(0).astype('float64') + 0.0
+        elif (categories := _str_categories(series)) is not None:
+            # (Tetap 'category': hash dihitung sekali per kategori, nilainya sama dengan hash string per baris)
+            codes = series.cat.codes.to_numpy()
+            if '' not in categories:
+                categories = categories.append(pd.Index(['']))
+            codes = np.where(codes < 0, categories.get_loc(''), codes)
+            canonical[col] = pd.Categorical.from_codes(codes, categories)
+        else:
+            series = series.astype(object)
+            canonical[col] = series.where(series.notna(), '').astype(str)
+    return pd.DataFrame(canonical, index=df.index)
+
+def _str_categories(series):
+    """
+    Kategori kolom 'category' sebagai string, atau None jika bukan 'category'
+    atau ada kategori kembar setelah dikonversi (mis. 1 dan '1').
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return None
+    categories = pd.Index(series.cat.categories.astype(str), dtype=object)
+    return None if categories.has_duplicates else categories
+
+def _row_keys_and_hashes(df, sheet_name, key_cols):
+    """
+    Hash kunci (+ nomor kemunculan untuk kunci kembar) dan hash isi seluruh baris.
+    Bentuk kanonik dibuat & di-hash per blok UPLOAD_BLOCK_ROWS baris (hash per baris tidak
+    bergantung blok), sehingga salinan string seluruh sheet tidak pernah dibuat sekaligus.
+    """
+    key_parts, row_parts = [np.array([], dtype=np.uint64)], [np.array([], dtype=np.uint64)]
+    for start in range(0, len(df), UPLOAD_BLOCK_ROWS):
+        canonical_df = _canonical_frame(df.iloc[start:start + UPLOAD_BLOCK_ROWS], sheet_name)
+        key_parts.append(pd.util.hash_pandas_object(canonical_df[key_cols], index=False).to_numpy())
+        row_parts.append(pd.util.hash_pandas_object(canonical_df, index=False).to_numpy())
+    key_hash = np.concatenate(key_parts)
+    occurrence = pd.Series(key_hash).groupby(key_hash).cumcount().to_numpy()
+    keys = pd.util.hash_pandas_object(
+        pd.DataFrame({'key': key_hash, 'n': occurrence}), index=False
+    ).to_numpy()
+    return keys, np.concatenate(row_parts)
+
+def _runs(positions):
+    """Indeks terurut -> list (awal, akhir eksklusif) untuk tiap blok indeks berurutan."""
+    if len(positions) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks, [len(positions)]])
+    return [(int(positions[s]), int(positions[e - 1]) + 1) for s, e in zip(starts, ends)]
+
+def _plan_sheet_diff(old_values, new_df, sheet_name, expected_cols):
+    """
+    Membandingkan isi sheet saat ini (values dari batchGet) dengan new_df.
+    Urutan baris di sheet tetap mengikuti new_df: baris lama yang kuncinya hilang dihapus,
+    baris baru disisipkan di posisinya, baris dengan isi berubah ditulis ulang.
+    Jika header berbeda atau urutan kunci lama berubah, sheet ditulis ulang penuh.
+    """
+    n_new = len(new_df)
+    old_header = old_values[0][:len(expected_cols)] if old_values else [] # (Tanpa sel penanda versi data)
+    old_df = _decode_value_range({"values": old_values}, expected_cols, sheet_name)
+    n_old = len(old_df)
+
+    new_keys, new_hash = _row_keys_and_hashes(new_df, sheet_name, SHEET_KEY_COLS[sheet_name])
+    old_keys, old_hash = _row_keys_and_hashes(old_df, sheet_name, SHEET_KEY_COLS[sheet_name])
+
+    old_kept = np.isin(old_keys, new_keys)
+    new_kept = np.isin(new_keys, old_keys)
+    plan = {
+        "full_rewrite": False,
+        "n_old": n_old,
+        "write_header": old_header != list(expected_cols),
+    }
+    if (plan["write_header"] and n_old > 0) or not np.array_equal(old_keys[old_kept], new_keys[new_kept]):
+        # Layout kolom atau urutan baris berubah: diff posisi tidak berlaku
+        plan.update(full_rewrite=True, write_header=True, write_rows=np.arange(n_new),
+                    delete_runs=[], insert_runs=[],
+                    rows_changed=0, rows_appended=n_new, rows_deleted=n_old)
+        return plan
+
+    # Baris yang dipertahankan muncul dalam urutan sama di kedua sisi -> bandingkan hash berpasangan
+    changed = np.zeros(n_new, dtype=bool)
+    changed[new_kept] = old_hash[old_kept] != new_hash[new_kept]
+    inserted = np.flatnonzero(~new_kept)
+    # Baris baru setelah baris lama terakhir cukup ditulis di bawah data (tanpa insertDimension)
+    kept_positions = np.flatnonzero(new_kept)
+    tail_start = kept_positions[-1] + 1 if len(kept_positions) else 0
 
+    plan.update(
+        write_rows=np.flatnonzero(changed | ~new_kept),
+        delete_runs=_runs(np.flatnonzero(~old_kept)),
+        insert_runs=_runs(inserted[inserted < tail_start]),
+        rows_changed=int(changed.sum()),
+        rows_appended=len(inserted),
+        rows_deleted=int((~old_kept).sum()),
+    )
+    return plan
+
+def _sheet_steps(ws, plan, n_rows, expected_cols):
+    """
+    Plan diff -> daftar langkah tulis berurutan untuk satu sheet. Langkah berupa dict
+    JSON-serializable (bisa disimpan sebagai checkpoint job upload):
+      {"kind": "clear" | "dimensions", "body": ...}
+      {"kind": "values", "ranges": [[A1, baris_awal, baris_akhir], ...], "cells": n}
+    Baris = posisi di new_df (None untuk header); nilainya diserialisasi saat langkah dikirim.
+    """
+    n_cols = len(expected_cols)
+    last_col = gspread.utils.rowcol_to_a1(1, n_cols).rstrip('0123456789')
+    sheet_range = _sheet_range(ws.title)
+    steps = []
+
+    # 1. Perubahan struktur baris (grid: baris 0 = header, baris data i = grid i+1)
+    requests = []
+    inserted_mid = sum(end - start for start, end in plan["insert_runs"])
+    deleted = sum(end - start for start, end in plan["delete_runs"])
+    # (Sisakan 1 baris kosong: Sheets menolak menghapus semua baris yang tidak di-freeze)
+    shortfall = (n_rows + 2) - (ws.row_count - deleted + inserted_mid)
+    if shortfall > 0 and (plan["delete_runs"] or plan["insert_runs"] or len(plan["write_rows"])):
+        requests.append({"appendDimension": {"sheetId": ws.id, "dimension": "ROWS", "length": int(shortfall)}})
+    for start, end in reversed(plan["delete_runs"]): # Dari bawah agar indeks di atasnya tidak bergeser
+        requests.append({"deleteDimension": {"range": {
+            "sheetId": ws.id, "dimension": "ROWS", "startIndex": start + 1, "endIndex": end + 1
+        }}})
+    for start, end in plan["insert_runs"]: # Dari atas: indeks = posisi akhir di new_df
+        requests.append({"insertDimension": {"range": {
+            "sheetId": ws.id, "dimension": "ROWS", "startIndex": start + 1, "endIndex": end + 1
+        }, "inheritFromBefore": True}})
+    if ws.col_count < n_cols + 1: # (Kolom sel penanda versi data di kanan header)
+        requests.append({"appendDimension": {"sheetId": ws.id, "dimension": "COLUMNS", "length": n_cols + 1 - ws.col_count}})
+    if 'Date' in expected_cols and len(plan["write_rows"]):
+        # Tanggal dikirim sebagai serial number (RAW): format kolom agar tetap terbaca sebagai tanggal
+        date_col = list(expected_cols).index('Date')
+        requests.append({"repeatCell": {
+            "range": {"sheetId": ws.id, "startRowIndex": 1, "startColumnIndex": date_col, "endColumnIndex": date_col + 1},
+            "cell": {"userEnteredFormat": {"numberFormat": {"type": "DATE_TIME", "pattern": DATE_NUMBER_FORMAT}}},
+            "fields": "userEnteredFormat.numberFormat",
+        }})
+
+    if plan["full_rewrite"] and plan["n_old"] > 0:
+        steps.append({"kind": "clear", "body": {"ranges": [sheet_range]}})
+    if requests:
+        steps.append({"kind": "dimensions", "body": {"requests": requests}})
+
+    # 2. Nilai: blok baris berurutan -> range A{baris}:{kolom terakhir}{baris},
+    #    digabung per request values:batchUpdate hingga WRITE_CHUNK_CELLS sel
+    chunk_rows = max(WRITE_CHUNK_CELLS // n_cols, 1)
+    ranges = []
+    if plan["write_header"]:
+        ranges.append([f"{sheet_range}!A1:{last_col}1", None, None])
+    for start, end in _runs(plan["write_rows"]):
+        for chunk_start in range(start, end, chunk_rows):
+            chunk_end = min(chunk_start + chunk_rows, end)
+            ranges.append([f"{sheet_range}!A{chunk_start + 2}:{last_col}{chunk_end + 1}", chunk_start, chunk_end])
+
+    batch, batch_rows = [], 0
+    for item in ranges:
+        rows = 1 if item[1] is None else item[2] - item[1]
+        if batch and batch_rows + rows > chunk_rows:
+            steps.append({"kind": "values", "ranges": batch, "cells": batch_rows * n_cols})
+            batch, batch_rows = [], 0
+        batch.append(item)
+        batch_rows += rows
+    if batch:
+        steps.append({"kind": "values", "ranges": batch, "cells": batch_rows * n_cols})
+    return steps
+
+def _snapshot_steps(ws, old_manifest, chunks, manifest):
+    """
+    Langkah tulis sheet Snapshot (format sama dengan _sheet_steps). Kosong jika snapshot di sheet
+    sudah berisi payload yang sama (sha256). Potongan ditulis dulu, manifest (A1) paling akhir:
+    selama upload berjalan/terputus, sha256 manifest lama tidak cocok dan pembaca memakai sheet biasa.
+    """
+    if old_manifest is not None and old_manifest.get("sha256") == manifest["sha256"]:
+        return []
+    n_chunks = len(chunks)
+    sheet_range = _sheet_range(SNAPSHOT_SHEET)
+    steps = []
+    # (Sisakan 1 baris kosong di bawah potongan terakhir: target range pengosongan di bawah)
+    if ws.row_count < n_chunks + 2:
+        steps.append({"kind": "dimensions", "body": {"requests": [{"appendDimension": {
+            "sheetId": ws.id, "dimension": "ROWS", "length": n_chunks + 2 - ws.row_count
+        }}]}})
+    for start in range(0, n_chunks, SNAPSHOT_CHUNKS_PER_REQUEST):
+        end = min(start + SNAPSHOT_CHUNKS_PER_REQUEST, n_chunks)
+        steps.append({"kind": "snapshot", "range": f"{sheet_range}!A{start + 2}:A{end + 1}",
+                      "chunks": [start, end], "sha256": manifest["sha256"], "cells": end - start})
+    # Potongan snapshot lama yang lebih panjang dikosongkan agar tidak ikut terbaca
+    if old_manifest is None or old_manifest.get("chunks", 0) > n_chunks:
+        steps.append({"kind": "clear", "body": {"ranges": [f"{sheet_range}!A{n_chunks + 2}:A"]}})
+    steps.append({"kind": "snapshot_manifest", "range": f"{sheet_range}!A1", "manifest": manifest, "cells": 1})
+    return steps
+
+def _data_version_steps(steps, old_values, ws_name, n_cols, data_version):
+    """
+    Langkah tulis sheet biasa + penanda versi data: dikosongkan sebelum langkah pertama (jika ada penanda lama)
+    dan diisi data_version setelah langkah terakhir. Sheet tanpa perubahan tetap ditandai jika penandanya berbeda.
+    """
+    old_version = _parse_data_version(old_values[0] if old_values else [], n_cols)
+    if not steps and old_version == data_version:
+        return steps
+    cell = _data_version_cell(ws_name, n_cols)
+    clear = [{"kind": "data_version", "range": cell, "value": "", "cells": 1}] if steps and old_version is not None else []
+    return clear + steps + [{"kind": "data_version", "range": cell, "value": DATA_VERSION_PREFIX + data_version, "cells": 1}]
+
+def _send_step(sh, step, source, ws_name, quota):
+    """
+    Mengirim satu langkah tulis lewat kuota. Mengembalikan jumlah sel ditulis.
+    source: DataFrame sheet (kolom = header sheet), atau (potongan, manifest) dari
+    _snapshot_payload untuk sheet Snapshot.
+    """
+    if step["kind"] == "clear":
+        _send_write(quota, sh.values_batch_clear, body=step["body"], retry_status=STRUCTURAL_RETRY_STATUS)
+        return 0
+    if step["kind"] == "dimensions":
+        _send_write(quota, sh.batch_update, step["body"], retry_status=STRUCTURAL_RETRY_STATUS)
+        return 0
+    if step["kind"] == "data_version":
+        _send_write(quota, sh.values_batch_update, {
+            "valueInputOption": "RAW", "data": [{"range": step["range"], "values": [[step["value"]]]}]
+        })
+        return step["cells"]
+    if step["kind"] in ("snapshot", "snapshot_manifest"):
+        chunks, manifest = source
+        if step["kind"] == "snapshot":
+            # (Job dilanjutkan dari store lokal: payload harus sama persis dengan saat plan dibuat)
+            if manifest["sha256"] != step["sha256"]:
+                raise Exception("Data snapshot berubah sejak job dibuat. Unggah ulang file CSV.")
+            start, end = step["chunks"]
+            values = [[chunk] for chunk in chunks[start:end]]
+        else:
+            values = [[json.dumps(step["manifest"])]]
+        _send_write(quota, sh.values_batch_update, {
+            "valueInputOption": "RAW", "data": [{"range": step["range"], "values": values}]
+        })
+        return step["cells"]
+    new_df = source
+
+    # (Hanya baris langkah ini yang di-encode, sekali untuk semua range-nya, lalu diiris per range:
+    #  memori ~ ukuran langkah (WRITE_CHUNK_CELLS), bukan ukuran sheet)
+    row_ranges = [(start, end) for _, start, end in step["ranges"] if start is not None]
+    positions = np.concatenate([np.arange(start, end) for start, end in row_ranges]) if row_ranges else []
+    values = _to_upload_values(new_df.iloc[positions], ws_name)
+    data, offset = [], 0
+    for a1, start, end in step["ranges"]:
+        if start is None:
+            data.append({"range": a1, "values": [new_df.columns.tolist()]})
+            continue
+        data.append({"range": a1, "values": values[offset:offset + end - start]})
+        offset += end - start
+    # (RAW: nilai bertipe disimpan apa adanya, tanpa parsing di server)
+    _send_write(quota, sh.values_batch_update, {"valueInputOption": "RAW", "data": data})
+    return step["cells"]
+
+# --- HANDLE SPREADSHEET (metadata diambil sekali, dipakai ulang antar upload & resume) ---
+
+# Metadata yang dibutuhkan upload: id, judul & ukuran grid per sheet (tanpa format/proteksi/dll.)
+SHEET_METADATA_FIELDS = "spreadsheetId,properties,sheets.properties"
+
+class _PrefetchedSpreadsheet(gspread.Spreadsheet):
+    """Spreadsheet gspread yang menyimpan metadata (termasuk daftar sheet) dari request pembukaannya."""
+
+    def fetch_sheet_metadata(self, params=None):
+        self.metadata = super().fetch_sheet_metadata(
+            params or {"includeGridData": "false", "fields": SHEET_METADATA_FIELDS}
+        )
+        return self.metadata
+
+class SpreadsheetSession:
+    """
+    Handle Spreadsheet & Worksheet dari satu request metadata, dipakai ulang oleh plan_upload,
+    write_sheet, dan job upload yang dilanjutkan (tanpa open_by_key / worksheet() per panggilan).
+    Ukuran grid diperbarui sendiri setelah langkah 'dimensions' terkirim; metadata dimuat ulang
+    hanya jika ditandai usang (invalidate): perubahan terdeteksi (sheet tidak ditemukan, isi
+    melebihi grid tersimpan) atau error API saat menulis.
+    """
+
+    def __init__(self, client, spreadsheet_id):
+        self.client = client
+        self.spreadsheet_id = spreadsheet_id
+        self.fetched_at = None
+        self._lock = threading.Lock()
+        self._spreadsheet = None
+        self._worksheets = None
+
+    def _fetch(self):
+        sh = _PrefetchedSpreadsheet(self.client.http_client, {"id": self.spreadsheet_id})
+        self._worksheets = {
+            sheet["properties"]["title"]: gspread.Worksheet(sh, sheet["properties"], sh.id, sh.client)
+            for sheet in sh.metadata.get("sheets", [])
+        }
+        self._spreadsheet = sh
+        self.fetched_at = datetime.now()
+
+    def spreadsheet(self):
+        with self._lock:
+            if self._spreadsheet is None:
+                self._fetch()
+            return self._spreadsheet
+
+    def worksheets(self, required=()):
+        """{judul: Worksheet}. Dimuat ulang sekali jika ada sheet di required yang tidak ada di cache."""
+        with self._lock:
+            if self._worksheets is None or any(name not in self._worksheets for name in required):
+                self._fetch()
+            return dict(self._worksheets)
+
+    def invalidate(self):
+        with self._lock:
+            self._spreadsheet = None
+            self._worksheets = None
+
+    def add_sheet(self, properties):
+        """Request addSheet, lalu sheet baru didaftarkan ke cache. Mengembalikan Worksheet-nya."""
+        sh = self.spreadsheet()
+        response = sh.batch_update({"requests": [{"addSheet": {"properties": properties}}]})
+        ws = gspread.Worksheet(sh, response["replies"][0]["addSheet"]["properties"], sh.id, sh.client)
+        with self._lock:
+            if self._worksheets is not None:
+                self._worksheets[ws.title] = ws
+        return ws
+
+    def apply_dimension_requests(self, requests):
+        """Memperbarui rowCount/columnCount sheet di cache sesuai request dimensi yang sudah dikonfirmasi server."""
+        with self._lock:
+            if self._worksheets is None:
+                return
+            grids = {ws.id: ws._properties["gridProperties"] for ws in self._worksheets.values()}
+            for request in requests:
+                if "appendDimension" in request:
+                    body = request["appendDimension"]
+                    delta, sheet_id = body["length"], body["sheetId"]
+                    if body.get("dimension") == "COLUMNS":
+                        if sheet_id in grids:
+                            grids[sheet_id]["columnCount"] = grids[sheet_id].get("columnCount", 0) + delta
+                        continue
+                elif "insertDimension" in request or "deleteDimension" in request:
+                    body = (request.get("insertDimension") or request["deleteDimension"])["range"]
+                    delta = body["endIndex"] - body["startIndex"]
+                    delta = -delta if "deleteDimension" in request else delta
+                    sheet_id = body["sheetId"]
+                else:
+                    continue
+                if sheet_id in grids:
+                    grids[sheet_id]["rowCount"] = grids[sheet_id].get("rowCount", 0) + delta
+
+_SESSIONS = {} # spreadsheet_id -> SpreadsheetSession (per proses, dibagi semua sesi & job)
+_SESSIONS_LOCK = threading.Lock()
+
+def get_spreadsheet_session(client, spreadsheet_id):
+    """SpreadsheetSession tersimpan untuk spreadsheet ini (dibuat baru jika klien berbeda)."""
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(spreadsheet_id)
+        if session is None or session.client is not client:
+            session = _SESSIONS[spreadsheet_id] = SpreadsheetSession(client, spreadsheet_id)
+        return session
+
+_WRITE_LOCKS = {} # spreadsheet_id -> Lock (per proses): satu upload (sinkron/job) per spreadsheet pada satu waktu
+
+def spreadsheet_write_lock(spreadsheet_id):
+    """
+    Lock tulis spreadsheet ini. Dipegang dari plan diff sampai langkah terakhir dikirim, sehingga dua upload
+    tidak membuat plan dari isi sheet yang sama lalu saling menggeser baris (insert/deleteDimension).
+    """
+    with _SESSIONS_LOCK:
+        return _WRITE_LOCKS.setdefault(spreadsheet_id, threading.Lock())
+
+# Sheet -> kunci DataFrame (seperti df_dict hasil data_processing.process_csv;
+# inbound_df/outbound_df diturunkan dari daily_soh_df, lihat _with_type_frames)
+SHEET_FRAMES = {
+    "Pivot": "pivot_df",
+    "Moves History": "daily_soh_df",
+    "Inbound": "inbound_df",
+    "Outbound": "outbound_df",
+}
+
+def _upload_sheets():
+    """Sheet yang ditulis saat upload: Pivot & Moves History (+ Inbound/Outbound jika EXPORT_TYPE_SHEETS)."""
+    return DASHBOARD_SHEETS + (LEGACY_TYPE_SHEETS if EXPORT_TYPE_SHEETS else [])
+
+def _with_type_frames(frames):
+    """frames + inbound_df/outbound_df (subset 'Type' dari daily_soh_df) untuk ekspor sheet lama."""
+    inbound_df, outbound_df = split_moves_by_type(frames["daily_soh_df"])
+    return {**frames, "inbound_df": inbound_df, "outbound_df": outbound_df}
+
+def _add_snapshot_sheet(session):
+    """Membuat sheet Snapshot (tersembunyi, 1 kolom). Mengembalikan Worksheet-nya."""
+    return session.add_sheet({
+        "title": SNAPSHOT_SHEET, "hidden": True, "gridProperties": {"rowCount": 2, "columnCount": 1},
+    })
+
+def plan_upload(client, spreadsheet_id, frames):
+    """
+    Membaca isi sheet saat ini (satu batchGet) dan menyusun langkah tulis diff per sheet.
+    frames: dict berkunci SHEET_FRAMES (pivot_df, daily_soh_df).
+    Mengembalikan (SpreadsheetSession, {nama sheet: {"steps", "rows_changed", "rows_appended", "rows_deleted"}});
+    sheet yang tidak berubah tidak disertakan. Melempar Exception jika ada sheet yang tidak ditemukan.
+    """
+    upload_sheets = _upload_sheets()
+    if EXPORT_TYPE_SHEETS:
+        frames = _with_type_frames(frames)
+    # (Metadata dari cache sesi spreadsheet: tanpa request open_by_key/worksheets setiap upload)
+    session = get_spreadsheet_session(client, spreadsheet_id)
+    worksheets = session.worksheets(required=[ws_name for ws_name, _ in upload_sheets])
+    missing = [ws_name for ws_name, _ in upload_sheets if ws_name not in worksheets]
+    if missing:
+        raise Exception(f"Sheet {', '.join(repr(name) for name in missing)} tidak ditemukan di GSheet Anda!")
+    if SNAPSHOT_SHEET not in worksheets:
+        worksheets[SNAPSHOT_SHEET] = _add_snapshot_sheet(session)
+
+    # Isi sheet saat ini (mentah, bertipe) + manifest snapshot sekaligus
     try:
-        # Upload satu per satu
-        upload_sheet(pivot_df, "Pivot")
-        time.sleep(2) # Jeda antar sheet
-        upload_sheet(daily_soh_df, "Moves History")
-        time.sleep(2)
-        upload_sheet(inbound_df, "Inbound")
-        time.sleep(2)
-        upload_sheet(outbound_df, "Outbound")
-        
-        # Jika semua berhasil, kembalikan timestamp
-        return datetime.now()
+        response = client.http_client.values_batch_get(
+            spreadsheet_id,
+            [_sheet_range(ws_name) for ws_name, _ in upload_sheets] + [f"{_sheet_range(SNAPSHOT_SHEET)}!A1"],
+            params=dict(BATCH_READ_PARAMS)
+        )
+    except APIError:
+        session.invalidate() # (Mis. sheet dihapus/diganti nama sejak metadata diambil)
+        raise
+    value_ranges = response.get("valueRanges", [])
+    current = {
+        ws_name: value_range.get("values", [])
+        for (ws_name, _), value_range in zip(upload_sheets, value_ranges)
+    }
+    # Isi melebihi grid tersimpan: sheet diubah di luar dasbor, ukuran grid di cache usang
+    if any(len(current[ws_name]) > worksheets[ws_name].row_count for ws_name, _ in upload_sheets):
+        session.invalidate()
+        worksheets = {**session.worksheets(), SNAPSHOT_SHEET: worksheets[SNAPSHOT_SHEET]}
+    manifest_values = value_ranges[-1].get("values", []) if len(value_ranges) > len(upload_sheets) else []
 
-    except Exception as e:
-        # Error sudah ditampilkan oleh upload_sheet
-        return None
\ No newline at end of file
+    chunks, manifest = _snapshot_payload(frames)
+    sheet_plans = {}
+    for ws_name, expected_cols in upload_sheets:
+        new_df = _sheet_frame(frames[SHEET_FRAMES[ws_name]], expected_cols)
+        plan = _plan_sheet_diff(current[ws_name], new_df, ws_name, expected_cols)
+        steps = _sheet_steps(worksheets[ws_name], plan, len(new_df), expected_cols)
+        steps = _data_version_steps(steps, current[ws_name], ws_name, len(expected_cols), manifest["sha256"])
+        if steps: # (Sheet tidak berubah: tidak ada request tulis)
+            sheet_plans[ws_name] = {
+                "steps": steps,
+                "rows_changed": plan["rows_changed"],
+                "rows_appended": plan["rows_appended"],
+                "rows_deleted": plan["rows_deleted"],
+            }
+
+    # Snapshot biner ditulis ulang utuh (kecil), dilewati jika payload sama
+    manifest["update_time"] = datetime.now().isoformat()
+    old_manifest = _parse_snapshot_manifest(manifest_values[0][0]) if manifest_values and manifest_values[0] else None
+    steps = _snapshot_steps(worksheets[SNAPSHOT_SHEET], old_manifest, chunks, manifest)
+    if steps:
+        sheet_plans[SNAPSHOT_SHEET] = {"steps": steps, "rows_changed": 0, "rows_appended": 0, "rows_deleted": 0}
+    return session, sheet_plans
+
+def write_sheet(session, ws_name, steps, frames, quota, on_step=None):
+    """
+    Mengirim steps satu sheet secara berurutan (session: SpreadsheetSession).
+    on_step(indeks langkah, sel ditulis) dipanggil setiap kali server mengonfirmasi satu langkah
+    (dipakai job upload untuk checkpoint). Mengembalikan jumlah sel ditulis.
+    """
+    sh = session.spreadsheet()
+    if ws_name == SNAPSHOT_SHEET:
+        source = _snapshot_payload(frames)
+    else:
+        if SHEET_FRAMES[ws_name] not in frames:
+            frames = _with_type_frames(frames)
+        source = _sheet_frame(frames[SHEET_FRAMES[ws_name]], dict(DASHBOARD_SHEETS + LEGACY_TYPE_SHEETS)[ws_name])
+    cells_written = 0
+    for i in range(len(steps)):
+        try:
+            cells = _send_step(sh, steps[i], source, ws_name, quota)
+        except APIError:
+            session.invalidate() # (Grid/sheet mungkin berubah di luar dasbor: metadata diambil ulang)
+            raise
+        if steps[i]["kind"] == "dimensions":
+            session.apply_dimension_requests(steps[i]["body"]["requests"])
+        cells_written += cells
+        if on_step is not None:
+            on_step(i, cells)
+    return cells_written
+
+def upload_all_data(spreadsheet_id, creds, pivot_df, daily_soh_df, client=None, quota=None):
+    """
+    Mengunggah pivot_df & daily_soh_df ke GSheet secara diff (sinkron): isi sheet saat ini dibaca (satu batchGet),
+    baris dicocokkan per kunci (SHEET_KEY_COLS), lalu hanya baris yang berubah, bertambah,
+    atau terhapus yang dikirim (request batch).
+    Sheet yang berubah ditulis bersamaan (UPLOAD_SHEET_WORKERS thread) dengan satu WriteQuota bersama.
+    Mengembalikan (timestamp, statistik upload) atau (None, None) jika gagal.
+    client: klien gspread opsional (mis. ke server Sheets palsu untuk pengujian).
+    quota: WriteQuota opsional (default: WRITE_QUOTA_PER_MINUTE request/menit).
+    """
+    client = client or get_gspread_client(creds)
+    if client is None:
+        raise Exception("Gagal mendapatkan klien Google Sheet untuk upload.")
+    
+    frames = {"pivot_df": pivot_df, "daily_soh_df": daily_soh_df}
+    with spreadsheet_write_lock(spreadsheet_id): # (Menunggu job upload lain ke spreadsheet yang sama)
+        try:
+            session, sheet_plans = plan_upload(client, spreadsheet_id, frames)
+        except Exception as e:
+            st.error(f"Gagal membuka GSheet untuk upload. Periksa ID: {e}", icon="🚨")
+            return None, None
+        
+        quota = quota or WriteQuota()
+        with ThreadPoolExecutor(max_workers=UPLOAD_SHEET_WORKERS) as executor:
+            futures = {
+                ws_name: executor.submit(write_sheet, session, ws_name, sheet_plan["steps"], frames, quota)
+                for ws_name, sheet_plan in sheet_plans.items()
+            }
+    
+    # (st.error hanya dari thread utama: thread upload tidak punya konteks Streamlit)
+    stats = {"cells_written": 0, "rows_changed": 0, "rows_appended": 0, "rows_deleted": 0}
+    failed = False
+    for ws_name, future in futures.items():
+        try:
+            stats["cells_written"] += future.result()
+        except Exception as e:
+            st.error(f"Gagal mengunggah ke sheet '{ws_name}': {e}", icon="🚨")
+            failed = True
+            continue
+        for key in ("rows_changed", "rows_appended", "rows_deleted"):
+            stats[key] += sheet_plans[ws_name][key]
+    if failed:
+        return None, None
+    
+    # Jika semua berhasil, kembalikan timestamp
+    return datetime.now(), stats
@@ -37,7 +37,7 @@ def _safe_get_date_value(series, date_key, default=0):
         return default
 
 def calculate_stock_accuracy_kpi(df: pd.DataFrame, start_date, end_date):
-    """Menganalisis Stock Accuracy (Unweighted) dari referensi Anda."""
+    """Menganalisis Stock Accuracy (Unweighted) dari referensi Anda. df: kubus metrik harian (metrics_cube)."""
     
     # 1. Menangani "Semua Waktu" (jika start/end date adalah None)
     if start_date is None: 
@@ -47,19 +47,12 @@ def calculate_stock_accuracy_kpi(df: pd.DataFrame, start_date, end_date):
         if df.empty: return "N/A", "N/A", "off", "Data tidak cukup.", ""
         end_date = df['Date'].max()
 
-    # 2. Hitung akurasi harian
+    # 2. Hitung akurasi harian (vektor: jumlah Inbound/Outbound per hari dari kubus, tanpa apply per grup)
+    daily_qty = df.groupby('Date')[['Inbound_Qty', 'Outbound_Qty']].sum()
+    total_qty = daily_qty['Inbound_Qty'] + daily_qty['Outbound_Qty']
     acc_series = (
-        df.groupby('Date')
-        .apply(lambda x: (1 - abs(x['Inbound_Qty'].sum() - x['Outbound_Qty'].sum()) /
-                         (x['Inbound_Qty'].sum() + x['Outbound_Qty'].sum())) * 100
-              if (x['Inbound_Qty'].sum() + x['Outbound_Qty'].sum()) != 0 else 100)
-    )
-    
-    # (PERBAIKAN: Logika defensif untuk menangani ambiguitas 'Date')
-    if isinstance(acc_series, pd.DataFrame):
-        if 'Date' in acc_series.columns:
-            acc_series = acc_series.drop(columns=['Date'])
-        acc_series = acc_series.iloc[:, 0] # Ambil kolom data pertama
+        (1 - (daily_qty['Inbound_Qty'] - daily_qty['Outbound_Qty']).abs() / total_qty) * 100
+    ).where(total_qty != 0, 100)
 
     acc_df = acc_series.to_frame(name='Stock Accuracy %').reset_index().sort_values(by='Date')
     
@@ -89,7 +82,7 @@ def calculate_stock_accuracy_kpi(df: pd.DataFrame, start_date, end_date):
     return f"{avg_acc:,.1f}%", f"{trend:+.1f}% vs awal periode", "normal", insight, stability
 
 def calculate_sku_adjusted_kpi(df: pd.DataFrame, start_date, end_date):
-    """Menganalisis SKU yang di-Adjustment (Updated/Confirmed)."""
+    """Menganalisis SKU yang di-Adjustment (Updated/Confirmed). df: kubus metrik harian (metrics_cube)."""
     
     if start_date is None: 
         if df.empty: return "0", "N/A", "off", "Tidak ada SKU yang di-adjustment.", ""
@@ -98,7 +91,8 @@ def calculate_sku_adjusted_kpi(df: pd.DataFrame, start_date, end_date):
         if df.empty: return "0", "N/A", "off", "Tidak ada SKU yang di-adjustment.", ""
         end_date = df['Date'].max()
 
-    df_adj = df[df['Reference'].str.contains("Product Quantity Updated|Product Quantity Confirmed", case=False, na=False)]
+    # (Jenis adjustment sudah ditandai per sel kubus, tanpa regex per rerun)
+    df_adj = df[df['Adj Updated'] | df['Adj Confirmed']]
     
     if df_adj.empty:
         return "0", "N/A", "off", "Tidak ada SKU yang di-adjustment.", ""
@@ -145,7 +139,7 @@ def calculate_sku_variance_kpi(df: pd.DataFrame):
     return f"{total_variance_skus:,.0f}", "", "off", insight, stability # Tidak ada delta/tren
 
 def calculate_active_locations_kpi(df: pd.DataFrame, start_date, end_date):
-    """Menganalisis jumlah lokasi yang aktif bertransaksi per hari."""
+    """Menganalisis jumlah lokasi yang aktif bertransaksi per hari. df: kubus metrik harian (metrics_cube)."""
     
     if start_date is None: 
         if df.empty: return "0", "N/A", "off", "Tidak ada transaksi.", ""
@@ -185,6 +179,7 @@ def calculate_weighted_accuracy_kpi(df: pd.DataFrame, start_date, end_date):
     """
     Menganalisis Weighted Stock Accuracy (berdasarkan kuantitas).
     (PERBAIKAN: Dihitung dari 'daily_soh_df' (Log Harian) untuk tren time series (linimasa))
+    df: kubus metrik harian (metrics_cube); 'Cumulative_SOH' per sel = nilai terakhir, 'last' per hari tetap sama.
     """
     
     # 1. Menangani "Semua Waktu" (jika start/end date adalah None)
@@ -250,6 +245,7 @@ def calculate_weighted_accuracy_kpi(df: pd.DataFrame, start_date, end_date):
 def display_kpi_metrics(daily_soh_df_filtered: pd.DataFrame, pivot_df_filtered: pd.DataFrame, start_date, end_date, period_label):
     """
     Menampilkan 5 Metrik KPI Utama dengan insight dan analisis periode.
+    daily_soh_df_filtered: kubus metrik harian (metrics_cube) dari Moves History yang sudah difilter.
     """
     
     st.info(f"Menampilkan metrik untuk periode: **{period_label}**")
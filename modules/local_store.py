@@ -0,0 +1,78 @@
+import os
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+# --- PENYIMPANAN LOKAL (Arrow IPC): Persistensi utama, Google Sheet hanya mirror ---
+
+# Folder data lokal dasbor (dipakai juga oleh state ingesti di data_processing.py)
+DATA_DIR = os.getenv("DASHBOARD_DATA_DIR", ".dashboard_data")
+STORE_DIR = os.path.join(DATA_DIR, "store")
+STORE_VERSION = 1
+
+# Nama file = kunci df_dict hasil data_processing.process_csv
+FRAME_NAMES = ["pivot_df", "daily_soh_df"]
+# File store lama yang tidak ditulis lagi (Inbound/Outbound diturunkan dari daily_soh_df)
+LEGACY_FRAME_NAMES = ["inbound_df", "outbound_df"]
+
+def _frame_path(path, name):
+    return os.path.join(path, f"{name}.arrow")
+
+def save_frames(frames, update_time, path=None):
+    """
+    Menyimpan 2 DataFrame dashboard (pivot_df, daily_soh_df) sebagai file Arrow IPC (tanpa kompresi,
+    agar bisa di-memory-map saat dimuat) + meta.json berisi waktu update.
+    Setiap file ditulis ke file sementara lalu di-rename (atomik).
+    """
+    path = path or STORE_DIR
+    os.makedirs(path, exist_ok=True)
+
+    for name in FRAME_NAMES:
+        table = pa.Table.from_pandas(frames[name], preserve_index=False)
+        tmp_path = _frame_path(path, name) + ".tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, _frame_path(path, name))
+    for name in LEGACY_FRAME_NAMES:
+        if os.path.exists(_frame_path(path, name)):
+            os.remove(_frame_path(path, name))
+
+    # meta.json ditulis terakhir: store hanya dianggap valid jika meta.json ada
+    meta = {
+        "version": STORE_VERSION,
+        "update_time": pd.Timestamp(update_time).isoformat() if update_time is not None else None,
+    }
+    tmp_meta = os.path.join(path, "meta.json.tmp")
+    with open(tmp_meta, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, os.path.join(path, "meta.json"))
+
+def load_meta(path=None):
+    """Isi meta.json store lokal (version, update_time), atau None jika store belum ada."""
+    meta_path = os.path.join(path or STORE_DIR, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+def load_frames(path=None):
+    """
+    Memuat pivot_df & daily_soh_df dari store lokal dengan memory-map.
+    Mengembalikan (pivot_df, daily_soh_df, update_time),
+    atau None jika store belum ada / versinya berbeda.
+    """
+    path = path or STORE_DIR
+    meta = load_meta(path)
+    if meta is None or meta.get("version") != STORE_VERSION:
+        return None
+
+    frames = {}
+    for name in FRAME_NAMES:
+        with pa.memory_map(_frame_path(path, name), "r") as source:
+            # (Kolom 'category' kembali sebagai 'category' lewat metadata pandas di skema Arrow)
+            frames[name] = ipc.open_file(source).read_all().to_pandas()
+
+    update_time = pd.Timestamp(meta["update_time"]) if meta.get("update_time") else None
+    return frames["pivot_df"], frames["daily_soh_df"], update_time
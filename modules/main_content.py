@@ -1,11 +1,174 @@
 import streamlit as st
 import pandas as pd
 from modules import filters
+from modules import filter_index
+from modules import storage
+from modules import datasets
 from modules import kpi_cards
+from modules import metrics_cube
 from modules import visuals_advanced
+from modules.schema import split_moves_by_type
 import altair as alt
 import datetime 
 
+FILTER_SELECTION_KEYS = ['selected_cat_loc', 'selected_spec_loc', 'selected_statuses', 'selected_sku_names',
+                         'selected_skus', 'selected_creators', 'selected_references']
+
+# Kolom yang difilter oleh tiap pilihan, per frame
+# (PERBAIKAN: Filter 'Status' 🟥 🟨 🟩 HANYA berlaku untuk PIVOT_DF; Created by & Reference hanya Moves History)
+DAILY_FILTER_COLUMNS = {
+    'selected_cat_loc': 'Location Category', 'selected_spec_loc': 'Location', 'selected_sku_names': 'SKU Name',
+    'selected_skus': 'SKU', 'selected_creators': 'Created by', 'selected_references': 'Reference',
+}
+PIVOT_FILTER_COLUMNS = {
+    'selected_cat_loc': 'Location Category', 'selected_spec_loc': 'Location', 'selected_statuses': 'Status',
+    'selected_sku_names': 'SKU Name', 'selected_skus': 'SKU',
+}
+
+def _take(df, positions):
+    return df if positions is None else df.iloc[positions]
+
+def filter_rows(daily_soh_df, pivot_df, start_date, end_date,
+                daily_index=None, pivot_index=None, date_index=None, **selections):
+    """
+    Posisi baris yang lolos filter tanggal & filter opsional (semantik sama dengan apply_filters).
+    daily_index/pivot_index/date_index: indeks dari filter_index (dataset registri); tanpa indeks,
+    tanggal dibandingkan per baris dan filter opsional digabung sebagai satu mask per frame.
+    Mengembalikan (daily_positions, pivot_positions, inbound_positions, outbound_positions);
+    None = semua baris.
+    """
+    daily_positions = None
+    pivot_positions = None
+
+    # Filter Tanggal (Wajib)
+    if start_date and end_date:
+        try:
+            # (PERBAIKAN TypeError: date vs str)
+            # Konversi start/end date (dari filter) ke tipe date
+            start_date_d = pd.to_datetime(start_date).date()
+            end_date_d = pd.to_datetime(end_date).date()
+            
+            if date_index is not None:
+                # Indeks tanggal terurut dataset: rentang -> searchsorted -> satu irisan posisi (tanpa parse/bandingkan per baris)
+                date_positions = filter_index.date_rows(date_index, start_date_d, end_date_d)
+            else:
+                # DataFrame sudah dikonversi ke .dt.date saat dataset dipublikasikan
+                date_positions = filter_index.positions(
+                    ((daily_soh_df['Date'] >= start_date_d) & (daily_soh_df['Date'] <= end_date_d)).to_numpy()
+                )
+            
+            # Filter Pivot (agak rumit karena pivot tidak memiliki 'Date')
+            # Kita filter berdasarkan SKU/Lokasi yang aktif di rentang tanggal tersebut
+            skus_in_date_range = _take(daily_soh_df['SKU'], date_positions).unique()
+            locs_in_date_range = _take(daily_soh_df['Location'], date_positions).unique()
+            
+            # (Rentang tanpa baris -> Pivot kosong: pilihan kosong di sini tetap menyaring, tidak diabaikan)
+            pivot_positions = filter_index.rows_where(pivot_df, None, 'SKU', skus_in_date_range, pivot_index)
+            pivot_positions = filter_index.rows_where(pivot_df, pivot_positions, 'Location', locs_in_date_range, pivot_index)
+            daily_positions = date_positions
+        except Exception as e:
+            st.warning(f"Gagal memfilter tanggal: {e}. Pastikan format tanggal di GSheet benar.", icon="⚠️")
+            # Jika gagal, jangan filter berdasarkan tanggal
+
+    # Filter Opsional (gabungan nilai dalam satu dimensi, irisan antar dimensi)
+    daily_positions = filter_index.select_rows(
+        daily_soh_df,
+        {col: selections.get(key) or [] for key, col in DAILY_FILTER_COLUMNS.items()},
+        daily_index, daily_positions
+    )
+    pivot_positions = filter_index.select_rows(
+        pivot_df,
+        {col: selections.get(key) or [] for key, col in PIVOT_FILTER_COLUMNS.items() if col in pivot_df.columns},
+        pivot_index, pivot_positions
+    )
+
+    # Log Inbound & Outbound = subset 'Type' dari Moves History yang sudah difilter
+    return (
+        daily_positions,
+        pivot_positions,
+        filter_index.rows_where(daily_soh_df, daily_positions, 'Type', ['Inbound'], daily_index),
+        filter_index.rows_where(daily_soh_df, daily_positions, 'Type', ['Outbound'], daily_index),
+    )
+
+def apply_filters(daily_soh_df, pivot_df, start_date, end_date, **selections):
+    """
+    Menerapkan filter tanggal & filter opsional ke Moves History dan Pivot.
+    Kolom 'Date' diharapkan sudah berupa objek date (lihat datasets.publish).
+    Mengembalikan (daily_soh, pivot, inbound, outbound) yang sudah difilter;
+    inbound/outbound diturunkan dari hasil filter Moves History (filter yang sama).
+    Frame input tidak diubah dan tidak disalin: tanpa filter, frame itu sendiri yang dikembalikan
+    (frame registri dataset bersama bersifat read-only).
+    """
+    daily_positions, pivot_positions, inbound_positions, outbound_positions = filter_rows(
+        daily_soh_df, pivot_df, start_date, end_date, **selections
+    )
+    return (
+        _take(daily_soh_df, daily_positions),
+        _take(pivot_df, pivot_positions),
+        _take(daily_soh_df, inbound_positions),
+        _take(daily_soh_df, outbound_positions),
+    )
+
+def _filter_key(start_date, end_date, selections):
+    """Filter ternormalisasi (hashable): tanggal sebagai date, pilihan multiselect diurutkan (urutan tidak berpengaruh)."""
+    dates = []
+    for value in (start_date, end_date):
+        try:
+            dates.append(pd.to_datetime(value).date() if value else None)
+        except Exception:
+            dates.append(str(value)) # (Tanggal tidak valid: filter_rows yang menampilkan peringatannya)
+    return tuple(dates) + tuple(
+        tuple(sorted(set(selections.get(key) or []), key=str)) for key in FILTER_SELECTION_KEYS
+    )
+
+def filter_dataset(dataset, start_date, end_date, **selections):
+    """
+    apply_filters untuk dataset registri, dengan memo posisi baris per (version, filter ternormalisasi)
+    di datasets.cached_rows: rerun yang hanya mengganti halaman tabel, atau kembali ke kombinasi filter
+    yang baru dipakai, tidak memfilter ulang.
+    Mengembalikan (daily_soh, pivot, inbound, outbound, cube); cube = kubus metrik harian yang difilter
+    sama (untuk KPI & chart, lihat metrics_cube; ikut di-memo jika dibangun dari baris hasil filter).
+    """
+    daily_soh_df = dataset["daily_soh_df"]
+    pivot_df = dataset["pivot_df"]
+    cube = dataset["cube"]
+    filter_key = _filter_key(start_date, end_date, selections)
+    start_date_d, end_date_d = filter_key[:2]
+    if not (isinstance(start_date_d, datetime.date) and isinstance(end_date_d, datetime.date)):
+        start_date_d = end_date_d = None # (Tanpa filter tanggal, seperti filter_rows)
+
+    # Filter di luar dimensi kubus (SKU, SKU Name, Created by, Reference): dijawab indeks baris mentah
+    raw_cube = any(
+        selections.get(key) for key, col in DAILY_FILTER_COLUMNS.items() if col not in metrics_cube.CUBE_INDEX_COLS
+    )
+
+    def compute():
+        rows = filter_rows(
+            daily_soh_df, pivot_df, start_date, end_date,
+            daily_index=dataset["daily_index"], pivot_index=dataset["pivot_index"],
+            date_index=dataset["date_index"], **selections
+        )
+        if raw_cube:
+            # (Kubus dibangun dari baris hasil filter & di-memo bersama posisinya: tidak dibangun ulang tiap rerun)
+            return rows + (metrics_cube.build_cube(_take(daily_soh_df, rows[0]))[0],)
+        return rows + (metrics_cube.cube_rows(
+            cube, start_date_d, end_date_d,
+            {col: selections.get(key) or [] for key, col in DAILY_FILTER_COLUMNS.items() if col in metrics_cube.CUBE_INDEX_COLS},
+            dataset["cube_index"], dataset["cube_date_index"]
+        ),)
+
+    daily_positions, pivot_positions, inbound_positions, outbound_positions, cube_result = datasets.cached_rows(
+        dataset["version"], filter_key, compute
+    )
+    filtered_cube = cube_result if raw_cube else _take(cube, cube_result)
+    return (
+        _take(daily_soh_df, daily_positions),
+        _take(pivot_df, pivot_positions),
+        _take(daily_soh_df, inbound_positions),
+        _take(daily_soh_df, outbound_positions),
+        filtered_cube,
+    )
+
 def display_main_content():
     """
     Menampilkan seluruh konten utama dasbor, termasuk KPI, Filter, Tabel, dan Chart.
@@ -17,15 +180,19 @@ def display_main_content():
         st.info("Silakan muat data dari Google Sheet atau unggah file CSV baru untuk memulai.", icon="ℹ️")
         return
 
-    # --- 2. Ambil Data dari Session State ---
-    try:
-        daily_soh_df = st.session_state.daily_soh_df
-        pivot_df = st.session_state.pivot_df
-        inbound_df = st.session_state.inbound_df
-        outbound_df = st.session_state.outbound_df
-    except AttributeError:
-        st.error("Gagal memuat data dari session state. Coba muat ulang data.", icon="🚨")
-        return
+    # --- 2. Ambil Data dari Registri Dataset Bersama ---
+    # (Sesi hanya menyimpan dataset_version; backend pushdown (SQLite): baris di-query di langkah 4)
+    backend = storage.get_backend()
+    if not backend.pushdown:
+        dataset = datasets.get(st.session_state.get('dataset_version'))
+        if dataset is None:
+            # Versi sesi sudah digantikan (data baru dimuat/diunggah sesi lain): pakai versi terbaru
+            dataset = datasets.latest()
+            if dataset is None:
+                st.error("Gagal memuat data dari registri dataset. Coba muat ulang data.", icon="🚨")
+                return
+            st.session_state.dataset_version = dataset["version"]
+            st.session_state.last_gsheet_update = dataset["update_time"]
 
     # --- 3. Ambil Pilihan Filter dari Session State ---
     (start_date, end_date) = st.session_state.get('selected_dates', (None, None))
@@ -37,112 +204,44 @@ def display_main_content():
     if not isinstance(end_date, (datetime.date, datetime.datetime, type(None))):
         end_date = None
     
-    selected_cat_loc = st.session_state.get('selected_cat_loc', [])
-    selected_spec_loc = st.session_state.get('selected_spec_loc', [])
-    selected_statuses = st.session_state.get('selected_statuses', [])
-    selected_sku_names = st.session_state.get('selected_sku_names', [])
-    selected_skus = st.session_state.get('selected_skus', [])
-    selected_creators = st.session_state.get('selected_creators', [])
-    selected_references = st.session_state.get('selected_references', [])
-
-    # (PERBAIKAN TypeError: date vs str)
-    # Konversi kolom 'Date' di DataFrame utama (jika belum)
-    try:
-        # Pastikan ini adalah objek date, bukan datetime, agar cocok dengan filter
-        daily_soh_df['Date'] = pd.to_datetime(daily_soh_df['Date'], errors='coerce').dt.date
-        inbound_df['Date'] = pd.to_datetime(inbound_df['Date'], errors='coerce').dt.date
-        outbound_df['Date'] = pd.to_datetime(outbound_df['Date'], errors='coerce').dt.date
-    except Exception as e:
-        st.error(f"Gagal mengonversi kolom 'Date' di data mentah: {e}", icon="🚨")
-        return
+    selections = {key: st.session_state.get(key, []) for key in FILTER_SELECTION_KEYS}
 
     # --- 4. Terapkan Filter ke Data ---
-    filtered_daily_soh_df = daily_soh_df.copy()
-    filtered_pivot_df = pivot_df.copy()
-    filtered_inbound_df = inbound_df.copy()
-    filtered_outbound_df = outbound_df.copy()
-
-    # Filter Tanggal (Wajib)
-    if start_date and end_date:
+    if backend.pushdown:
+        # (Filter dijalankan sebagai SQL berindeks; hanya baris yang cocok yang dimuat)
         try:
-            # (PERBAIKAN TypeError: date vs str)
-            # Konversi start/end date (dari filter) ke tipe date
-            start_date_d = pd.to_datetime(start_date).date()
-            end_date_d = pd.to_datetime(end_date).date()
-            
-            # DataFrame sudah dikonversi ke .dt.date di LANGKAH 3
-            filtered_daily_soh_df = filtered_daily_soh_df[
-                (filtered_daily_soh_df['Date'] >= start_date_d) &
-                (filtered_daily_soh_df['Date'] <= end_date_d)
-            ]
-            filtered_inbound_df = filtered_inbound_df[
-                (filtered_inbound_df['Date'] >= start_date_d) &
-                (filtered_inbound_df['Date'] <= end_date_d)
-            ]
-            filtered_outbound_df = filtered_outbound_df[
-                (filtered_outbound_df['Date'] >= start_date_d) &
-                (filtered_outbound_df['Date'] <= end_date_d)
-            ]
-            
-            # Filter Pivot (agak rumit karena pivot tidak memiliki 'Date')
-            # Kita filter berdasarkan SKU/Lokasi yang aktif di rentang tanggal tersebut
-            skus_in_date_range = filtered_daily_soh_df['SKU'].unique()
-            locs_in_date_range = filtered_daily_soh_df['Location'].unique()
-            
-            filtered_pivot_df = filtered_pivot_df[
-                (filtered_pivot_df['SKU'].isin(skus_in_date_range)) &
-                (filtered_pivot_df['Location'].isin(locs_in_date_range))
-            ]
+            result = backend.query(start_date, end_date, **selections)
+            filter_options = backend.filter_options()
         except Exception as e:
-            st.warning(f"Gagal memfilter tanggal: {e}. Pastikan format tanggal di GSheet benar.", icon="⚠️")
-            # Jika gagal, jangan filter berdasarkan tanggal
-
-    # Filter Opsional
-    if selected_cat_loc:
-        filtered_daily_soh_df = filtered_daily_soh_df[filtered_daily_soh_df['Location Category'].isin(selected_cat_loc)]
-        filtered_pivot_df = filtered_pivot_df[filtered_pivot_df['Location Category'].isin(selected_cat_loc)]
-        filtered_inbound_df = filtered_inbound_df[filtered_inbound_df['Location Category'].isin(selected_cat_loc)]
-        filtered_outbound_df = filtered_outbound_df[filtered_outbound_df['Location Category'].isin(selected_cat_loc)]
-
-    if selected_spec_loc:
-        filtered_daily_soh_df = filtered_daily_soh_df[filtered_daily_soh_df['Location'].isin(selected_spec_loc)]
-        filtered_pivot_df = filtered_pivot_df[filtered_pivot_df['Location'].isin(selected_spec_loc)]
-        filtered_inbound_df = filtered_inbound_df[filtered_inbound_df['Location'].isin(selected_spec_loc)]
-        filtered_outbound_df = filtered_outbound_df[filtered_outbound_df['Location'].isin(selected_spec_loc)]
-
-    if selected_statuses:
-        # (PERBAIKAN: Filter 'Status' 🟥 🟨 🟩 HANYA berlaku untuk PIVOT_DF)
-        if 'Status' in filtered_pivot_df.columns:
-            filtered_pivot_df = filtered_pivot_df[filtered_pivot_df['Status'].isin(selected_statuses)]
-
-    if selected_sku_names:
-        filtered_daily_soh_df = filtered_daily_soh_df[filtered_daily_soh_df['SKU Name'].isin(selected_sku_names)]
-        filtered_pivot_df = filtered_pivot_df[filtered_pivot_df['SKU Name'].isin(selected_sku_names)]
-        filtered_inbound_df = filtered_inbound_df[filtered_inbound_df['SKU Name'].isin(selected_sku_names)]
-        filtered_outbound_df = filtered_outbound_df[filtered_outbound_df['SKU Name'].isin(selected_sku_names)]
-
-    if selected_skus:
-        filtered_daily_soh_df = filtered_daily_soh_df[filtered_daily_soh_df['SKU'].isin(selected_skus)]
-        filtered_pivot_df = filtered_pivot_df[filtered_pivot_df['SKU'].isin(selected_skus)]
-        filtered_inbound_df = filtered_inbound_df[filtered_inbound_df['SKU'].isin(selected_skus)]
-        filtered_outbound_df = filtered_outbound_df[filtered_outbound_df['SKU'].isin(selected_skus)]
-
-    if selected_creators:
-        filtered_daily_soh_df = filtered_daily_soh_df[filtered_daily_soh_df['Created by'].isin(selected_creators)]
-        filtered_inbound_df = filtered_inbound_df[filtered_inbound_df['Created by'].isin(selected_creators)]
-        filtered_outbound_df = filtered_outbound_df[filtered_outbound_df['Created by'].isin(selected_creators)]
-        
-    if selected_references:
-        filtered_daily_soh_df = filtered_daily_soh_df[filtered_daily_soh_df['Reference'].isin(selected_references)]
-        filtered_inbound_df = filtered_inbound_df[filtered_inbound_df['Reference'].isin(selected_references)]
-        filtered_outbound_df = filtered_outbound_df[filtered_outbound_df['Reference'].isin(selected_references)]
+            st.error(f"Gagal meng-query data dari penyimpanan '{backend.name}': {e}", icon="🚨")
+            return
+        if result is None:
+            st.info("Penyimpanan lokal masih kosong. Muat ulang dari Google Sheet atau unggah file CSV baru.", icon="ℹ️")
+            return
+        filtered_daily_soh_df, filtered_pivot_df = result
+        filtered_inbound_df, filtered_outbound_df = split_moves_by_type(filtered_daily_soh_df)
+        filtered_cube = metrics_cube.build_cube(filtered_daily_soh_df)[0]
+    else:
+        # (PERBAIKAN TypeError: date vs str: 'Date' sudah berupa objek date sejak dataset dipublikasikan)
+        # (Posisi baris hasil filter di-memo per versi dataset & filter: ganti halaman tidak memfilter ulang)
+        (
+            filtered_daily_soh_df,
+            filtered_pivot_df,
+            filtered_inbound_df,
+            filtered_outbound_df,
+            filtered_cube
+        ) = filter_dataset(dataset, start_date, end_date, **selections)
+        # Opsi filter dari data mentah (daily_soh_df), dihitung sekali per dataset
+        # Ini memastikan opsi filter selalu penuh, tidak terpengaruh filter lain
+        filter_options = dataset["filter_options"]
 
     # --- 5. Tampilkan Ringkasan Metrik (KPI) 📈 ---
     st.subheader("Ringkasan Metrik (KPI) 📈")
     
     # (PERBAIKAN: Tambahkan kembali argumen ke-5 'period_label' untuk mengatasi TypeError)
+    # (KPI dihitung dari kubus metrik harian yang difilter, bukan dari baris Moves History)
     kpi_cards.display_kpi_metrics(
-        filtered_daily_soh_df, 
+        filtered_cube, 
         filtered_pivot_df, 
         start_date, 
         end_date,
@@ -151,9 +250,7 @@ def display_main_content():
 
     # --- 6. Tampilkan Panel Filter (Lokasi Baru) ---
     st.subheader("Filter Data Dinamis 🔬")
-    # Kirim data mentah (daily_soh_df) untuk membangun opsi filter
-    # Ini memastikan opsi filter selalu penuh, tidak terpengaruh filter lain
-    filters.display_filters(daily_soh_df) 
+    filters.display_filters(filter_options)
 
     # --- 7. Tampilkan Detail Tabel (Tabs) 📊 ---
     st.subheader("Detail Tabel 📊")
@@ -202,20 +299,20 @@ def display_main_content():
     if filtered_daily_soh_df.empty:
         st.warning("Data 'Moves History' tidak ditemukan untuk menghitung tren akurasi.", icon="⚠️")
     else:
-        visuals_advanced.plot_daily_stock_accuracy_trend(filtered_daily_soh_df)
-        visuals_advanced.plot_adjustment_trend_line(filtered_daily_soh_df)
+        visuals_advanced.plot_daily_stock_accuracy_trend(filtered_cube)
+        visuals_advanced.plot_adjustment_trend_line(filtered_cube)
         
-    # (PERBAIKAN: Kirim 'filtered_daily_soh_df' ke 'plot_weighted_accuracy_trend')
+    # (PERBAIKAN: Kirim data harian yang difilter (kubus) ke 'plot_weighted_accuracy_trend')
     if filtered_daily_soh_df.empty:
         st.warning("Data 'Moves History' tidak ditemukan untuk menghitung tren weighted accuracy.", icon="⚠️")
     else:
-        # Chart ini membutuhkan data harian (yang sekarang memiliki 'Cumulative_SOH' dan 'Adjustment Qty')
-        visuals_advanced.plot_weighted_accuracy_trend(filtered_daily_soh_df) 
+        # Chart ini membutuhkan data harian (kubus memiliki 'Cumulative_SOH' dan 'Adjustment Qty')
+        visuals_advanced.plot_weighted_accuracy_trend(filtered_cube) 
         
     # --- 9. Analisis Adjustment 🔬 ---
     st.subheader("Analisis Adjustment 🔬")
     if filtered_daily_soh_df.empty:
         st.warning("Data 'Moves History' tidak ditemukan untuk menghitung analisis adjustment.", icon="⚠️")
     else:
-        visuals_advanced.plot_adjustment_analysis_tables(filtered_daily_soh_df)
+        visuals_advanced.plot_adjustment_analysis_tables(filtered_cube)
 
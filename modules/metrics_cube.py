@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+from modules import filter_index
+
+# --- KUBUS METRIK HARIAN (dibangun sekali per dataset, read-only) ---
+
+# Satu baris per kombinasi Date x Location x Type x jenis adjustment (Location Category ikut sebagai
+# kunci agar filternya tetap bisa dijawab kubus). SKU, SKU Name & Created by hanya diisi pada baris
+# adjustment (dipakai KPI SKU adjusted & tabel analisis adjustment): di baris lain dimensi ini membuat
+# kubus hampir sebesar Moves History. Filter pada dimensi itu (dan Reference) dijawab dari baris mentah
+# berindeks, lalu kubus dibangun dari baris hasil filter (lihat main_content.filter_dataset).
+# KPI & chart tren/adjustment dihitung dari kubus ini, bukan dari log Moves History mentah.
+CUBE_KEYS = ['Date', 'Location', 'Location Category', 'Type', 'SKU', 'SKU Name', 'Created by',
+             'Adj Updated', 'Adj Confirmed']
+CUBE_ADJ_DETAIL_COLS = ['SKU', 'SKU Name', 'Created by']
+CUBE_SUM_COLS = ['Inbound_Qty', 'Outbound_Qty', 'Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease']
+CUBE_INDEX_COLS = ['Location Category', 'Location']
+
+# Jenis adjustment (pola sama dengan kpi_cards & visuals_advanced sebelumnya, dicocokkan sekali per Reference unik)
+ADJ_UPDATED_PATTERN = "Product Quantity Updated"
+ADJ_CONFIRMED_PATTERN = "Product Quantity Confirmed"
+
+def _reference_flags(reference, pattern):
+    """Mask baris yang Reference-nya mengandung pattern (case-insensitive); regex dijalankan per kategori."""
+    if isinstance(reference.dtype, pd.CategoricalDtype):
+        matches = reference.cat.categories.str.contains(pattern, case=False, na=False, regex=True)
+        codes = reference.cat.codes.to_numpy()
+        return np.append(np.asarray(matches, dtype=bool), False)[codes] # (Kode -1 (kosong) -> False)
+    return reference.str.contains(pattern, case=False, na=False).to_numpy(dtype=bool)
+
+def build_cube(daily_soh_df, dates=None):
+    """
+    Kubus metrik harian dari Moves History (utuh atau hasil filter). Kolom: CUBE_KEYS ('Date' = objek date,
+    CUBE_ADJ_DETAIL_COLS hanya terisi di sel adjustment),
+    jumlah CUBE_SUM_COLS, 'Rows' (jumlah baris), 'SKU Count' (baris dengan SKU terisi), dan 'Cumulative_SOH'
+    = nilai non-kosong terakhir di sel tersebut. Baris kubus diurutkan menurut posisi baris asal nilai itu,
+    sehingga groupby(...)['Cumulative_SOH'].last() pada kubus = hasil yang sama pada baris mentah.
+    dates: Series datetime64 yang sudah diparse (opsional, dipakai ulang dari datasets.publish).
+    Mengembalikan (cube, cube_dates) dengan cube_dates = tanggal kubus sebagai datetime64 (untuk indeks tanggal).
+    """
+    if dates is None:
+        dates = pd.to_datetime(daily_soh_df['Date'], errors='coerce')
+    n_rows = len(daily_soh_df)
+    key_cols = [col for col in CUBE_KEYS[1:-2] if col in daily_soh_df.columns]
+    sum_cols = [col for col in CUBE_SUM_COLS if col in daily_soh_df.columns]
+
+    frame = {col: daily_soh_df[col] for col in key_cols + sum_cols}
+    frame['Date'] = dates.dt.normalize()
+    reference = daily_soh_df['Reference'] if 'Reference' in daily_soh_df.columns else pd.Series([None] * n_rows, dtype=object)
+    frame['Adj Updated'] = _reference_flags(reference, ADJ_UPDATED_PATTERN)
+    frame['Adj Confirmed'] = _reference_flags(reference, ADJ_CONFIRMED_PATTERN)
+    adjusted = frame['Adj Updated'] | frame['Adj Confirmed']
+    for col in CUBE_ADJ_DETAIL_COLS:
+        if col in frame:
+            frame[col] = frame[col].where(adjusted) # (Kosong di luar baris adjustment)
+    frame['Rows'] = np.ones(n_rows, dtype=np.int64)
+    frame['SKU Count'] = daily_soh_df['SKU'].notna().to_numpy(dtype=np.int64)
+    has_soh = 'Cumulative_SOH' in daily_soh_df.columns
+    if has_soh:
+        frame['_soh_pos'] = np.where(daily_soh_df['Cumulative_SOH'].notna().to_numpy(), np.arange(n_rows), -1)
+    frame = pd.DataFrame(frame)
+
+    keys = [col for col in CUBE_KEYS if col in frame.columns]
+    aggregations = {col: (col, 'sum') for col in sum_cols + ['Rows', 'SKU Count']}
+    if has_soh:
+        aggregations['_soh_pos'] = ('_soh_pos', 'max')
+    cube = frame.groupby(keys, observed=True, dropna=False, sort=False).agg(**aggregations).reset_index()
+
+    if has_soh:
+        # Nilai SOH terakhir per sel, lalu urutkan sel menurut posisi baris asalnya (sel tanpa SOH di depan)
+        soh_pos = cube.pop('_soh_pos').to_numpy()
+        soh_values = daily_soh_df['Cumulative_SOH'].to_numpy(dtype=float)
+        cube['Cumulative_SOH'] = np.where(soh_pos >= 0, soh_values[np.maximum(soh_pos, 0)], np.nan)
+        cube = cube.iloc[np.argsort(soh_pos, kind='stable')].reset_index(drop=True)
+
+    cube_dates = cube['Date']
+    cube['Date'] = cube_dates.dt.date # (Bentuk 'Date' sama dengan Moves History di registri dataset)
+    return cube, cube_dates
+
+def cube_rows(cube, start_date, end_date, selections, cube_index=None, cube_date_index=None):
+    """
+    Posisi baris kubus untuk rentang tanggal (objek date, inklusif) & filter {kolom: nilai terpilih}.
+    None = semua baris. Dengan indeks dataset: searchsorted + indeks terbalik (lihat filter_index).
+    """
+    rows = None
+    if start_date and end_date:
+        if cube_date_index is not None:
+            rows = filter_index.date_rows(cube_date_index, start_date, end_date)
+        else:
+            rows = filter_index.positions(((cube['Date'] >= start_date) & (cube['Date'] <= end_date)).to_numpy())
+    return filter_index.select_rows(cube, selections, cube_index, rows)
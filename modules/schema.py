@@ -0,0 +1,67 @@
+import pandas as pd
+
+# --- SKEMA DATA: Dipakai bersama oleh data_processing.py dan google_sheets.py ---
+
+PIVOT_COLS = [
+    'SKU', 'SKU Name', 'Location', 'Location Category',
+    'Status', 'Action', 'SOH',
+    'Inbound_Qty', 'Outbound_Qty',
+    'Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease',
+    'Daily Usage', 'Moves Category', 'Lead Time',
+    'Buffer Stock', 'Shortage',
+    'Central_SOH', 'Manufacture_SOH'
+]
+
+MOVES_COLS = [
+    'Date', 'Created by', 'Reference', 'Contact', 'Location', 'Location Category',
+    'SKU', 'SKU Name', 'Inbound_Qty', 'Outbound_Qty', 'Quantity',
+    'Status_Replenishment', # (Kolom Status 🟥 🟨 🟩)
+    'Type', # (Tipe Inbound/Outbound)
+    'Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease', 'Cumulative_SOH'
+]
+
+PIVOT_NUMERIC_COLS = [
+    'SOH', 'Inbound_Qty', 'Outbound_Qty',
+    'Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease',
+    'Daily Usage', 'Lead Time', 'Buffer Stock', 'Shortage',
+    'Central_SOH', 'Manufacture_SOH'
+]
+
+MOVES_NUMERIC_COLS = [
+    'Inbound_Qty', 'Outbound_Qty', 'Quantity',
+    'Adjustment Qty', 'Adjustment Increase', 'Adjustment Decrease', 'Cumulative_SOH'
+]
+
+# Kunci baris untuk upload diff ke GSheet (identitas baris antar upload)
+PIVOT_KEY_COLS = ['SKU', 'Location']
+MOVES_KEY_COLS = ['Date', 'Reference', 'Location', 'SKU', 'Type', 'Quantity', 'Created by'] # (Identitas move)
+
+# Kolom teks berkardinalitas rendah-menengah disimpan sebagai 'category'
+# (dictionary-encoded): hemat memori per sesi dan filter .isin() berjalan di kode integer.
+CATEGORICAL_COLS = [
+    'SKU', 'SKU Name', 'Location', 'Location Category', 'Created by',
+    'Reference', 'Type', 'Status', 'Status_Replenishment', 'Moves Category'
+]
+
+def apply_categorical_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Mengubah kolom CATEGORICAL_COLS yang ada di df menjadi dtype 'category'."""
+    for col in CATEGORICAL_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+def split_moves_by_type(daily_soh_df: pd.DataFrame):
+    """
+    Inbound & Outbound = subset 'Type' dari Moves History (tidak disimpan terpisah).
+    Mask dihitung sekali dari kode kategori 'Type'. Mengembalikan (inbound_df, outbound_df).
+    """
+    type_col = daily_soh_df['Type']
+    if isinstance(type_col.dtype, pd.CategoricalDtype):
+        codes = type_col.cat.codes.to_numpy()
+        categories = list(type_col.cat.categories)
+        is_inbound = codes == (categories.index('Inbound') if 'Inbound' in categories else -2)
+        is_outbound = codes == (categories.index('Outbound') if 'Outbound' in categories else -2)
+    else:
+        is_inbound = (type_col == 'Inbound').to_numpy()
+        is_outbound = (type_col == 'Outbound').to_numpy()
+    return daily_soh_df[is_inbound], daily_soh_df[is_outbound]
@@ -3,6 +3,9 @@ import pandas as pd
 from datetime import datetime
 from modules import google_sheets # Sesuaikan nama file
 from modules import data_processing
+from modules import storage
+from modules import datasets
+from modules import upload_jobs
 import os # Untuk password fallback
 
 # -----------------------------------------------------------------
@@ -54,10 +57,14 @@ def initialize_session_state():
         "password_correct": False,
         "data_processed": False,
         "last_gsheet_update": None,
-        "pivot_df": pd.DataFrame(),
-        "daily_soh_df": pd.DataFrame(),
-        "inbound_df": pd.DataFrame(),
-        "outbound_df": pd.DataFrame(),
+        "incremental_upload": False,   # Kunci (Key) toggle upload inkremental
+        "last_ingest_stats": None,     # Statistik ingesti CSV terakhir (baris baru/duplikat/dilewati)
+        "last_upload_stats": None,     # Statistik upload GSheet terakhir (sel ditulis, baris berubah/baru/dihapus)
+        "upload_job_id": None,         # Job upload GSheet di latar yang sedang dipantau sesi ini
+        "upload_job_synced": None,     # Job terakhir yang hasilnya sudah dimasukkan ke state sesi
+        "resumable_job_checked": False, # Checkpoint job terputus sudah dipindai sesi ini (sekali per sesi)
+        "resumable_job_id": None,      # Hasil pindaian: job terputus yang bisa dilanjutkan, atau None
+        "dataset_version": None,       # Versi dataset bersama (modules/datasets.py); sesi tidak menyimpan DataFrame
         
         # (PERBAIKAN: Inisialisasi state filter tanggal dengan benar)
         "selected_dates": (None, None),       # Kunci (Key) untuk tanggal
@@ -82,76 +89,134 @@ def initialize_session_state():
 # SINKRONISASI DATA
 # -----------------------------------------------------------------
 
-def sync_data_to_state(pivot_df, daily_soh_df, inbound_df, outbound_df, update_time):
-    """Memasukkan data yang dimuat ke dalam st.session_state."""
-    st.session_state.pivot_df = pivot_df
-    st.session_state.daily_soh_df = daily_soh_df
-    st.session_state.inbound_df = inbound_df
-    st.session_state.outbound_df = outbound_df
+def sync_data_to_state(pivot_df, daily_soh_df, update_time):
+    """
+    Mendaftarkan data yang dimuat ke registri dataset bersama (per proses, read-only);
+    st.session_state hanya menyimpan version-nya. Data yang sama (versi backend sama)
+    dipakai ulang oleh semua sesi, sehingga memori tidak bertambah per pengguna.
+    """
+    backend = storage.get_backend()
+    if backend.pushdown:
+        # (Backend SQL: main_content meng-query baris sesuai filter, tidak perlu dataset di memori)
+        st.session_state.dataset_version = None
+    else:
+        st.session_state.dataset_version = datasets.publish(
+            pivot_df, daily_soh_df, update_time, key=backend.version()
+        )
     st.session_state.last_gsheet_update = update_time
     st.session_state.data_processed = True
 
 # -----------------------------------------------------------------
-# LOGIKA PEMUATAN DATA (CACHE)
+# LOGIKA PEMUATAN DATA (REGISTRI DATASET)
 # -----------------------------------------------------------------
 
-@st.cache_data(ttl=600, show_spinner=False) # (Dibuat 'silent' (senyap))
-def load_initial_data(_spreadsheet_id, _creds):
+def load_initial_data(_spreadsheet_id, _creds, prefer_local=True):
     """
-    Membaca 4 sheet dari Google Sheet.
-    Fungsi ini di-cache untuk performa.
+    Memuat DataFrame dashboard: (pivot_df, daily_soh_df, update_time).
+    Sumber utama adalah backend penyimpanan lokal (storage.get_backend(): Arrow memory-mapped
+    atau SQLite); Google Sheet hanya dibaca jika backend lokal belum berisi data atau
+    prefer_local=False (tombol Refresh). Dari GSheet, snapshot biner (sheet 'Snapshot') dipakai
+    jika versinya cocok; jika tidak, sheet Pivot & Moves History dibaca. Hasilnya disimpan ke
+    backend lokal untuk startup berikutnya.
+    Backend pushdown (SQLite) mengembalikan DataFrame kosong: baris di-query saat filter.
+    (Pengganti st.cache_data: jika versi backend sudah ada di registri dataset, frame bersama
+    dikembalikan langsung, tanpa salinan per sesi.)
     """
+    backend = storage.get_backend()
+    if prefer_local:
+        version = backend.version()
+        dataset = datasets.find(version)
+        if backend.pushdown:
+            if version is not None:
+                return pd.DataFrame(), pd.DataFrame(), pd.Timestamp(version)
+        elif dataset is not None:
+            return dataset["pivot_df"], dataset["daily_soh_df"], dataset["update_time"]
+        else:
+            local_data = backend.load()
+            if local_data is not None:
+                return local_data
+    
     if not _spreadsheet_id:
         raise Exception("SPREADSHEET_ID tidak ditemukan. Harap set di .env atau Streamlit Secrets.")
     
-    # Panggil fungsi pembacaan GSheet
+    # (Snapshot Parquet jika ada: satu request kecil, tanpa parsing jutaan sel)
     (
         pivot_df, 
         daily_df, 
-        inbound_df, 
-        outbound_df, 
         update_time
-    ) = google_sheets.read_all_data(_spreadsheet_id, _creds)
+    ) = storage.GSheetBackend(_spreadsheet_id, _creds).load()
     
     if pivot_df.empty or daily_df.empty:
         raise Exception("Data di Google Sheet kosong atau tidak dapat dibaca. Coba unggah file CSV baru.")
 
-    return pivot_df, daily_df, inbound_df, outbound_df, update_time
+    backend.save(
+        {"pivot_df": pivot_df, "daily_soh_df": daily_df},
+        update_time
+    )
+    if backend.pushdown:
+        return pd.DataFrame(), pd.DataFrame(), update_time
+    return pivot_df, daily_df, update_time
 
 # -----------------------------------------------------------------
 # LOGIKA UPLOAD
 # -----------------------------------------------------------------
 
-def handle_upload_csv(uploaded_file):
+def handle_upload_csv(uploaded_file, incremental=False):
     """
-    Memproses CSV dan mengembalikan 4 DataFrame (atau None jika gagal).
+    Memproses CSV dan mengembalikan (pivot_df, daily_soh_df) (atau None jika gagal).
     (PERBAIKAN: Penanganan 'KeyError' saat validasi gagal)
+    
+    incremental=True: lanjutkan dari state ingesti tersimpan (hanya baris baru yang
+    diproses). Jika belum ada state tersimpan, CSV diproses penuh seperti biasa.
+    State hasil proses selalu disimpan untuk upload inkremental berikutnya.
     """
     if uploaded_file is None:
         raise Exception("Tidak ada file yang diunggah.")
+    
+    ingest_state = data_processing.load_ingest_state() if incremental else None
         
-    df_dict = data_processing.process_csv(uploaded_file)
+    # (Mode streaming: CSV dibaca per chunk agar memori worker tetap terbatas)
+    df_dict = data_processing.process_csv(
+        uploaded_file,
+        chunksize=data_processing.STREAM_CHUNK_SIZE,
+        state=ingest_state
+    )
     
     # (PERBAIKAN: Jika validasi gagal, df_dict akan kosong)
     if not df_dict:
-        return None, None, None, None # Kembalikan None agar 'controls' tahu
+        return None, None # Kembalikan None agar 'controls' tahu
     
-    return (
-        df_dict["inbound_df"],
-        df_dict["outbound_df"],
-        df_dict["pivot_df"],
-        df_dict["daily_soh_df"]
-    )
+    data_processing.save_ingest_state(df_dict["ingest_state"])
+    storage.get_backend().save(df_dict, datetime.now())
+    st.session_state.last_ingest_stats = df_dict["ingest_stats"]
+    
+    return df_dict["pivot_df"], df_dict["daily_soh_df"]
 
-def handle_upload_to_gsheet(spreadsheet_id, creds, inbound_df, outbound_df, pivot_df, daily_soh_df):
-    """Hanya mengunggah 4 DataFrame ke GSheet."""
+def start_gsheet_upload(spreadsheet_id, creds, pivot_df, daily_soh_df):
+    """
+    Memulai upload data dasbor ke GSheet sebagai job latar (diff terhadap isi sheet saat ini).
+    Mengembalikan job_id (juga disimpan di st.session_state.upload_job_id), atau None jika gagal.
+    """
+    client = google_sheets.get_gspread_client(creds)
+    if client is None:
+        return None
     
-    update_time = google_sheets.upload_all_data(
-        spreadsheet_id, 
-        creds, 
-        inbound_df, 
-        outbound_df, 
-        pivot_df, 
-        daily_soh_df
+    # (Backend lokal berisi data ini; versinya dipakai jika job dilanjutkan)
+    job_id = upload_jobs.start_upload_job(
+        client,
+        spreadsheet_id,
+        {"pivot_df": pivot_df, "daily_soh_df": daily_soh_df},
+        storage.get_backend().version()
     )
-    return update_time
\ No newline at end of file
+    st.session_state.upload_job_id = job_id
+    return job_id
+
+def resume_gsheet_upload(job_id, creds):
+    """Melanjutkan job upload yang gagal/terputus dari checkpoint terakhir."""
+    client = google_sheets.get_gspread_client(creds)
+    if client is None:
+        return None
+    
+    upload_jobs.resume_upload_job(job_id, client)
+    st.session_state.upload_job_id = job_id
+    return job_id
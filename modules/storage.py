@@ -0,0 +1,328 @@
+import abc
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import pandas as pd
+
+from modules import filters, google_sheets, local_store
+from modules.local_store import DATA_DIR
+from modules.schema import PIVOT_COLS, MOVES_COLS, PIVOT_NUMERIC_COLS, MOVES_NUMERIC_COLS, apply_categorical_schema
+
+# --- BACKEND PENYIMPANAN (load / save / version / query) ---
+
+# Backend utama (lokal): "arrow" (store Arrow memory-mapped, default) atau "sqlite" (filter di SQL)
+STORAGE_BACKEND = os.getenv("DASHBOARD_STORAGE", "arrow")
+
+class StorageBackend(abc.ABC):
+    """
+    Antarmuka penyimpanan data dasbor (pivot_df & daily_soh_df).
+    pushdown = True: query() memfilter di backend, sehingga sesi tidak perlu memegang
+    DataFrame penuh (main_content meng-query setiap rerun).
+    """
+    name = None
+    pushdown = False
+
+    @abc.abstractmethod
+    def load(self):
+        """(pivot_df, daily_soh_df, update_time), atau None jika backend belum berisi data."""
+
+    @abc.abstractmethod
+    def save(self, frames, update_time):
+        """Menyimpan frames (dict berkunci pivot_df, daily_soh_df) beserta waktu update-nya."""
+
+    @abc.abstractmethod
+    def version(self):
+        """Penanda versi data yang tersimpan (waktu update, ISO), atau None jika belum ada data."""
+
+    def query(self, start_date, end_date, **selections):
+        """
+        (daily_soh_df, pivot_df) yang sudah difilter seperti main_content.apply_filters
+        ('Date' berupa objek date), atau None jika belum ada data.
+        Default: muat semua, lalu filter di pandas.
+        """
+        data = self.load()
+        if data is None:
+            return None
+        from modules import main_content # (Impor lokal: main_content memakai modul ini)
+        pivot_df, daily_soh_df, _ = data
+        daily_soh_df = daily_soh_df.copy()
+        daily_soh_df['Date'] = pd.to_datetime(daily_soh_df['Date'], errors='coerce').dt.date
+        filtered_daily_soh_df, filtered_pivot_df, _, _ = main_content.apply_filters(
+            daily_soh_df, pivot_df, start_date, end_date, **selections
+        )
+        return filtered_daily_soh_df, filtered_pivot_df
+
+    def filter_options(self):
+        """{kolom: nilai unik terurut} untuk panel filter (kosong jika belum ada data)."""
+        data = self.load()
+        return filters.filter_options(data[1]) if data is not None else {}
+
+class ArrowBackend(StorageBackend):
+    """Store lokal Arrow IPC (local_store): dimuat utuh dengan memory-map."""
+    name = "arrow"
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def load(self):
+        return local_store.load_frames(self.path)
+
+    def save(self, frames, update_time):
+        local_store.save_frames(frames, update_time, self.path)
+
+    def version(self):
+        meta = local_store.load_meta(self.path)
+        return meta.get("update_time") if meta and meta.get("version") == local_store.STORE_VERSION else None
+
+class GSheetBackend(StorageBackend):
+    """Google Sheet (mirror): load lewat snapshot biner / sheet biasa, save = upload diff sinkron."""
+    name = "gsheet"
+
+    def __init__(self, spreadsheet_id, creds, client=None):
+        self.spreadsheet_id = spreadsheet_id
+        self.creds = creds
+        self.client = client
+
+    def load(self):
+        snapshot = google_sheets.read_snapshot(self.spreadsheet_id, self.creds, client=self.client)
+        if snapshot is not None:
+            return snapshot
+        return google_sheets.read_all_data(self.spreadsheet_id, self.creds, client=self.client)
+
+    def save(self, frames, update_time):
+        result, _ = google_sheets.upload_all_data(
+            self.spreadsheet_id, self.creds, frames["pivot_df"], frames["daily_soh_df"], client=self.client
+        )
+        if result is None:
+            raise Exception("Upload ke Google Sheet gagal.")
+
+    def version(self):
+        return google_sheets.read_snapshot_version(self.spreadsheet_id, self.creds, client=self.client)
+
+# --- SQLITE (stdlib): indeks per dimensi filter, filter main_content dijalankan sebagai SQL ---
+
+SQLITE_PATH = os.path.join(DATA_DIR, "dashboard.sqlite")
+SQLITE_SCHEMA_VERSION = "1"
+SQLITE_DATE_FORMAT = "%Y-%m-%d %H:%M:%S" # (Teks ISO: urutan string = urutan waktu)
+
+# Indeks per kolom filter (tanggal & multiselect utama). 'Date' di belakang kolom multiselect:
+# filter lokasi/SKU/pembuat + rentang tanggal dilayani satu indeks. Indeks 'Date' menyertakan
+# SKU & Location agar subquery Pivot (SKU/Location aktif di rentang tanggal) cukup membaca indeks.
+SQLITE_MOVES_INDEXES = [
+    ('Date', 'SKU', 'Location'),
+    ('Location', 'Date'),
+    ('Location Category', 'Date'),
+    ('SKU', 'Date'),
+    ('Created by', 'Date'),
+]
+SQLITE_PIVOT_INDEXES = [('SKU',), ('Location',)]
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def _in_clause(col, values, params):
+    """'"col" IN (?, ...)' dengan nilai ditambahkan ke params."""
+    params.extend(values)
+    return f"{_quote(col)} IN ({', '.join('?' * len(values))})"
+
+def _to_sql_rows(df, columns, numeric_cols):
+    """DataFrame -> list tuple (pos, nilai...) untuk executemany; NaN/NaT -> NULL."""
+    data = {}
+    for col in columns:
+        series = df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if col == 'Date':
+            series = pd.to_datetime(series, errors='coerce').dt.strftime(SQLITE_DATE_FORMAT)
+        elif col in numeric_cols:
+            series = pd.to_numeric(series, errors='coerce')
+        series = series.astype(object)
+        data[col] = series.where(series.notna(), None).to_numpy()
+    return list(zip(range(len(df)), *data.values()))
+
+def _from_sql_frame(df, numeric_cols, dtypes):
+    """
+    Hasil SELECT -> dtype dasbor (index = posisi baris asli, tanggal datetime, teks 'category').
+    dtypes: dtype numerik asli saat disimpan (kolom int dengan NULL tetap float64).
+    """
+    df = df.set_index('_pos')
+    df.index.name = None
+    for col in df.columns:
+        if col == 'Date':
+            df[col] = pd.to_datetime(df[col], format=SQLITE_DATE_FORMAT, errors='coerce')
+        elif col in numeric_cols:
+            values = df[col].astype('float64')
+            dtype = dtypes.get(col, 'float64')
+            df[col] = values if dtype.startswith(('int', 'uint')) and values.isna().any() else values.astype(dtype)
+    return apply_categorical_schema(df)
+
+class SQLiteBackend(StorageBackend):
+    """
+    File SQLite (tabel moves & pivot, indeks di kolom filter). query() menerjemahkan filter
+    main_content ke WHERE, sehingga hanya baris yang cocok yang dimuat ke pandas.
+    File ditulis ulang utuh lalu di-rename (atomik); pembaca memakai koneksi read-only.
+    """
+    name = "sqlite"
+    pushdown = True
+
+    def __init__(self, path=None):
+        self.path = path or SQLITE_PATH
+        self._options = (None, None) # (versi, opsi filter) — cache per versi data
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        return closing(sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False))
+
+    def save(self, frames, update_time):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        with closing(sqlite3.connect(tmp_path)) as conn:
+            # (File sementara: tanpa journal, integritas dijamin rename di akhir)
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            meta = []
+            for table, df, columns, numeric_cols, indexes in [
+                ("moves", frames["daily_soh_df"], MOVES_COLS, MOVES_NUMERIC_COLS, SQLITE_MOVES_INDEXES),
+                ("pivot", frames["pivot_df"], PIVOT_COLS, PIVOT_NUMERIC_COLS, SQLITE_PIVOT_INDEXES),
+            ]:
+                col_defs = ", ".join(
+                    f"{_quote(col)} {'REAL' if col in numeric_cols else 'TEXT'}" for col in columns
+                )
+                conn.execute(f"CREATE TABLE {table} (_pos INTEGER PRIMARY KEY, {col_defs})")
+                placeholders = ", ".join("?" * (len(columns) + 1))
+                conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", _to_sql_rows(df, columns, numeric_cols))
+                for cols in indexes:
+                    conn.execute(
+                        f"CREATE INDEX {_quote('idx_' + table + '_' + '_'.join(cols))} "
+                        f"ON {table} ({', '.join(map(_quote, cols))})"
+                    )
+                # (dtype numerik asli, mis. int64 di Pivot, dipulihkan saat dibaca)
+                meta.append((f"dtypes_{table}", json.dumps({
+                    col: str(df[col].dtype) for col in numeric_cols
+                    if col in df.columns and pd.api.types.is_numeric_dtype(df[col])
+                })))
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", meta + [
+                ("schema_version", SQLITE_SCHEMA_VERSION),
+                # (Tanpa waktu update: waktu simpan, agar version() tetap menandai data ada)
+                ("update_time", pd.Timestamp(update_time if update_time is not None else datetime.now()).isoformat()),
+            ])
+            conn.execute("ANALYZE") # (Statistik indeks: planner memilih indeks paling selektif)
+            conn.commit()
+        os.replace(tmp_path, self.path)
+
+    def _meta(self, conn):
+        """Isi tabel meta, atau None jika skemanya berbeda (file dari versi lain)."""
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        return meta if meta.get("schema_version") == SQLITE_SCHEMA_VERSION else None
+
+    def version(self):
+        if not os.path.exists(self.path):
+            return None
+        with self._connect() as conn:
+            meta = self._meta(conn)
+        return meta["update_time"] if meta else None
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with self._connect() as conn:
+            meta = self._meta(conn)
+            if meta is None:
+                return None
+            pivot_df = pd.read_sql_query("SELECT * FROM pivot ORDER BY _pos", conn)
+            daily_soh_df = pd.read_sql_query("SELECT * FROM moves ORDER BY _pos", conn)
+        return (
+            _from_sql_frame(pivot_df, PIVOT_NUMERIC_COLS, json.loads(meta["dtypes_pivot"])).reset_index(drop=True),
+            _from_sql_frame(daily_soh_df, MOVES_NUMERIC_COLS, json.loads(meta["dtypes_moves"])).reset_index(drop=True),
+            pd.Timestamp(meta["update_time"])
+        )
+
+    def query(self, start_date, end_date, selected_cat_loc=None, selected_spec_loc=None, selected_statuses=None,
+              selected_sku_names=None, selected_skus=None, selected_creators=None, selected_references=None):
+
+        # Urutan & semantik filter sama dengan main_content.apply_filters
+        date_where, date_params = [], []
+        if start_date and end_date:
+            # ('Date' <= end_date per tanggal = sebelum pukul 00:00 hari berikutnya)
+            start_d = pd.to_datetime(start_date).date()
+            end_d = pd.to_datetime(end_date).date() + timedelta(days=1)
+            date_where.append('"Date" >= ? AND "Date" < ?')
+            date_params.extend([start_d.isoformat(), end_d.isoformat()])
+
+        moves_where, moves_params = list(date_where), list(date_params)
+        pivot_where, pivot_params = [], []
+        if date_where:
+            # Pivot (tanpa 'Date'): SKU & Location yang aktif di rentang tanggal
+            date_sql = " AND ".join(date_where)
+            pivot_where.append(f'"SKU" IN (SELECT "SKU" FROM moves WHERE {date_sql}) '
+                               f'AND "Location" IN (SELECT "Location" FROM moves WHERE {date_sql})')
+            pivot_params.extend(date_params + date_params)
+
+        for col, values, on_pivot in [
+            ('Location Category', selected_cat_loc, True),
+            ('Location', selected_spec_loc, True),
+            ('SKU Name', selected_sku_names, True),
+            ('SKU', selected_skus, True),
+            ('Created by', selected_creators, False),
+            ('Reference', selected_references, False),
+        ]:
+            if values:
+                moves_where.append(_in_clause(col, list(values), moves_params))
+                if on_pivot:
+                    pivot_where.append(_in_clause(col, list(values), pivot_params))
+        if selected_statuses: # (Filter 'Status' HANYA berlaku untuk Pivot)
+            pivot_where.append(_in_clause('Status', list(selected_statuses), pivot_params))
+
+        def where_sql(clauses):
+            return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        if not os.path.exists(self.path):
+            return None
+        with self._connect() as conn:
+            meta = self._meta(conn)
+            if meta is None:
+                return None
+            daily_soh_df = pd.read_sql_query(
+                f"SELECT * FROM moves{where_sql(moves_where)} ORDER BY _pos", conn, params=moves_params
+            )
+            pivot_df = pd.read_sql_query(
+                f"SELECT * FROM pivot{where_sql(pivot_where)} ORDER BY _pos", conn, params=pivot_params
+            )
+        daily_soh_df = _from_sql_frame(daily_soh_df, MOVES_NUMERIC_COLS, json.loads(meta["dtypes_moves"]))
+        daily_soh_df['Date'] = daily_soh_df['Date'].dt.date # (Seperti display_main_content)
+        return daily_soh_df, _from_sql_frame(pivot_df, PIVOT_NUMERIC_COLS, json.loads(meta["dtypes_pivot"]))
+
+    def filter_options(self):
+        version = self.version()
+        with self._lock:
+            if self._options[0] == version and version is not None:
+                return self._options[1]
+        if version is None:
+            return {}
+        with self._connect() as conn:
+            options = {
+                col: [row[0] for row in conn.execute(
+                    f"SELECT DISTINCT {_quote(col)} FROM moves WHERE {_quote(col)} IS NOT NULL ORDER BY 1"
+                )]
+                for col in filters.FILTER_OPTION_COLS
+            }
+        with self._lock:
+            self._options = (version, options)
+        return options
+
+_BACKENDS = {"arrow": ArrowBackend, "sqlite": SQLiteBackend}
+
+@lru_cache(maxsize=None)
+def get_backend(name=None):
+    """Backend lokal utama (dibagi semua sesi di proses ini), sesuai DASHBOARD_STORAGE."""
+    name = name or STORAGE_BACKEND
+    if name not in _BACKENDS:
+        raise Exception(f"DASHBOARD_STORAGE '{name}' tidak dikenal. Pilihan: {', '.join(_BACKENDS)}.")
+    return _BACKENDS[name]()
@@ -0,0 +1,265 @@
+import os
+import json
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from modules import google_sheets, storage
+from modules.local_store import DATA_DIR
+
+# --- JOB UPLOAD GSHEET DI LATAR (lepas dari callback Streamlit, bisa dilanjutkan) ---
+
+# Checkpoint job: <job_id>.json (status & progres, ditulis setiap langkah selesai).
+# Langkah tulis tidak disimpan: job yang dilanjutkan selalu membuat rencana baru dari isi sheet
+# saat ini (langkah struktural yang sudah diterapkan server tapi belum di-checkpoint tidak dikirim ulang).
+JOB_DIR = os.path.join(DATA_DIR, "upload_jobs")
+
+# Job di proses ini (dibagi antar sesi Streamlit); thread upload hanya menulis lewat _JOBS_LOCK
+_JOBS = {}
+_JOBS_LOCK = threading.Lock()
+
+ACTIVE_STATUSES = ("queued", "planning", "running")
+
+class _Superseded(Exception):
+    """Job dihentikan karena ada job lebih baru ke spreadsheet yang sama."""
+
+def _job_path(job_id, suffix="json"):
+    return os.path.join(JOB_DIR, f"{job_id}.{suffix}")
+
+def _write_json(path, data):
+    """Tulis ke file sementara lalu rename (atomik)."""
+    os.makedirs(JOB_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def _save_checkpoint(job):
+    """Simpan status job (tanpa langkah tulis). Dipanggil dengan _JOBS_LOCK dipegang."""
+    _write_json(_job_path(job["job_id"]), {k: v for k, v in job.items() if k != "steps"})
+
+def _load_job(job_id):
+    """Memuat job dari checkpoint status di disk, atau None."""
+    if not os.path.exists(_job_path(job_id)):
+        return None
+    with open(_job_path(job_id)) as f:
+        job = json.load(f)
+    job["steps"] = {}
+    return job
+
+def _snapshot(job):
+    """Salinan status job untuk UI (tanpa langkah tulis)."""
+    snapshot = {k: v for k, v in job.items() if k not in ("steps", "sheets")}
+    snapshot["sheets"] = {name: dict(sheet) for name, sheet in job["sheets"].items()}
+    return snapshot
+
+def _supersede_active_jobs(spreadsheet_id, job_id):
+    """
+    Menandai job aktif lain ke spreadsheet yang sama sebagai digantikan oleh job_id: job yang masih
+    menunggu lock tulis tidak dijalankan, job yang sedang menulis berhenti setelah langkah berjalan.
+    Dipanggil dengan _JOBS_LOCK dipegang.
+    """
+    for other in _JOBS.values():
+        if other["job_id"] != job_id and other["spreadsheet_id"] == spreadsheet_id and other["status"] in ACTIVE_STATUSES:
+            other["superseded_by"] = job_id
+
+def _mark_failed(job, error):
+    """Status akhir job yang berhenti karena error atau digantikan. Dipanggil dengan _JOBS_LOCK dipegang."""
+    if job.get("superseded_by"):
+        job.update(status="superseded", error=f"Digantikan oleh upload yang lebih baru (job {job['superseded_by']}).")
+    else:
+        job.update(status="failed", error=error)
+    _save_checkpoint(job)
+
+def _job_stats(job):
+    """Statistik upload (format sama dengan google_sheets.upload_all_data)."""
+    stats = {"cells_written": 0, "rows_changed": 0, "rows_appended": 0, "rows_deleted": 0}
+    for sheet in job["sheets"].values():
+        for key in stats:
+            stats[key] += sheet[key]
+    return stats
+
+def start_upload_job(client, spreadsheet_id, frames, store_time):
+    """
+    Memulai upload diff data dasbor ke GSheet di thread latar. Mengembalikan job_id.
+    Job per spreadsheet berjalan bergantian (google_sheets.spreadsheet_write_lock); job aktif
+    sebelumnya ke spreadsheet yang sama digantikan job ini (rencananya dibuat dari isi sheet terbaru).
+    frames: dict seperti df_dict (pivot_df, daily_soh_df).
+    store_time: update_time store lokal yang berisi frames (untuk melanjutkan job setelah restart).
+    """
+    job = {
+        "job_id": uuid.uuid4().hex[:12],
+        "spreadsheet_id": spreadsheet_id,
+        "store_time": store_time,
+        "status": "queued",
+        "created": datetime.now().isoformat(),
+        "finished": None,
+        "error": None,
+        "superseded_by": None,
+        "sheets": {},
+        "steps": {},
+    }
+    with _JOBS_LOCK:
+        _supersede_active_jobs(spreadsheet_id, job["job_id"])
+        _JOBS[job["job_id"]] = job
+        _save_checkpoint(job)
+    threading.Thread(target=_run_job, args=(job, client, frames), daemon=True).start()
+    return job["job_id"]
+
+def resume_upload_job(job_id, client):
+    """
+    Melanjutkan job yang gagal/terputus: diff dibuat ulang terhadap isi sheet saat ini, sehingga
+    hanya sisa perubahan yang dikirim (termasuk jika langkah terakhir sempat diterapkan tanpa konfirmasi).
+    Data diambil dari backend penyimpanan lokal; job ditolak jika sudah berisi data lain.
+    """
+    with _JOBS_LOCK:
+        job = _JOBS.get(job_id) or _load_job(job_id)
+        if job is None:
+            raise Exception(f"Job upload {job_id} tidak ditemukan.")
+        if job_id in _JOBS and job["status"] in ACTIVE_STATUSES:
+            return job_id # Masih berjalan
+
+        version = storage.get_backend().version()
+        if version is None or version != job["store_time"]:
+            raise Exception("Data lokal sudah berubah sejak job dibuat. Proses & unggah ulang file CSV.")
+        job.update(status="queued", error=None, finished=None, superseded_by=None, sheets={}, steps={})
+        _supersede_active_jobs(job["spreadsheet_id"], job_id)
+        _JOBS[job_id] = job
+        _save_checkpoint(job)
+
+    pivot_df, daily_soh_df, _ = storage.get_backend().load()
+    frames = {"pivot_df": pivot_df, "daily_soh_df": daily_soh_df}
+    threading.Thread(target=_run_job, args=(job, client, frames), daemon=True).start()
+    return job_id
+
+def get_job(job_id):
+    """Status job (salinan) dari memori atau checkpoint, atau None."""
+    with _JOBS_LOCK:
+        job = _JOBS.get(job_id) or _load_job(job_id)
+        return _snapshot(job) if job is not None else None
+
+def find_resumable_job():
+    """
+    Job terbaru yang belum selesai, tidak sedang berjalan di proses ini, dan berisi data store lokal
+    saat ini (gagal, atau terputus karena proses berhenti). Mengembalikan job_id atau None.
+    Checkpoint yang tidak bisa dilanjutkan lagi (selesai, digantikan, data lokal sudah berubah,
+    atau ada job lebih baru) dihapus, sehingga direktori job tetap berisi paling banyak satu kandidat.
+    Memindai direktori job: dipanggil sekali per sesi (controls) dan setiap job berakhir, bukan tiap rerun.
+    """
+    if not os.path.isdir(JOB_DIR):
+        return None
+    names = [name for name in os.listdir(JOB_DIR) if name.endswith(".json")]
+    if not names:
+        return None
+    version = storage.get_backend().version()
+
+    candidates, obsolete = [], []
+    with _JOBS_LOCK:
+        for name in names:
+            if name.endswith(".steps.json"): # (Langkah tulis dari versi lama: tidak dipakai lagi)
+                obsolete.append(name)
+                continue
+            job_id = name[:-len(".json")]
+            job = _JOBS.get(job_id) or _load_job(job_id)
+            if job is None or (job_id in _JOBS and job["status"] in ACTIVE_STATUSES):
+                continue
+            if job["status"] in ("done", "superseded") or version is None or job["store_time"] != version:
+                obsolete.append(name)
+            else:
+                candidates.append((job["created"], job_id))
+        candidates.sort()
+        obsolete += [f"{job_id}.json" for _, job_id in candidates[:-1]]
+        for name in obsolete:
+            try:
+                os.remove(os.path.join(JOB_DIR, name))
+            except FileNotFoundError:
+                pass # (Sudah dihapus sesi lain)
+    return candidates[-1][1] if candidates else None
+
+def _run_job(job, client, frames):
+    """
+    Isi thread job: menunggu lock tulis spreadsheet, plan diff dari isi sheet saat ini,
+    lalu kirim langkahnya per sheet (berhenti jika job digantikan job yang lebih baru).
+    """
+    try:
+        with google_sheets.spreadsheet_write_lock(job["spreadsheet_id"]):
+            _write_job(job, client, frames)
+    except Exception as e:
+        with _JOBS_LOCK:
+            _mark_failed(job, str(e))
+    # (Job berakhir: checkpoint yang tidak bisa dilanjutkan lagi dibersihkan di sini, bukan di rerun UI)
+    try:
+        find_resumable_job()
+    except Exception:
+        pass # (Pembersihan opsional; status job sudah tersimpan)
+
+def _write_job(job, client, frames):
+    """Plan & kirim langkah tulis job (dipanggil dengan lock tulis spreadsheet dipegang)."""
+    with _JOBS_LOCK:
+        if job["superseded_by"]:
+            raise _Superseded()
+        job["status"] = "planning"
+        _save_checkpoint(job)
+    session, sheet_plans = google_sheets.plan_upload(client, job["spreadsheet_id"], frames)
+    with _JOBS_LOCK:
+        job["steps"] = {ws_name: sheet_plan["steps"] for ws_name, sheet_plan in sheet_plans.items()}
+        job["sheets"] = {
+            ws_name: {
+                "status": "pending",
+                "total_steps": len(sheet_plan["steps"]),
+                "done_steps": 0,
+                "cells_written": 0,
+                "rows_changed": sheet_plan["rows_changed"],
+                "rows_appended": sheet_plan["rows_appended"],
+                "rows_deleted": sheet_plan["rows_deleted"],
+            }
+            for ws_name, sheet_plan in sheet_plans.items()
+        }
+        job["status"] = "running"
+        _save_checkpoint(job)
+
+    def on_step(ws_name, index, cells):
+        with _JOBS_LOCK:
+            sheet = job["sheets"][ws_name]
+            sheet["done_steps"] = index + 1
+            sheet["cells_written"] += cells
+            _save_checkpoint(job)
+            if job["superseded_by"]: # (Langkah ini sudah dikonfirmasi; job baru membuat plan dari hasilnya)
+                raise _Superseded()
+
+    def run_sheet(ws_name):
+        sheet = job["sheets"][ws_name]
+        with _JOBS_LOCK:
+            sheet["status"] = "running"
+        try:
+            google_sheets.write_sheet(
+                session, ws_name, job["steps"][ws_name], frames, quota,
+                on_step=lambda index, cells: on_step(ws_name, index, cells)
+            )
+        except Exception:
+            with _JOBS_LOCK:
+                sheet["status"] = "failed"
+            raise
+        with _JOBS_LOCK:
+            sheet["status"] = "done"
+
+    quota = google_sheets.WriteQuota()
+    pending = [ws_name for ws_name, sheet in job["sheets"].items() if sheet["done_steps"] < sheet["total_steps"]]
+    with ThreadPoolExecutor(max_workers=google_sheets.UPLOAD_SHEET_WORKERS) as executor:
+        futures = {ws_name: executor.submit(run_sheet, ws_name) for ws_name in pending}
+    errors = []
+    for ws_name, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            errors.append(f"{ws_name}: {e}")
+
+    with _JOBS_LOCK:
+        if errors:
+            _mark_failed(job, "; ".join(errors))
+        else:
+            for sheet in job["sheets"].values():
+                sheet["status"] = "done"
+            job.update(status="done", finished=datetime.now().isoformat(), stats=_job_stats(job))
+            _save_checkpoint(job)
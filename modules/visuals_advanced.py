@@ -85,6 +85,7 @@ def display_paginated_table(df: pd.DataFrame, key_prefix: str, page_size: int =
 def plot_daily_stock_accuracy_trend(df: pd.DataFrame):
     """
     Menampilkan Tren Akurasi Stok (Unweighted) sebagai line chart (grafik garis) sederhana.
+    df: kubus metrik harian (metrics_cube).
     """
     st.markdown("#### Tren Akurasi Stok Harian (Unweighted)")
     
@@ -92,18 +93,12 @@ def plot_daily_stock_accuracy_trend(df: pd.DataFrame):
         st.warning("Data tidak cukup untuk tren Akurasi Stok.", icon="⚠️")
         return
 
-    # 1. Hitung akurasi harian
+    # 1. Hitung akurasi harian (vektor: jumlah Inbound/Outbound per hari dari kubus, tanpa apply per grup)
+    daily_qty = df.groupby('Date')[['Inbound_Qty', 'Outbound_Qty']].sum()
+    total_qty = daily_qty['Inbound_Qty'] + daily_qty['Outbound_Qty']
     acc_series = (
-        df.groupby('Date')
-        .apply(lambda x: (1 - abs(x['Inbound_Qty'].sum() - x['Outbound_Qty'].sum()) /
-                         (x['Inbound_Qty'].sum() + x['Outbound_Qty'].sum())) * 100
-              if (x['Inbound_Qty'].sum() + x['Outbound_Qty'].sum()) != 0 else 100)
-    )
-    
-    if isinstance(acc_series, pd.DataFrame):
-        if 'Date' in acc_series.columns:
-            acc_series = acc_series.drop(columns=['Date'])
-        acc_series = acc_series.iloc[:, 0] 
+        (1 - (daily_qty['Inbound_Qty'] - daily_qty['Outbound_Qty']).abs() / total_qty) * 100
+    ).where(total_qty != 0, 100)
 
     acc_df = acc_series.to_frame(name='Stock Accuracy %').reset_index()
     
@@ -133,6 +128,7 @@ def plot_weighted_accuracy_trend(df: pd.DataFrame):
     """
     Menampilkan Tren Akurasi Stok (Weighted by SOH) sebagai line chart (grafik garis).
     (PERBAIKAN: Menggunakan rumus "Best Practice" (Praktik Terbaik) untuk akurasi kuantitas)
+    df: kubus metrik harian (metrics_cube).
     """
     st.markdown("#### Tren Akurasi Stok Harian (Weighted by SOH)")
     
@@ -194,6 +190,7 @@ def plot_weighted_accuracy_trend(df: pd.DataFrame):
 def plot_adjustment_trend_line(df: pd.DataFrame):
     """
     Menampilkan Tren Transaksi Adjustment (Updated vs Confirmed) sebagai line chart (grafik garis).
+    df: kubus metrik harian (metrics_cube).
     """
     st.markdown("#### Tren Transaksi Adjustment (Updated vs Confirmed)")
     
@@ -201,12 +198,12 @@ def plot_adjustment_trend_line(df: pd.DataFrame):
         st.warning("Data tidak cukup untuk tren Adjustment.", icon="⚠️")
         return
 
-    # 1. Buat DataFrame tren
-    df_updated = df[df['Reference'].str.contains("Product Quantity Updated", case=False, na=False)]
-    df_confirmed = df[df['Reference'].str.contains("Product Quantity Confirmed", case=False, na=False)]
+    # 1. Buat DataFrame tren (jumlah transaksi = 'SKU Count' per sel kubus, jenis adjustment sudah ditandai)
+    df_updated = df[df['Adj Updated']]
+    df_confirmed = df[df['Adj Confirmed']]
 
-    trend_updated = df_updated.groupby('Date')['SKU'].count().reset_index(name='Jumlah Transaksi')
-    trend_confirmed = df_confirmed.groupby('Date')['SKU'].count().reset_index(name='Jumlah Transaksi')
+    trend_updated = df_updated.groupby('Date')['SKU Count'].sum().reset_index(name='Jumlah Transaksi')
+    trend_confirmed = df_confirmed.groupby('Date')['SKU Count'].sum().reset_index(name='Jumlah Transaksi')
     
     trend_updated['Tipe'] = 'Updated'
     trend_confirmed['Tipe'] = 'Confirmed'
@@ -244,9 +241,10 @@ def plot_adjustment_analysis_tables(df: pd.DataFrame):
     """
     Menampilkan 3 tabel analisis adjustment (SKU, Lokasi, Pembuat)
     dengan tata letak vertikal dan paginasi 10 baris.
+    df: kubus metrik harian (metrics_cube); Frekuensi = jumlah 'SKU Count' (baris dengan SKU terisi).
     """
     
-    df_adj = df[df['Reference'].str.contains("Product Quantity Updated|Product Quantity Confirmed", case=False, na=False)].copy()
+    df_adj = df[df['Adj Updated'] | df['Adj Confirmed']].copy()
     
     if df_adj.empty:
         st.warning("Tidak ada data adjustment untuk dianalisis.", icon="⚠️")
@@ -258,9 +256,10 @@ def plot_adjustment_analysis_tables(df: pd.DataFrame):
             df_adj[col] = 0.0
 
     # 1. Analisis SKU
+    # (observed=True: kolom kunci bertipe 'category', hanya kombinasi yang benar-benar ada)
     st.markdown("#### Top SKU Di-Adjustment")
-    sku_analysis = df_adj.groupby(['SKU', 'SKU Name']).agg(
-        Frekuensi=('SKU', 'count'),
+    sku_analysis = df_adj.groupby(['SKU', 'SKU Name'], observed=True).agg(
+        Frekuensi=('SKU Count', 'sum'),
         Jumlah_Adjustment=('Adjustment Qty', 'sum'),
         Adjustment_Increase=('Adjustment Increase', 'sum'),
         Adjustment_Decrease=('Adjustment Decrease', 'sum'),
@@ -273,8 +272,8 @@ def plot_adjustment_analysis_tables(df: pd.DataFrame):
 
     # 2. Analisis Lokasi
     st.markdown("#### Top Lokasi Adjustment")
-    loc_analysis = df_adj.groupby(['Location', 'Location Category']).agg(
-        Frekuensi=('SKU', 'count'),
+    loc_analysis = df_adj.groupby(['Location', 'Location Category'], observed=True).agg(
+        Frekuensi=('SKU Count', 'sum'),
         Jumlah_Adjustment=('Adjustment Qty', 'sum'),
         Adjustment_Increase=('Adjustment Increase', 'sum'),
         Adjustment_Decrease=('Adjustment Decrease', 'sum'),
@@ -286,8 +285,8 @@ def plot_adjustment_analysis_tables(df: pd.DataFrame):
 
     # 3. Analisis Pembuat
     st.markdown("#### Top User Adjustment")
-    creator_analysis = df_adj.groupby('Created by').agg(
-        Frekuensi=('SKU', 'count'),
+    creator_analysis = df_adj.groupby('Created by', observed=True).agg(
+        Frekuensi=('SKU Count', 'sum'),
         Jumlah_Adjustment=('Adjustment Qty', 'sum'),
         Adjustment_Increase=('Adjustment Increase', 'sum'),
         Adjustment_Decrease=('Adjustment Decrease', 'sum'),